@@ -12,15 +12,91 @@ import numpy as np
 from scipy import linalg
 
 from ..utils import logger, verbose
+from ..parallel import parallel_func
 from ..io.pick import pick_types
 from ..forward import _subject_from_forward
 from ..minimum_norm.inverse import combine_xyz, _check_reference
 from ..source_estimate import SourceEstimate
 from ..time_frequency import CrossSpectralDensity, compute_epochs_csd
-from ._lcmv import _prepare_beamformer_input
+from ._lcmv import (_prepare_beamformer_input, _normalize_filters,
+                    _filter_diag_quad, _tf_windows, _tf_overlap_average)
 from ..externals import six
 
 
+def _dics_noise_norm(W, noise_csd_data, n_orient):
+    """Helper to compute the noise power of the filters of each source"""
+    noise_norm = np.abs(_filter_diag_quad(W, noise_csd_data))
+    return np.sum(np.reshape(noise_norm, (-1, n_orient)), axis=1)
+
+
+def _dics_power(G, Cm, noise_csd_data, n_orient, reg, pick_ori):
+    """Helper to compute the DICS source power for a data CSD"""
+    # Calculating regularized inverse, equivalent to an inverse operation
+    # after the following regularization:
+    # Cm += reg * np.trace(Cm) / len(Cm) * np.eye(len(Cm))
+    Cm_inv = linalg.pinv(Cm, reg)
+
+    # Compute spatial filters
+    W = np.dot(G.T, Cm_inv)
+    W = _normalize_filters(W, G, n_orient)
+
+    # Noise normalization
+    noise_norm = _dics_noise_norm(W, noise_csd_data, n_orient)
+
+    # Calculating source power
+    source_power = np.abs(_filter_diag_quad(W, Cm))
+    source_power = np.reshape(source_power, (-1, n_orient))
+    if pick_ori == 'normal':
+        source_power = source_power[:, 2]
+    else:
+        source_power = np.sum(source_power, axis=1)
+    return source_power / np.maximum(noise_norm, 1e-40)  # Avoid division by 0
+
+
+def _tf_dics_band(epochs, forward, noise_csd, freq_bin, windows, mode, n_fft,
+                  mt_bandwidth, mt_low_bias, reg, label, pick_ori):
+    """Helper to compute the TF-DICS source power of one frequency bin"""
+    # Scale noise CSD to allow data and noise CSDs to have different length
+    noise_csd = deepcopy(noise_csd)
+    noise_csd.data /= noise_csd.n_fft
+
+    # The leadfield is the same for all the time windows
+    is_free_ori, _, _, _, vertno, G =\
+        _prepare_beamformer_input(epochs.info, forward, label, picks=None,
+                                  pick_ori=pick_ori)
+    n_orient = 3 if is_free_ori else 1
+
+    sol_single = []
+    for win_tmin, win_tmax in [w for w in windows if w is not None]:
+        logger.info('Computing time-frequency DICS beamformer for '
+                    'time window %d to %d ms, in frequency range '
+                    '%d to %d Hz' % (win_tmin * 1e3, win_tmax * 1e3,
+                                     freq_bin[0], freq_bin[1]))
+
+        # Counteracts unsafe floating point arithmetic ensuring all
+        # relevant samples will be taken into account when selecting
+        # data in time windows
+        win_tmin = win_tmin - 1e-10
+        win_tmax = win_tmax + 1e-10
+
+        # Calculating data CSD in current time window
+        data_csd = compute_epochs_csd(epochs, mode=mode,
+                                      fmin=freq_bin[0],
+                                      fmax=freq_bin[1], fsum=True,
+                                      tmin=win_tmin, tmax=win_tmax,
+                                      n_fft=n_fft,
+                                      mt_bandwidth=mt_bandwidth,
+                                      mt_low_bias=mt_low_bias)
+
+        # Scale data CSD to allow data and noise CSDs to have different
+        # length
+        data_csd.data /= data_csd.n_fft
+
+        sol_single.append(_dics_power(G, data_csd.data, noise_csd.data,
+                                      n_orient, reg, pick_ori))
+    return sol_single, vertno
+
+
 @verbose
 def _apply_dics(data, info, tmin, forward, noise_csd, data_csd, reg,
                 label=None, picks=None, pick_ori=None, verbose=None):
@@ -76,28 +152,15 @@ def _apply_dics(data, info, tmin, forward, noise_csd, data_csd, reg,
     # Compute spatial filters
     W = np.dot(G.T, Cm_inv)
     n_orient = 3 if is_free_ori else 1
-    n_sources = G.shape[1] // n_orient
-
-    for k in range(n_sources):
-        Wk = W[n_orient * k: n_orient * k + n_orient]
-        Gk = G[:, n_orient * k: n_orient * k + n_orient]
-        Ck = np.dot(Wk, Gk)
-
-        # TODO: max-power is not implemented yet, however DICS does employ
-        # orientation picking when one eigen value is much larger than the
-        # other
 
-        if is_free_ori:
-            # Free source orientation
-            Wk[:] = np.dot(linalg.pinv(Ck, 0.1), Wk)
-        else:
-            # Fixed source orientation
-            Wk /= Ck
+    # TODO: max-power is not implemented yet, however DICS does employ
+    # orientation picking when one eigen value is much larger than the
+    # other
+    W = _normalize_filters(W, G, n_orient)
 
-        # Noise normalization
-        noise_norm = np.dot(np.dot(Wk.conj(), noise_csd.data), Wk.T)
-        noise_norm = np.abs(noise_norm).trace()
-        Wk /= np.sqrt(noise_norm)
+    # Noise normalization
+    noise_norm = _dics_noise_norm(W, noise_csd.data, n_orient)
+    W /= np.sqrt(np.repeat(noise_norm, n_orient))[:, np.newaxis]
 
     # Pick source orientation normal to cortical surface
     if pick_ori == 'normal':
@@ -367,40 +430,8 @@ def dics_source_power(info, forward, noise_csds, data_csds, reg=0.01,
         if n_csds > 1:
             logger.info('    computing DICS spatial filter %d out of %d' %
                         (i + 1, n_csds))
-
-        Cm = data_csd.data
-
-        # Calculating regularized inverse, equivalent to an inverse operation
-        # after the following regularization:
-        # Cm += reg * np.trace(Cm) / len(Cm) * np.eye(len(Cm))
-        Cm_inv = linalg.pinv(Cm, reg)
-
-        # Compute spatial filters
-        W = np.dot(G.T, Cm_inv)
-        for k in range(n_sources):
-            Wk = W[n_orient * k: n_orient * k + n_orient]
-            Gk = G[:, n_orient * k: n_orient * k + n_orient]
-            Ck = np.dot(Wk, Gk)
-
-            if is_free_ori:
-                # Free source orientation
-                Wk[:] = np.dot(linalg.pinv(Ck, 0.1), Wk)
-            else:
-                # Fixed source orientation
-                Wk /= Ck
-
-            # Noise normalization
-            noise_norm = np.dot(np.dot(Wk.conj(), noise_csd.data), Wk.T)
-            noise_norm = np.abs(noise_norm).trace()
-
-            # Calculating source power
-            sp_temp = np.dot(np.dot(Wk.conj(), data_csd.data), Wk.T)
-            sp_temp /= max(noise_norm, 1e-40)  # Avoid division by 0
-
-            if pick_ori == 'normal':
-                source_power[k, i] = np.abs(sp_temp)[2, 2]
-            else:
-                source_power[k, i] = np.abs(sp_temp).trace()
+        source_power[:, i] = _dics_power(G, data_csd.data, noise_csd.data,
+                                         n_orient, reg, pick_ori)
 
     logger.info('[done]')
 
@@ -413,7 +444,7 @@ def dics_source_power(info, forward, noise_csds, data_csds, reg=0.01,
 def tf_dics(epochs, forward, noise_csds, tmin, tmax, tstep, win_lengths,
             freq_bins, subtract_evoked=False, mode='fourier', n_ffts=None,
             mt_bandwidths=None, mt_adaptive=False, mt_low_bias=True, reg=0.01,
-            label=None, pick_ori=None, verbose=None):
+            label=None, pick_ori=None, n_jobs=1, verbose=None):
     """5D time-frequency beamforming based on DICS.
 
     Calculate source power in time-frequency windows using a spatial filter
@@ -466,6 +497,8 @@ def tf_dics(epochs, forward, noise_csds, tmin, tmax, tstep, win_lengths,
     pick_ori : None | 'normal'
         If 'normal', rather than pooling the orientations by taking the norm,
         only the radial component is kept.
+    n_jobs : int
+        Number of jobs to run in parallel (over frequency bins).
     verbose : bool, str, int, or None
         If not None, override default verbose level (see mne.verbose).
 
@@ -517,83 +550,33 @@ def tf_dics(epochs, forward, noise_csds, tmin, tmax, tstep, win_lengths,
     if subtract_evoked:
         epochs.subtract_evoked()
 
-    sol_final = []
-    for freq_bin, win_length, noise_csd, n_fft, mt_bandwidth in\
-            zip(freq_bins, win_lengths, noise_csds, n_ffts, mt_bandwidths):
-        n_overlap = int((win_length * 1e3) // (tstep * 1e3))
+    windows = [_tf_windows(epochs.times, tmin, tmax, tstep, win_length,
+                           n_time_steps) for win_length in win_lengths]
 
-        # Scale noise CSD to allow data and noise CSDs to have different length
-        noise_csd = deepcopy(noise_csd)
-        noise_csd.data /= noise_csd.n_fft
-
-        sol_single = []
-        sol_overlap = []
-        for i_time in range(n_time_steps):
-            win_tmin = tmin + i_time * tstep
-            win_tmax = win_tmin + win_length
-
-            # If in the last step the last time point was not covered in
-            # previous steps and will not be covered now, a solution needs to
-            # be calculated for an additional time window
-            if i_time == n_time_steps - 1 and win_tmax - tstep < tmax and\
-               win_tmax >= tmax + (epochs.times[-1] - epochs.times[-2]):
-                warnings.warn('Adding a time window to cover last time points')
-                win_tmin = tmax - win_length
-                win_tmax = tmax
-
-            if win_tmax < tmax + (epochs.times[-1] - epochs.times[-2]):
-                logger.info('Computing time-frequency DICS beamformer for '
-                            'time window %d to %d ms, in frequency range '
-                            '%d to %d Hz' % (win_tmin * 1e3, win_tmax * 1e3,
-                                             freq_bin[0], freq_bin[1]))
-
-                # Counteracts unsafe floating point arithmetic ensuring all
-                # relevant samples will be taken into account when selecting
-                # data in time windows
-                win_tmin = win_tmin - 1e-10
-                win_tmax = win_tmax + 1e-10
-
-                # Calculating data CSD in current time window
-                data_csd = compute_epochs_csd(epochs, mode=mode,
-                                              fmin=freq_bin[0],
-                                              fmax=freq_bin[1], fsum=True,
-                                              tmin=win_tmin, tmax=win_tmax,
-                                              n_fft=n_fft,
-                                              mt_bandwidth=mt_bandwidth,
-                                              mt_low_bias=mt_low_bias)
-
-                # Scale data CSD to allow data and noise CSDs to have different
-                # length
-                data_csd.data /= data_csd.n_fft
-
-                stc = dics_source_power(epochs.info, forward, noise_csd,
-                                        data_csd, reg=reg, label=label,
-                                        pick_ori=pick_ori)
-                sol_single.append(stc.data[:, 0])
-
-            # Average over all time windows that contain the current time
-            # point, which is the current time window along with
-            # n_overlap - 1 previous ones
-            if i_time - n_overlap < 0:
-                curr_sol = np.mean(sol_single[0:i_time + 1], axis=0)
-            else:
-                curr_sol = np.mean(sol_single[i_time - n_overlap + 1:
-                                              i_time + 1], axis=0)
-
-            # The final result for the current time point in the current
-            # frequency bin
-            sol_overlap.append(curr_sol)
+    # Frequency bins are processed in parallel
+    parallel, p_fun, _ = parallel_func(_tf_dics_band, n_jobs)
+    out = parallel(p_fun(epochs, forward, noise_csd, freq_bin, these_windows,
+                         mode, n_fft, mt_bandwidth, mt_low_bias, reg, label,
+                         pick_ori)
+                   for freq_bin, these_windows, noise_csd, n_fft, mt_bandwidth
+                   in zip(freq_bins, windows, noise_csds, n_ffts,
+                          mt_bandwidths))
 
+    sol_final = []
+    for win_length, (sol_single, vertno) in zip(win_lengths, out):
+        n_overlap = int((win_length * 1e3) // (tstep * 1e3))
         # Gathering solutions for all time points for current frequency bin
-        sol_final.append(sol_overlap)
+        sol_final.append(_tf_overlap_average(sol_single, n_time_steps,
+                                             n_overlap))
 
     sol_final = np.array(sol_final)
 
     # Creating stc objects containing all time points for each frequency bin
+    subject = _subject_from_forward(forward)
     stcs = []
     for i_freq, _ in enumerate(freq_bins):
-        stc = SourceEstimate(sol_final[i_freq, :, :].T, vertices=stc.vertices,
-                             tmin=tmin, tstep=tstep, subject=stc.subject)
+        stc = SourceEstimate(sol_final[i_freq, :, :].T, vertices=vertno,
+                             tmin=tmin, tstep=tstep, subject=subject)
         stcs.append(stc)
 
     return stcs
@@ -16,13 +16,83 @@ from ..io.proj import make_projector
 from ..io.pick import pick_types, pick_channels_forward, pick_channels_cov
 from ..forward import _subject_from_forward
 from ..minimum_norm.inverse import _get_vertno, combine_xyz, _check_reference
-from ..cov import compute_whitener, compute_covariance
+from ..cov import compute_whitener, _get_tslice
 from ..source_estimate import _make_stc, SourceEstimate
 from ..source_space import label_src_vertno_sel
 from ..utils import logger, verbose
+from ..parallel import parallel_func
+from ..fixes import stacked_svd, stacked_eigh
 from .. import Epochs
 from ..externals import six
 
+# number of sources whose filters are computed at once
+_BF_BLOCK_SIZE = 4096
+
+
+def _pinv_stack(x, rcond):
+    """Pseudo-inverse of a stack of small matrices of shape (n, m, m)"""
+    u, s, vh = stacked_svd(x)
+    s_inv = np.zeros_like(s)
+    mask = s > rcond * s[:, :1]
+    s_inv[mask] = 1. / s[mask]
+    return np.einsum('kji,kj,klj->kil', vh.conj(), s_inv, u.conj())
+
+
+def _normalize_filters(W, G, n_orient, pick_ori=None):
+    """Apply the unit-gain constraint to the filters of all the sources
+
+    W = G.T Cm^-1 of shape (n_sources * n_orient, n_channels) is modified
+    in place. The filters are processed by blocks of sources with stacked
+    (n_block, n_orient, n_orient) arrays instead of one source at a time.
+    With pick_ori='max-power', a new array with one filter per source (the
+    one of the orientation maximizing the output source power) is returned.
+    """
+    n_channels = W.shape[1]
+    n_sources = G.shape[1] // n_orient
+    if pick_ori == 'max-power':
+        out = np.empty((n_sources, n_channels), W.dtype)
+    else:
+        out = W
+    for start in range(0, n_sources, _BF_BLOCK_SIZE):
+        stop = min(start + _BF_BLOCK_SIZE, n_sources)
+        Wk = W[n_orient * start:n_orient * stop].reshape(
+            stop - start, n_orient, n_channels)
+        Gk = G[:, n_orient * start:n_orient * stop].T.reshape(
+            stop - start, n_orient, n_channels)
+        Ck = np.einsum('kic,kjc->kij', Wk, Gk)
+
+        if pick_ori == 'max-power':
+            # Find source orientation maximizing output source power
+            eig_vals, eig_vecs = stacked_eigh(Ck)
+
+            # Choosing the eigenvector associated with the middle eigenvalue.
+            # The middle and not the minimal eigenvalue is used because MEG is
+            # insensitive to one (radial) of the three dipole orientations and
+            # therefore the smallest eigenvalue reflects mostly noise.
+            # TODO: The eigenvector associated with the smallest eigenvalue
+            # should probably be used when using combined EEG and MEG data
+            max_ori = eig_vecs[:, :, 1]
+            Wk = np.einsum('ki,kic->kc', max_ori, Wk)
+            Ck = np.einsum('ki,kij,kj->k', max_ori, Ck, max_ori)
+            out[start:stop] = Wk / Ck[:, np.newaxis]
+        elif n_orient == 3:
+            # Free source orientation
+            Wk[:] = np.einsum('kij,kjc->kic', _pinv_stack(Ck, 0.1), Wk)
+        else:
+            # Fixed source orientation
+            Wk /= Ck
+    return out
+
+
+def _filter_diag_quad(W, C):
+    """Diagonal of W.conj() C W.T computed by blocks of filters"""
+    out = np.empty(len(W), np.result_type(W, C))
+    n_rows = 3 * _BF_BLOCK_SIZE
+    for start in range(0, len(W), n_rows):
+        Wb = W[start:start + n_rows]
+        out[start:start + n_rows] = np.sum(np.dot(Wb.conj(), C) * Wb, axis=1)
+    return out
+
 
 @verbose
 def _apply_lcmv(data, info, tmin, forward, noise_cov, data_cov, reg,
@@ -89,42 +159,11 @@ def _apply_lcmv(data, info, tmin, forward, noise_cov, data_cov, reg,
     # Compute spatial filters
     W = np.dot(G.T, Cm_inv)
     n_orient = 3 if is_free_ori else 1
-    n_sources = G.shape[1] // n_orient
-    for k in range(n_sources):
-        Wk = W[n_orient * k: n_orient * k + n_orient]
-        Gk = G[:, n_orient * k: n_orient * k + n_orient]
-        Ck = np.dot(Wk, Gk)
-
-        # Find source orientation maximizing output source power
-        if pick_ori == 'max-power':
-            eig_vals, eig_vecs = linalg.eigh(Ck)
-
-            # Choosing the eigenvector associated with the middle eigenvalue.
-            # The middle and not the minimal eigenvalue is used because MEG is
-            # insensitive to one (radial) of the three dipole orientations and
-            # therefore the smallest eigenvalue reflects mostly noise.
-            for i in range(3):
-                if i != eig_vals.argmax() and i != eig_vals.argmin():
-                    idx_middle = i
-
-            # TODO: The eigenvector associated with the smallest eigenvalue
-            # should probably be used when using combined EEG and MEG data
-            max_ori = eig_vecs[:, idx_middle]
-
-            Wk[:] = np.dot(max_ori, Wk)
-            Ck = np.dot(max_ori, np.dot(Ck, max_ori))
-            is_free_ori = False
-
-        if is_free_ori:
-            # Free source orientation
-            Wk[:] = np.dot(linalg.pinv(Ck, 0.1), Wk)
-        else:
-            # Fixed source orientation
-            Wk /= Ck
+    W = _normalize_filters(W, G, n_orient, pick_ori)
 
     # Pick source orientation maximizing output source power
     if pick_ori == 'max-power':
-        W = W[0::3]
+        is_free_ori = False
 
     # Preparing noise normalization
     noise_norm = np.sum(W ** 2, axis=1)
@@ -500,10 +539,28 @@ def _lcmv_source_power(info, forward, noise_cov, data_cov, reg=0.01,
     # whiten the leadfield
     G = np.dot(whitener, G)
 
-    # Apply SSPs + whitener to data covariance
     data_cov = pick_channels_cov(data_cov, include=ch_names)
-    Cm = data_cov['data']
-    if info['projs']:
+    n_orient = 3 if is_free_ori else 1
+    source_power = _lcmv_power(G, data_cov['data'], whitener, proj,
+                               len(info['projs']) > 0, n_orient, reg,
+                               pick_ori)
+    source_power = source_power[:, np.newaxis]
+
+    logger.info('[done]')
+
+    subject = _subject_from_forward(forward)
+    return SourceEstimate(source_power, vertices=vertno, tmin=1,
+                          tstep=1, subject=subject)
+
+
+def _lcmv_power(G, Cm, whitener, proj, use_proj, n_orient, reg, pick_ori):
+    """Helper to compute the LCMV source power for a data covariance
+
+    G is the whitened leadfield, so that only the data covariance dependent
+    terms are computed here.
+    """
+    # Apply SSPs + whitener to data covariance
+    if use_proj:
         Cm = np.dot(proj, np.dot(Cm, proj.T))
     Cm = np.dot(whitener, np.dot(Cm, whitener.T))
 
@@ -514,39 +571,135 @@ def _lcmv_source_power(info, forward, noise_cov, data_cov, reg=0.01,
 
     # Compute spatial filters
     W = np.dot(G.T, Cm_inv)
-    n_orient = 3 if is_free_ori else 1
-    n_sources = G.shape[1] // n_orient
-    source_power = np.zeros((n_sources, 1))
-    for k in range(n_sources):
-        Wk = W[n_orient * k: n_orient * k + n_orient]
-        Gk = G[:, n_orient * k: n_orient * k + n_orient]
-        Ck = np.dot(Wk, Gk)
+    W = _normalize_filters(W, G, n_orient)
 
-        if is_free_ori:
-            # Free source orientation
-            Wk[:] = np.dot(linalg.pinv(Ck, 0.1), Wk)
-        else:
-            # Fixed source orientation
-            Wk /= Ck
+    # Noise normalization
+    noise_norm = np.sum(np.reshape(np.sum(W ** 2, axis=1), (-1, n_orient)),
+                        axis=1)
 
-        # Noise normalization
-        noise_norm = np.dot(Wk, Wk.T)
-        noise_norm = noise_norm.trace()
+    # Calculating source power
+    source_power = np.reshape(_filter_diag_quad(W, Cm), (-1, n_orient))
+    if pick_ori == 'normal':
+        source_power = source_power[:, 2]
+    else:
+        source_power = np.sum(source_power, axis=1)
+    source_power /= np.maximum(noise_norm, 1e-40)  # Avoid division by 0
+    return source_power
 
-        # Calculating source power
-        sp_temp = np.dot(np.dot(Wk, Cm), Wk.T)
-        sp_temp /= max(noise_norm, 1e-40)  # Avoid division by 0
 
-        if pick_ori == 'normal':
-            source_power[k, 0] = sp_temp[2, 2]
+def _tf_windows(times, tmin, tmax, tstep, win_length, n_time_steps):
+    """Helper to get the time windows of the time-frequency beamformers
+
+    Returns the (win_tmin, win_tmax) of each time step, or None when no
+    solution is computed at that step.
+    """
+    windows = list()
+    for i_time in range(n_time_steps):
+        win_tmin = tmin + i_time * tstep
+        win_tmax = win_tmin + win_length
+
+        # If in the last step the last time point was not covered in
+        # previous steps and will not be covered now, a solution needs to
+        # be calculated for an additional time window
+        if i_time == n_time_steps - 1 and win_tmax - tstep < tmax and\
+           win_tmax >= tmax + (times[-1] - times[-2]):
+            warnings.warn('Adding a time window to cover last time points')
+            win_tmin = tmax - win_length
+            win_tmax = tmax
+
+        if win_tmax < tmax + (times[-1] - times[-2]):
+            windows.append((win_tmin, win_tmax))
+        else:
+            windows.append(None)
+    return windows
+
+
+def _tf_overlap_average(sol_single, n_time_steps, n_overlap):
+    """Helper to average the solutions of the windows around each time"""
+    sol_overlap = []
+    for i_time in range(n_time_steps):
+        # Average over all time windows that contain the current time
+        # point, which is the current time window along with
+        # n_overlap - 1 previous ones
+        if i_time - n_overlap < 0:
+            curr_sol = np.mean(sol_single[0:i_time + 1], axis=0)
         else:
-            source_power[k, 0] = sp_temp.trace()
+            curr_sol = np.mean(sol_single[i_time - n_overlap + 1:
+                                          i_time + 1], axis=0)
 
-    logger.info('[done]')
+        # The final result for the current time point in the current
+        # frequency bin
+        sol_overlap.append(curr_sol)
+    return sol_overlap
 
-    subject = _subject_from_forward(forward)
-    return SourceEstimate(source_power, vertices=vertno, tmin=1,
-                          tstep=1, subject=subject)
+
+def _window_covs(data, tslices):
+    """Helper to compute the covariances of epochs data in time windows
+
+    The cross-products of data (n_epochs, n_channels, n_times) are computed
+    only once for the segments between consecutive window boundaries and
+    cumulated, each window covariance being the difference of two cumulative
+    sums.
+    """
+    bounds = np.unique([b for tslice in tslices
+                        for b in (tslice.start, tslice.stop)])
+    n_channels = data.shape[1]
+    cross = np.zeros((len(bounds), n_channels, n_channels))
+    for ii in range(len(bounds) - 1):
+        segment = data[:, :, bounds[ii]:bounds[ii + 1]]
+        segment = np.hstack(segment)
+        cross[ii + 1] = cross[ii] + np.dot(segment, segment.T)
+    covs = list()
+    for tslice in tslices:
+        start, stop = np.searchsorted(bounds, [tslice.start, tslice.stop])
+        n_samples = len(data) * (tslice.stop - tslice.start)
+        covs.append((cross[stop] - cross[start]) / n_samples)
+    return covs
+
+
+def _tf_lcmv_band(epochs, raw, raw_picks, forward, noise_cov, l_freq, h_freq,
+                  windows, subtract_evoked, reg, label, pick_ori, n_jobs):
+    """Helper to compute the TF-LCMV source power of one frequency bin"""
+    raw_band = raw.copy()
+    raw_band.filter(l_freq, h_freq, picks=raw_picks, method='iir',
+                    n_jobs=n_jobs)
+    raw_band.info['highpass'] = l_freq
+    raw_band.info['lowpass'] = h_freq
+    epochs_band = Epochs(raw_band, epochs.events, epochs.event_id,
+                         tmin=epochs.tmin, tmax=epochs.tmax, baseline=None,
+                         picks=raw_picks, proj=epochs.proj, preload=True)
+    del raw_band
+
+    if subtract_evoked:
+        epochs_band.subtract_evoked()
+
+    # The whitened leadfield is the same for all the time windows
+    info = epochs_band.info
+    is_free_ori, picks, ch_names, proj, vertno, G =\
+        _prepare_beamformer_input(info, forward, label, None, pick_ori)
+    whitener, _ = compute_whitener(noise_cov, info, picks)
+    G = np.dot(whitener, G)
+    n_orient = 3 if is_free_ori else 1
+
+    tslices = list()
+    for win_tmin, win_tmax in [w for w in windows if w is not None]:
+        logger.info('Computing time-frequency LCMV beamformer for '
+                    'time window %d to %d ms, in frequency range '
+                    '%d to %d Hz' % (win_tmin * 1e3, win_tmax * 1e3,
+                                     l_freq, h_freq))
+        # Counteracts unsafe floating point arithmetic ensuring all
+        # relevant samples will be taken into account when selecting
+        # data in time windows
+        tslices.append(_get_tslice(epochs_band, win_tmin - 1e-10,
+                                   win_tmax + 1e-10))
+
+    # Calculating data covariances from filtered epochs in all the time
+    # windows at once
+    data_covs = _window_covs(epochs_band.get_data()[:, picks], tslices)
+    sol_single = [_lcmv_power(G, data_cov, whitener, proj,
+                              len(info['projs']) > 0, n_orient, reg, pick_ori)
+                  for data_cov in data_covs]
+    return sol_single, vertno
 
 
 @verbose
@@ -595,8 +748,9 @@ def tf_lcmv(epochs, forward, noise_covs, tmin, tmax, tstep, win_lengths,
         If 'normal', rather than pooling the orientations by taking the norm,
         only the radial component is kept.
     n_jobs : int | str
-        Number of jobs to run in parallel. Can be 'cuda' if scikits.cuda
-        is installed properly and CUDA is initialized.
+        Number of jobs to run in parallel (over frequency bins). Can be
+        'cuda' if scikits.cuda is installed properly and CUDA is initialized,
+        in which case the filtering is done on the GPU.
     verbose : bool, str, int, or None
         If not None, override default verbose level (see mne.verbose).
 
@@ -641,85 +795,36 @@ def tf_lcmv(epochs, forward, noise_covs, tmin, tmax, tstep, win_lengths,
 
     # Multiplying by 1e3 to avoid numerical issues, e.g. 0.3 // 0.05 == 5
     n_time_steps = int(((tmax - tmin) * 1e3) // (tstep * 1e3))
+    windows = [_tf_windows(epochs.times, tmin, tmax, tstep, win_length,
+                           n_time_steps) for win_length in win_lengths]
+
+    # Frequency bins are processed in parallel, unless filtering with CUDA
+    if n_jobs == 'cuda':
+        n_jobs_filter, n_jobs = 'cuda', 1
+    else:
+        n_jobs_filter = 1
+    parallel, p_fun, _ = parallel_func(_tf_lcmv_band, n_jobs)
+    out = parallel(p_fun(epochs, raw, raw_picks, forward, noise_cov, l_freq,
+                         h_freq, these_windows, subtract_evoked, reg, label,
+                         pick_ori, n_jobs_filter)
+                   for (l_freq, h_freq), these_windows, noise_cov in
+                   zip(freq_bins, windows, noise_covs))
 
     sol_final = []
-    for (l_freq, h_freq), win_length, noise_cov in \
-            zip(freq_bins, win_lengths, noise_covs):
+    for (sol_single, vertno), win_length in zip(out, win_lengths):
         n_overlap = int((win_length * 1e3) // (tstep * 1e3))
-
-        raw_band = raw.copy()
-        raw_band.filter(l_freq, h_freq, picks=raw_picks, method='iir',
-                        n_jobs=n_jobs)
-        raw_band.info['highpass'] = l_freq
-        raw_band.info['lowpass'] = h_freq
-        epochs_band = Epochs(raw_band, epochs.events, epochs.event_id,
-                             tmin=epochs.tmin, tmax=epochs.tmax, baseline=None,
-                             picks=raw_picks, proj=epochs.proj, preload=True)
-        del raw_band
-
-        if subtract_evoked:
-            epochs_band.subtract_evoked()
-
-        sol_single = []
-        sol_overlap = []
-        for i_time in range(n_time_steps):
-            win_tmin = tmin + i_time * tstep
-            win_tmax = win_tmin + win_length
-
-            # If in the last step the last time point was not covered in
-            # previous steps and will not be covered now, a solution needs to
-            # be calculated for an additional time window
-            if i_time == n_time_steps - 1 and win_tmax - tstep < tmax and\
-               win_tmax >= tmax + (epochs.times[-1] - epochs.times[-2]):
-                warnings.warn('Adding a time window to cover last time points')
-                win_tmin = tmax - win_length
-                win_tmax = tmax
-
-            if win_tmax < tmax + (epochs.times[-1] - epochs.times[-2]):
-                logger.info('Computing time-frequency LCMV beamformer for '
-                            'time window %d to %d ms, in frequency range '
-                            '%d to %d Hz' % (win_tmin * 1e3, win_tmax * 1e3,
-                                             l_freq, h_freq))
-
-                # Counteracts unsafe floating point arithmetic ensuring all
-                # relevant samples will be taken into account when selecting
-                # data in time windows
-                win_tmin = win_tmin - 1e-10
-                win_tmax = win_tmax + 1e-10
-
-                # Calculating data covariance from filtered epochs in current
-                # time window
-                data_cov = compute_covariance(epochs_band, tmin=win_tmin,
-                                              tmax=win_tmax)
-
-                stc = _lcmv_source_power(epochs_band.info, forward, noise_cov,
-                                         data_cov, reg=reg, label=label,
-                                         pick_ori=pick_ori, verbose=verbose)
-                sol_single.append(stc.data[:, 0])
-
-            # Average over all time windows that contain the current time
-            # point, which is the current time window along with
-            # n_overlap - 1 previous ones
-            if i_time - n_overlap < 0:
-                curr_sol = np.mean(sol_single[0:i_time + 1], axis=0)
-            else:
-                curr_sol = np.mean(sol_single[i_time - n_overlap + 1:
-                                              i_time + 1], axis=0)
-
-            # The final result for the current time point in the current
-            # frequency bin
-            sol_overlap.append(curr_sol)
-
         # Gathering solutions for all time points for current frequency bin
-        sol_final.append(sol_overlap)
+        sol_final.append(_tf_overlap_average(sol_single, n_time_steps,
+                                             n_overlap))
 
     sol_final = np.array(sol_final)
 
     # Creating stc objects containing all time points for each frequency bin
+    subject = _subject_from_forward(forward)
     stcs = []
     for i_freq, _ in enumerate(freq_bins):
-        stc = SourceEstimate(sol_final[i_freq, :, :].T, vertices=stc.vertices,
-                             tmin=tmin, tstep=tstep, subject=stc.subject)
+        stc = SourceEstimate(sol_final[i_freq, :, :].T, vertices=vertno,
+                             tmin=tmin, tstep=tstep, subject=subject)
         stcs.append(stc)
 
     return stcs
@@ -2,14 +2,18 @@ import os.path as op
 
 from nose.tools import assert_true, assert_raises
 import numpy as np
-from numpy.testing import assert_array_almost_equal, assert_array_equal
+from numpy.testing import (assert_array_almost_equal, assert_array_equal,
+                           assert_allclose)
 import warnings
 
 import mne
 from mne import compute_covariance
 from mne.datasets import testing
 from mne.beamformer import lcmv, lcmv_epochs, lcmv_raw, tf_lcmv
-from mne.beamformer._lcmv import _lcmv_source_power
+from mne.beamformer._lcmv import (_lcmv_source_power, _normalize_filters,
+                                  _filter_diag_quad, _window_covs,
+                                  _tf_windows)
+from mne.cov import _get_tslice
 from mne.externals.six import advance_iterator
 from mne.utils import run_tests_if_main, slow_test
 
@@ -190,6 +194,68 @@ def test_lcmv():
     assert_array_almost_equal(stcs_label[0].data, stcs[0].in_label(label).data)
 
 
+def test_normalize_filters():
+    """Test computation of the filters of all sources at once
+    """
+    rng = np.random.RandomState(0)
+    n_channels, n_sources = 20, 50
+    G = rng.randn(n_channels, 3 * n_sources)
+    A = rng.randn(n_channels, 2 * n_channels)
+    Cm_inv = np.linalg.inv(np.dot(A, A.T))
+    W = np.dot(G.T, Cm_inv)
+    W_free = _normalize_filters(W.copy(), G, 3)
+    W_max = _normalize_filters(W.copy(), G, 3, 'max-power')
+    W_fixed = _normalize_filters(W[::3].copy(), G[:, ::3], 1)
+    assert_array_equal(W_max.shape, (n_sources, n_channels))
+    for k in range(n_sources):
+        Wk, Gk = W[3 * k:3 * k + 3], G[:, 3 * k:3 * k + 3]
+        Ck = np.dot(Wk, Gk)
+        assert_allclose(W_free[3 * k:3 * k + 3],
+                        np.dot(np.linalg.pinv(Ck, 0.1), Wk), rtol=1e-7)
+        assert_allclose(W_fixed[k], Wk[0] / Ck[0, 0], rtol=1e-7)
+        eig_vals, eig_vecs = np.linalg.eigh(Ck)
+        max_ori = eig_vecs[:, 1]
+        # same filter up to its sign
+        Wk = np.dot(max_ori, Wk) / np.dot(max_ori, np.dot(Ck, max_ori))
+        assert_allclose(np.abs(np.dot(W_max[k], Wk)), np.dot(Wk, Wk),
+                        rtol=1e-7)
+    # unit gain
+    assert_allclose(np.sum(W_fixed * G[:, ::3].T, axis=1), 1., rtol=1e-7)
+    assert_allclose(_filter_diag_quad(W_free, np.eye(n_channels)),
+                    np.sum(W_free ** 2, axis=1), rtol=1e-7)
+
+
+def test_window_covs():
+    """Test computation of the covariances of overlapping time windows
+    """
+    rng = np.random.RandomState(0)
+    n_epochs, n_channels, sfreq = 5, 4, 100.
+    info = mne.create_info(['EEG %03d' % ii for ii in range(n_channels)],
+                           sfreq, ['eeg'] * n_channels)
+    info['highpass'] = 0.
+    data = rng.randn(n_epochs, n_channels, 60)
+    events = np.c_[np.arange(n_epochs) * 100, np.zeros(n_epochs, int),
+                   np.ones(n_epochs, int)]
+    epochs = mne.EpochsArray(data, info, events, tmin=-0.1)
+    tmin, tmax, tstep = -0.1, 0.45, 0.1
+    n_time_steps = int(((tmax - tmin) * 1e3) // (tstep * 1e3))
+    with warnings.catch_warnings(record=True) as w:
+        windows = _tf_windows(epochs.times, tmin, tmax, tstep, 0.2,
+                              n_time_steps)
+    # an additional window covers the last time points
+    assert_true(len(w) == 1)
+    assert_allclose(windows[-1], [tmax - 0.2, tmax])
+    assert_allclose(np.diff([win[0] for win in windows[:-1]]), tstep)
+    tslices = [_get_tslice(epochs, w[0] - 1e-10, w[1] + 1e-10)
+               for w in windows]
+    covs = _window_covs(epochs.get_data(), tslices)
+    assert_true(len(covs) == len(windows))
+    for (win_tmin, win_tmax), cov in zip(windows, covs):
+        cov_ref = compute_covariance(epochs, tmin=win_tmin - 1e-10,
+                                     tmax=win_tmax + 1e-10)
+        assert_allclose(cov, cov_ref.data, rtol=1e-10)
+
+
 @testing.requires_testing_data
 def test_lcmv_raw():
     """Test LCMV with raw data
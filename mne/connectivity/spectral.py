@@ -5,6 +5,7 @@
 from ..externals.six import string_types
 from warnings import warn
 from inspect import getargspec, getmembers
+import tempfile
 
 import numpy as np
 from scipy.fftpack import fftfreq
@@ -15,8 +16,7 @@ from ..parallel import parallel_func
 from ..source_estimate import _BaseSourceEstimate
 from .. import Epochs
 from ..time_frequency.multitaper import (dpss_windows, _mt_spectra,
-                                         _psd_from_mt, _csd_from_mt,
-                                         _psd_from_mt_adaptive)
+                                         _psd_from_mt, _psd_from_mt_adaptive)
 from ..time_frequency.tfr import morlet, cwt
 from ..utils import logger, verbose
 
@@ -24,6 +24,15 @@ from ..utils import logger, verbose
 # Various connectivity estimators
 
 
+def _zeros(shape, dtype, memmap_dir=None):
+    """Zeros in memory, or in a temporary file in memmap_dir"""
+    if memmap_dir is None or np.prod(shape) == 0:
+        return np.zeros(shape, dtype=dtype)
+    # the file is removed when the array is no longer used
+    with tempfile.TemporaryFile(dir=memmap_dir) as fid:
+        return np.memmap(fid, dtype=dtype, mode='w+', shape=shape)
+
+
 class _AbstractConEstBase(object):
     """Abstract base class for all connectivity estimators, specifies
        the interface but doesn't do anything"""
@@ -43,10 +52,11 @@ class _AbstractConEstBase(object):
 
 class _EpochMeanConEstBase(_AbstractConEstBase):
     """Base class for methods that estimate connectivity as mean over epochs"""
-    def __init__(self, n_cons, n_freqs, n_times):
+    def __init__(self, n_cons, n_freqs, n_times, memmap_dir=None):
         self.n_cons = n_cons
         self.n_freqs = n_freqs
         self.n_times = n_times
+        self.memmap_dir = memmap_dir
 
         if n_times == 0:
             self.csd_shape = (n_cons, n_freqs)
@@ -63,14 +73,18 @@ class _EpochMeanConEstBase(_AbstractConEstBase):
         """Include con. accumated for some epochs in this estimate"""
         self._acc += other._acc
 
+    def _zeros(self, shape, dtype=np.float64):
+        """Allocate an accumulator or the con. scores"""
+        return _zeros(shape, dtype, self.memmap_dir)
+
 
 class _CohEstBase(_EpochMeanConEstBase):
     """Base Estimator for Coherence, Coherency, Imag. Coherence"""
-    def __init__(self, n_cons, n_freqs, n_times):
-        super(_CohEstBase, self).__init__(n_cons, n_freqs, n_times)
+    def __init__(self, n_cons, n_freqs, n_times, memmap_dir=None):
+        super(_CohEstBase, self).__init__(n_cons, n_freqs, n_times, memmap_dir)
 
         # allocate space for accumulation of CSD
-        self._acc = np.zeros(self.csd_shape, dtype=np.complex128)
+        self._acc = self._zeros(self.csd_shape, dtype=np.complex128)
 
     def accumulate(self, con_idx, csd_xy):
         """Accumulate CSD for some connections"""
@@ -84,7 +98,7 @@ class _CohEst(_CohEstBase):
     def compute_con(self, con_idx, n_epochs, psd_xx, psd_yy):
         """Compute final con. score for some connections"""
         if self.con_scores is None:
-            self.con_scores = np.zeros(self.csd_shape)
+            self.con_scores = self._zeros(self.csd_shape)
         csd_mean = self._acc[con_idx] / n_epochs
         self.con_scores[con_idx] = np.abs(csd_mean) / np.sqrt(psd_xx * psd_yy)
 
@@ -96,8 +110,8 @@ class _CohyEst(_CohEstBase):
     def compute_con(self, con_idx, n_epochs, psd_xx, psd_yy):
         """Compute final con. score for some connections"""
         if self.con_scores is None:
-            self.con_scores = np.zeros(self.csd_shape,
-                                       dtype=np.complex128)
+            self.con_scores = self._zeros(self.csd_shape,
+                                          dtype=np.complex128)
         csd_mean = self._acc[con_idx] / n_epochs
         self.con_scores[con_idx] = csd_mean / np.sqrt(psd_xx * psd_yy)
 
@@ -109,7 +123,7 @@ class _ImCohEst(_CohEstBase):
     def compute_con(self, con_idx, n_epochs, psd_xx, psd_yy):
         """Compute final con. score for some connections"""
         if self.con_scores is None:
-            self.con_scores = np.zeros(self.csd_shape)
+            self.con_scores = self._zeros(self.csd_shape)
         csd_mean = self._acc[con_idx] / n_epochs
         self.con_scores[con_idx] = np.imag(csd_mean) / np.sqrt(psd_xx * psd_yy)
 
@@ -118,11 +132,11 @@ class _PLVEst(_EpochMeanConEstBase):
     """PLV Estimator"""
     name = 'PLV'
 
-    def __init__(self, n_cons, n_freqs, n_times):
-        super(_PLVEst, self).__init__(n_cons, n_freqs, n_times)
+    def __init__(self, n_cons, n_freqs, n_times, memmap_dir=None):
+        super(_PLVEst, self).__init__(n_cons, n_freqs, n_times, memmap_dir)
 
         # allocate accumulator
-        self._acc = np.zeros(self.csd_shape, dtype=np.complex128)
+        self._acc = self._zeros(self.csd_shape, dtype=np.complex128)
 
     def accumulate(self, con_idx, csd_xy):
         """Accumulate some connections"""
@@ -131,8 +145,8 @@ class _PLVEst(_EpochMeanConEstBase):
     def compute_con(self, con_idx, n_epochs):
         """Compute final con. score for some connections"""
         if self.con_scores is None:
-            self.con_scores = np.zeros(self.csd_shape)
-        plv = np.abs(self._acc / n_epochs)
+            self.con_scores = self._zeros(self.csd_shape)
+        plv = np.abs(self._acc[con_idx] / n_epochs)
         self.con_scores[con_idx] = plv
 
 
@@ -140,11 +154,11 @@ class _PLIEst(_EpochMeanConEstBase):
     """PLI Estimator"""
     name = 'PLI'
 
-    def __init__(self, n_cons, n_freqs, n_times):
-        super(_PLIEst, self).__init__(n_cons, n_freqs, n_times)
+    def __init__(self, n_cons, n_freqs, n_times, memmap_dir=None):
+        super(_PLIEst, self).__init__(n_cons, n_freqs, n_times, memmap_dir)
 
         # allocate accumulator
-        self._acc = np.zeros(self.csd_shape)
+        self._acc = self._zeros(self.csd_shape)
 
     def accumulate(self, con_idx, csd_xy):
         """Accumulate some connections"""
@@ -153,7 +167,7 @@ class _PLIEst(_EpochMeanConEstBase):
     def compute_con(self, con_idx, n_epochs):
         """Compute final con. score for some connections"""
         if self.con_scores is None:
-            self.con_scores = np.zeros(self.csd_shape)
+            self.con_scores = self._zeros(self.csd_shape)
         pli_mean = self._acc[con_idx] / n_epochs
         self.con_scores[con_idx] = np.abs(pli_mean)
 
@@ -165,7 +179,7 @@ class _PLIUnbiasedEst(_PLIEst):
     def compute_con(self, con_idx, n_epochs):
         """Compute final con. score for some connections"""
         if self.con_scores is None:
-            self.con_scores = np.zeros(self.csd_shape)
+            self.con_scores = self._zeros(self.csd_shape)
         pli_mean = self._acc[con_idx] / n_epochs
 
         # See Vinck paper Eq. (30)
@@ -178,12 +192,12 @@ class _WPLIEst(_EpochMeanConEstBase):
     """WPLI Estimator"""
     name = 'WPLI'
 
-    def __init__(self, n_cons, n_freqs, n_times):
-        super(_WPLIEst, self).__init__(n_cons, n_freqs, n_times)
+    def __init__(self, n_cons, n_freqs, n_times, memmap_dir=None):
+        super(_WPLIEst, self).__init__(n_cons, n_freqs, n_times, memmap_dir)
 
         # store  both imag(csd) and abs(imag(csd))
         acc_shape = (2,) + self.csd_shape
-        self._acc = np.zeros(acc_shape)
+        self._acc = self._zeros(acc_shape)
 
     def accumulate(self, con_idx, csd_xy):
         """Accumulate some connections"""
@@ -194,7 +208,7 @@ class _WPLIEst(_EpochMeanConEstBase):
     def compute_con(self, con_idx, n_epochs):
         """Compute final con. score for some connections"""
         if self.con_scores is None:
-            self.con_scores = np.zeros(self.csd_shape)
+            self.con_scores = self._zeros(self.csd_shape)
 
         num = np.abs(self._acc[0, con_idx])
         denom = self._acc[1, con_idx]
@@ -215,11 +229,12 @@ class _WPLIDebiasedEst(_EpochMeanConEstBase):
     """Debiased WPLI Square Estimator"""
     name = 'Debiased WPLI Square'
 
-    def __init__(self, n_cons, n_freqs, n_times):
-        super(_WPLIDebiasedEst, self).__init__(n_cons, n_freqs, n_times)
+    def __init__(self, n_cons, n_freqs, n_times, memmap_dir=None):
+        super(_WPLIDebiasedEst, self).__init__(n_cons, n_freqs, n_times,
+                                               memmap_dir)
         # store imag(csd), abs(imag(csd)), imag(csd)^2
         acc_shape = (3,) + self.csd_shape
-        self._acc = np.zeros(acc_shape)
+        self._acc = self._zeros(acc_shape)
 
     def accumulate(self, con_idx, csd_xy):
         """Accumulate some connections"""
@@ -231,7 +246,7 @@ class _WPLIDebiasedEst(_EpochMeanConEstBase):
     def compute_con(self, con_idx, n_epochs):
         """Compute final con. score for some connections"""
         if self.con_scores is None:
-            self.con_scores = np.zeros(self.csd_shape)
+            self.con_scores = self._zeros(self.csd_shape)
 
         # note: we use the trick from fieldtrip to compute the
         # the estimate over all pairwise epoch combinations
@@ -257,11 +272,11 @@ class _PPCEst(_EpochMeanConEstBase):
     """Pairwise Phase Consistency (PPC) Estimator"""
     name = 'PPC'
 
-    def __init__(self, n_cons, n_freqs, n_times):
-        super(_PPCEst, self).__init__(n_cons, n_freqs, n_times)
+    def __init__(self, n_cons, n_freqs, n_times, memmap_dir=None):
+        super(_PPCEst, self).__init__(n_cons, n_freqs, n_times, memmap_dir)
 
         # store csd / abs(csd)
-        self._acc = np.zeros(self.csd_shape, dtype=np.complex128)
+        self._acc = self._zeros(self.csd_shape, dtype=np.complex128)
 
     def accumulate(self, con_idx, csd_xy):
         """Accumulate some connections"""
@@ -276,7 +291,7 @@ class _PPCEst(_EpochMeanConEstBase):
     def compute_con(self, con_idx, n_epochs):
         """Compute final con. score for some connections"""
         if self.con_scores is None:
-            self.con_scores = np.zeros(self.csd_shape)
+            self.con_scores = self._zeros(self.csd_shape)
 
         # note: we use the trick from fieldtrip to compute the
         # the estimate over all pairwise epoch combinations
@@ -292,23 +307,11 @@ def _epoch_spectral_connectivity(data, sig_idx, tmin_idx, tmax_idx, sfreq,
                                  freq_mask, mt_adaptive, idx_map, block_size,
                                  psd, accumulate_psd, con_method_types,
                                  con_methods, n_signals, n_times,
-                                 accumulate_inplace=True):
+                                 con_tiles=None, decim=1):
     """Connectivity estimation for one epoch see spectral_connectivity"""
 
     n_cons = len(idx_map[0])
 
-    if wavelets is not None:
-        n_times_spectrum = n_times
-        n_freqs = len(wavelets)
-    else:
-        n_times_spectrum = 0
-        n_freqs = np.sum(freq_mask)
-
-    if not accumulate_inplace:
-        # instantiate methods only for this epoch (used in parallel mode)
-        con_methods = [mtype(n_cons, n_freqs, n_times_spectrum)
-                       for mtype in con_method_types]
-
     if len(sig_idx) == n_signals:
         # we use all signals: use a slice for faster indexing
         sig_idx = slice(None, None)
@@ -316,6 +319,7 @@ def _epoch_spectral_connectivity(data, sig_idx, tmin_idx, tmax_idx, sfreq,
     # compute tapered spectra
     if mode in ['multitaper', 'fourier']:
         x_mt = list()
+        x_weights = list()
         this_psd = list()
         sig_pos_start = 0
         for this_data in data:
@@ -357,16 +361,19 @@ def _epoch_spectral_connectivity(data, sig_idx, tmin_idx, tmax_idx, sfreq,
                     _this_psd = _psd_from_mt(this_x_mt, weights)
 
             x_mt.append(this_x_mt)
+            x_weights.append(weights)
             if accumulate_psd:
                 this_psd.append(_this_psd)
 
+            # advance position
+            sig_pos_start = sig_pos_end
+
         x_mt = np.concatenate(x_mt, axis=0)
+        if mt_adaptive:
+            weights = np.concatenate(x_weights, axis=0)
         if accumulate_psd:
             this_psd = np.concatenate(this_psd, axis=0)
 
-        # advance position
-        sig_pos_start = sig_pos_end
-
     elif mode == 'cwt_morlet':
         # estimate spectra using CWT
         x_cwt = list()
@@ -382,13 +389,14 @@ def _epoch_spectral_connectivity(data, sig_idx, tmin_idx, tmax_idx, sfreq,
                 this_sig_idx = sig_idx
             if isinstance(this_data, _BaseSourceEstimate):
                 cwt_partial = partial(cwt, Ws=wavelets, use_fft=True,
-                                      mode='same')
+                                      mode='same', decim=decim)
                 this_x_cwt = this_data.transform_data(
                     cwt_partial, idx=this_sig_idx, tmin_idx=tmin_idx,
                     tmax_idx=tmax_idx)
             else:
                 this_x_cwt = cwt(this_data[this_sig_idx, tmin_idx:tmax_idx],
-                                 wavelets, use_fft=True, mode='same')
+                                 wavelets, use_fft=True, mode='same',
+                                 decim=decim)
 
             if accumulate_psd:
                 this_psd.append((this_x_cwt * this_x_cwt.conj()).real)
@@ -404,14 +412,9 @@ def _epoch_spectral_connectivity(data, sig_idx, tmin_idx, tmax_idx, sfreq,
     else:
         raise RuntimeError('invalid mode')
 
-    # accumulate or return psd
+    # accumulate psd
     if accumulate_psd:
-        if accumulate_inplace:
-            psd += this_psd
-        else:
-            psd = this_psd
-    else:
-        psd = None
+        psd += this_psd
 
     # tell the methods that a new epoch starts
     for method in con_methods:
@@ -419,18 +422,16 @@ def _epoch_spectral_connectivity(data, sig_idx, tmin_idx, tmax_idx, sfreq,
 
     # accumulate connectivity scores
     if mode in ['multitaper', 'fourier']:
-        for i in range(0, n_cons, block_size):
-            con_idx = slice(i, i + block_size)
-            if mt_adaptive:
-                csd = _csd_from_mt(x_mt[idx_map[0][con_idx]],
-                                   x_mt[idx_map[1][con_idx]],
-                                   weights[idx_map[0][con_idx]],
-                                   weights[idx_map[1][con_idx]])
-            else:
-                csd = _csd_from_mt(x_mt[idx_map[0][con_idx]],
-                                   x_mt[idx_map[1][con_idx]],
-                                   weights, weights)
-
+        # weight and normalize the tapered spectra, such that the CSD of
+        # two signals is the sum over tapers of the products of their
+        # spectra (see _csd_from_mt), and use the layout
+        # (n_freqs, n_signals, n_tapers) for fast products
+        norm = np.sqrt(2. / np.sum(weights * weights, axis=-2))
+        x_mt = x_mt * weights
+        x_mt *= norm[..., np.newaxis, :]
+        x_mt = np.ascontiguousarray(np.transpose(x_mt, (2, 0, 1)))
+        for con_idx, tile in con_tiles:
+            csd = _csd_tile(x_mt, *tile)
             for method in con_methods:
                 method.accumulate(con_idx, csd)
     else:
@@ -446,6 +447,112 @@ def _epoch_spectral_connectivity(data, sig_idx, tmin_idx, tmax_idx, sfreq,
     return con_methods, psd
 
 
+def _shard_spectral_connectivity(epochs, sig_idx, tmin_idx, tmax_idx,
+                                 sfreq, mode, window_fun, eigvals, wavelets,
+                                 freq_mask, mt_adaptive, idx_map, block_size,
+                                 accumulate_psd, con_method_types, n_signals,
+                                 n_times, con_tiles, decim, n_times_in,
+                                 times_in):
+    """Connectivity estimation for several epochs (used in parallel mode)
+
+    The estimators and the PSD are accumulated over the epochs, such that
+    only one set of them is returned for all epochs, together with the
+    number of epochs.
+    """
+    n_cons = len(idx_map[0])
+    if wavelets is not None:
+        n_times_spectrum = len(range(0, n_times, decim))
+        n_freqs = len(wavelets)
+    else:
+        n_times_spectrum = 0
+        n_freqs = np.sum(freq_mask)
+    con_methods = [mtype(n_cons, n_freqs, n_times_spectrum)
+                   for mtype in con_method_types]
+    psd = None
+    if accumulate_psd:
+        if n_times_spectrum == 0:
+            psd = np.zeros((len(sig_idx), n_freqs))
+        else:
+            psd = np.zeros((len(sig_idx), n_freqs, n_times_spectrum))
+    n_epochs = 0
+    for this_epoch in epochs:
+        if not isinstance(this_epoch, (list, tuple)):
+            this_epoch = (this_epoch,)
+        _get_and_verify_data_sizes(this_epoch, n_signals, n_times_in,
+                                   times_in)
+        _epoch_spectral_connectivity(
+            this_epoch, sig_idx, tmin_idx, tmax_idx, sfreq, mode, window_fun,
+            eigvals, wavelets, freq_mask, mt_adaptive, idx_map, block_size,
+            psd, accumulate_psd, con_method_types, con_methods, n_signals,
+            n_times, con_tiles=con_tiles, decim=decim)
+        n_epochs += 1
+    return con_methods, psd, n_epochs
+
+
+def _split_epochs(data, n_jobs):
+    """Split an array, a list or Epochs in one shard of epochs per job"""
+    n_epochs = len(data.events) if isinstance(data, Epochs) else len(data)
+    shards = list()
+    for idx in np.array_split(np.arange(n_epochs), n_jobs):
+        if len(idx) == 0:
+            continue
+        if isinstance(data, Epochs):
+            shards.append(data[idx])
+        else:
+            shards.append(data[idx[0]:idx[-1] + 1])
+    return shards
+
+
+def _get_con_tiles(idx_map, block_size):
+    """Group the connections by tiles of signals
+
+    Each tile has at most block_size connections. Returns a list of
+    (con_idx, tile) tuples, where con_idx are the positions of the
+    connections of the tile in idx_map (a slice if they are contiguous)
+    and tile is used by _csd_tile.
+    """
+    tile_size = max(1, int(np.sqrt(block_size)))
+    tile_x, tile_y = idx_map[0] // tile_size, idx_map[1] // tile_size
+    order = np.lexsort((idx_map[1], idx_map[0], tile_y, tile_x))
+    tile_x, tile_y = tile_x[order], tile_y[order]
+    bounds = np.where((np.diff(tile_x) != 0) | (np.diff(tile_y) != 0))[0]
+    bounds = np.r_[0, bounds + 1, len(order)]
+    con_tiles = list()
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        con_idx = order[start:stop]
+        if np.all(np.diff(con_idx) == 1):
+            con_idx = slice(con_idx[0], con_idx[-1] + 1)
+        sig_x, idx_x = np.unique(idx_map[0][con_idx], return_inverse=True)
+        sig_y, idx_y = np.unique(idx_map[1][con_idx], return_inverse=True)
+        con_tiles.append((con_idx, (sig_x, idx_x, sig_y, idx_y)))
+    return con_tiles
+
+
+def _csd_tile(x_mt, sig_x, idx_x, sig_y, idx_y):
+    """CSD for the connections of a tile from normalized tapered spectra
+
+    x_mt has shape (n_freqs, n_signals, n_tapers), the connections are
+    between signals sig_x[idx_x] and sig_y[idx_y].
+    """
+    n_freqs = x_mt.shape[0]
+    n_cons = len(idx_x)
+    if 4 * n_cons < len(sig_x) * len(sig_y):
+        # sparse tile, compute the connections directly
+        csd = np.sum(x_mt[:, sig_x[idx_x]] * x_mt[:, sig_y[idx_y]].conj(),
+                     axis=-1)
+        return csd.T
+    x = x_mt[:, sig_x]
+    y = x_mt[:, sig_y].conj()
+    csd = np.empty((n_cons, n_freqs), dtype=np.complex128)
+    for fi in range(n_freqs):
+        csd[:, fi] = np.dot(x[fi], y[fi].T)[idx_x, idx_y]
+    return csd
+
+
+# number of epochs per job read at once from generators with n_jobs > 1
+_n_epochs_block_job = 20
+
+
 def _get_n_epochs(epochs, n):
     """Generator that returns lists with at most n epochs"""
     epochs_out = []
@@ -517,8 +624,8 @@ def spectral_connectivity(data, method='coh', indices=None, sfreq=2 * np.pi,
                           fskip=0, faverage=False, tmin=None, tmax=None,
                           mt_bandwidth=None, mt_adaptive=False,
                           mt_low_bias=True, cwt_frequencies=None,
-                          cwt_n_cycles=7, block_size=1000, n_jobs=1,
-                          verbose=None):
+                          cwt_n_cycles=7, cwt_decim=1, block_size=1000,
+                          n_jobs=1, memmap_dir=None, verbose=None):
     """Compute various frequency-domain and time-frequency domain connectivity
     measures.
 
@@ -676,11 +783,24 @@ def spectral_connectivity(data, method='coh', indices=None, sfreq=2 * np.pi,
     cwt_n_cycles: float | array of float
         Number of cycles. Fixed number or one per frequency. Only used in
         'cwt_morlet' mode.
+    cwt_decim : int
+        Temporal decimation factor. The connectivity is only computed, and
+        the spectra are only kept, for every cwt_decim-th time point, which
+        reduces the memory requirements. Only used in 'cwt_morlet' mode.
     block_size : int
         How many connections to compute at once (higher numbers are faster
         but require more memory).
     n_jobs : int
-        How many epochs to process in parallel.
+        How many epochs to process in parallel. If data is an array, a list
+        or an Epochs instance, the epochs are split in one shard per job.
+        Otherwise (e.g., for a generator), the epochs are read in blocks of
+        20 epochs per job.
+    memmap_dir : str | None
+        If not None, the accumulators of the connectivity estimators and the
+        returned connectivity scores are stored in temporary memory-mapped
+        files in this directory instead of in memory, which makes it possible
+        to compute the connectivity between many signals. Note that with
+        n_jobs > 1, each job keeps accumulators for its epochs in memory.
     verbose : bool, str, int, or None
         If not None, override default verbose level (see mne.verbose).
 
@@ -705,9 +825,15 @@ def spectral_connectivity(data, method='coh', indices=None, sfreq=2 * np.pi,
         Otherwise None is returned.
     """
     if n_jobs > 1:
-        parallel, my_epoch_spectral_connectivity, _ = \
-            parallel_func(_epoch_spectral_connectivity, n_jobs,
+        parallel, my_shard_spectral_connectivity, n_jobs = \
+            parallel_func(_shard_spectral_connectivity, n_jobs,
                           verbose=verbose)
+    # with several jobs, an array, a list or Epochs is split in one shard of
+    # epochs per job, other inputs (e.g., generators) are read in blocks and
+    # each job processes a shard of every block
+    sharded = n_jobs > 1 and isinstance(data, (np.ndarray, list, tuple,
+                                               Epochs))
+    n_epochs_block = _n_epochs_block_job * n_jobs if n_jobs > 1 else 1
 
     # format fmin and fmax and check inputs
     if fmin is None:
@@ -762,7 +888,11 @@ def spectral_connectivity(data, method='coh', indices=None, sfreq=2 * np.pi,
     # (n_signals x n_times) arrays or SourceEstimates
     epoch_idx = 0
     logger.info('Connectivity computation...')
-    for epoch_block in _get_n_epochs(data, n_jobs):
+    epoch_blocks = _get_n_epochs(data, n_epochs_block)
+    if sharded:
+        # only read the first epoch here, to initialize everything
+        epoch_blocks = [next(_get_n_epochs(data, 1))]
+    for epoch_block in epoch_blocks:
 
         if epoch_idx == 0:
             # initialize everything
@@ -934,7 +1064,11 @@ def spectral_connectivity(data, method='coh', indices=None, sfreq=2 * np.pi,
                 eigvals = None
                 n_tapers = None
                 window_fun = None
-                n_times_spectrum = n_times
+                cwt_decim = int(cwt_decim)
+                if cwt_decim < 1:
+                    raise ValueError('cwt_decim must be a positive integer')
+                times = times[::cwt_decim]
+                n_times_spectrum = len(times)
             else:
                 raise ValueError('mode has an invalid value')
 
@@ -944,6 +1078,13 @@ def spectral_connectivity(data, method='coh', indices=None, sfreq=2 * np.pi,
             # map indices to unique indices
             idx_map = [np.searchsorted(sig_idx, ind) for ind in indices_use]
 
+            if mode in ['multitaper', 'fourier']:
+                # the connections are processed in tiles of signals, whose
+                # CSD are products of the tapered spectra
+                con_tiles = _get_con_tiles(idx_map, block_size)
+            else:
+                con_tiles = None
+
             # allocate space to accumulate PSD
             if accumulate_psd:
                 if n_times_spectrum == 0:
@@ -955,7 +1096,10 @@ def spectral_connectivity(data, method='coh', indices=None, sfreq=2 * np.pi,
                 psd = None
 
             # create instances of the connectivity estimators
-            con_methods = [mtype(n_cons, n_freqs, n_times_spectrum)
+            # custom methods only need to support memmap_dir if it is used
+            kwargs = dict() if memmap_dir is None else dict(
+                memmap_dir=memmap_dir)
+            con_methods = [mtype(n_cons, n_freqs, n_times_spectrum, **kwargs)
                            for mtype in con_method_types]
 
             sep = ', '
@@ -980,19 +1124,27 @@ def spectral_connectivity(data, method='coh', indices=None, sfreq=2 * np.pi,
                     tmax_idx, sfreq, mode, window_fun, eigvals, wavelets,
                     freq_mask, mt_adaptive, idx_map, block_size, psd,
                     accumulate_psd, con_method_types, con_methods,
-                    n_signals, n_times, accumulate_inplace=True)
+                    n_signals, n_times, con_tiles=con_tiles,
+                    decim=cwt_decim)
                 epoch_idx += 1
         else:
             # process epochs in parallel
-            logger.info('    computing connectivity for epochs %d..%d'
-                        % (epoch_idx + 1, epoch_idx + len(epoch_block)))
-
-            out = parallel(my_epoch_spectral_connectivity(
-                this_epoch, sig_idx,
+            if sharded:
+                logger.info('    computing connectivity for all epochs in '
+                            '%d jobs' % n_jobs)
+                shards = _split_epochs(data, n_jobs)
+            else:
+                logger.info('    computing connectivity for epochs %d..%d'
+                            % (epoch_idx + 1, epoch_idx + len(epoch_block)))
+                shards = [epoch_block[i::n_jobs] for i in range(n_jobs)
+                          if i < len(epoch_block)]
+            out = parallel(my_shard_spectral_connectivity(
+                shard, sig_idx,
                 tmin_idx, tmax_idx, sfreq, mode, window_fun, eigvals,
-                wavelets, freq_mask, mt_adaptive, idx_map, block_size, psd,
-                accumulate_psd, con_method_types, None, n_signals, n_times,
-                accumulate_inplace=False) for this_epoch in epoch_block)
+                wavelets, freq_mask, mt_adaptive, idx_map, block_size,
+                accumulate_psd, con_method_types, n_signals, n_times,
+                con_tiles, cwt_decim, n_times_in, times_in)
+                for shard in shards)
 
             # do the accumulation
             for this_out in out:
@@ -1000,8 +1152,7 @@ def spectral_connectivity(data, method='coh', indices=None, sfreq=2 * np.pi,
                     method.combine(parallel_method)
                 if accumulate_psd:
                     psd += this_out[1]
-
-            epoch_idx += len(epoch_block)
+                epoch_idx += this_out[2]
 
     # normalize
     n_epochs = epoch_idx
@@ -1022,8 +1173,9 @@ def spectral_connectivity(data, method='coh', indices=None, sfreq=2 * np.pi,
                 psd_yy = psd[idx_map[1][con_idx]]
                 method.compute_con(con_idx, n_epochs, psd_xx, psd_yy)
 
-        # get the connectivity scores
+        # get the connectivity scores, the accumulators are not needed anymore
         this_con = method.con_scores
+        method._acc = None
 
         if this_con.shape[0] != n_cons:
             raise ValueError('First dimension of connectivity scores must be '
@@ -1033,7 +1185,7 @@ def spectral_connectivity(data, method='coh', indices=None, sfreq=2 * np.pi,
                 raise ValueError('2nd dimension of connectivity scores must '
                                  'be the same as the number of frequencies')
             con_shape = (n_cons, n_bands) + this_con.shape[2:]
-            this_con_bands = np.empty(con_shape, dtype=this_con.dtype)
+            this_con_bands = _zeros(con_shape, this_con.dtype, memmap_dir)
             for band_idx in range(n_bands):
                 this_con_bands[:, band_idx] =\
                     np.mean(this_con[:, freq_idx_bands[band_idx]], axis=1)
@@ -1044,14 +1196,13 @@ def spectral_connectivity(data, method='coh', indices=None, sfreq=2 * np.pi,
     if indices is None:
         # return all-to-all connectivity matrices
         logger.info('    assembling connectivity matrix')
-        con_flat = con
-        con = []
-        for this_con_flat in con_flat:
-            this_con = np.zeros((n_signals, n_signals) +
-                                this_con_flat.shape[1:],
-                                dtype=this_con_flat.dtype)
+        for ii, this_con_flat in enumerate(con):
+            this_con = _zeros((n_signals, n_signals) +
+                              this_con_flat.shape[1:], this_con_flat.dtype,
+                              memmap_dir)
             this_con[indices_use] = this_con_flat
-            con.append(this_con)
+            con[ii] = this_con
+            del this_con_flat
 
     logger.info('[Connectivity computation done]')
 
@@ -1,14 +1,16 @@
 import numpy as np
-from numpy.testing import assert_array_almost_equal
+from numpy.testing import assert_array_almost_equal, assert_array_equal
 from nose.tools import assert_true, assert_raises
 import warnings
 
 from mne.fixes import tril_indices
 from mne.connectivity import spectral_connectivity
-from mne.connectivity.spectral import _CohEst
+from mne.connectivity.spectral import _CohEst, _get_con_tiles, _csd_tile
+from mne.time_frequency.multitaper import _csd_from_mt
 
-from mne import SourceEstimate
-from mne.utils import run_tests_if_main, slow_test
+from mne import SourceEstimate, Epochs, create_info
+from mne.io import RawArray
+from mne.utils import run_tests_if_main, slow_test, _TempDir
 from mne.filter import band_pass_filter
 
 warnings.simplefilter('always')
@@ -30,6 +32,88 @@ def _stc_gen(data, sfreq, tmin, combo=False):
             yield (arr, stc)
 
 
+def test_csd_tiles():
+    """Test tiled computation of the CSD of connections"""
+    rng = np.random.RandomState(0)
+    n_signals, n_tapers, n_freqs = 30, 3, 5
+    x_mt = rng.randn(n_signals, n_tapers, n_freqs) + \
+        1j * rng.randn(n_signals, n_tapers, n_freqs)
+    weights = rng.rand(n_signals, n_tapers, n_freqs)
+    # normalized spectra, as in _epoch_spectral_connectivity
+    x_norm = x_mt * weights * np.sqrt(2. / np.sum(weights ** 2, axis=1))[
+        :, np.newaxis, :]
+    x_norm = np.transpose(x_norm, (2, 0, 1))
+    for idx_map in (tril_indices(n_signals, -1),
+                    (np.array([0, 0, 5, 29, 3]), np.array([1, 29, 2, 0, 3]))):
+        con_tiles = _get_con_tiles(idx_map, 50)
+        n_cons = len(idx_map[0])
+        csd = np.zeros((n_cons, n_freqs), dtype=np.complex128)
+        n_tiled = np.zeros(n_cons, dtype=int)
+        for con_idx, tile in con_tiles:
+            n_tiled[con_idx] += 1
+            assert_true(len(n_tiled[con_idx]) <= 50)
+            csd[con_idx] = _csd_tile(x_norm, *tile)
+        assert_array_equal(n_tiled, 1)
+        csd_want = _csd_from_mt(x_mt[idx_map[0]], x_mt[idx_map[1]],
+                                weights[idx_map[0]], weights[idx_map[1]])
+        assert_array_almost_equal(csd, csd_want)
+
+
+def test_memmap_dir():
+    """Test connectivity with memory-mapped accumulators and scores"""
+    rng = np.random.RandomState(0)
+    data = rng.randn(4, 6, 200)
+    tempdir = _TempDir()
+    for kwargs in (dict(), dict(indices=([0, 5, 3], [2, 1, 4]), n_jobs=2),
+                   dict(fmin=(10., 30.), fmax=(20., 40.), faverage=True)):
+        con = spectral_connectivity(data, method=['coh', 'wpli', 'plv'],
+                                    sfreq=100., **kwargs)[0]
+        con_mm = spectral_connectivity(data, method=['coh', 'wpli', 'plv'],
+                                       sfreq=100., memmap_dir=tempdir,
+                                       **kwargs)[0]
+        for c, c_mm in zip(con, con_mm):
+            assert_true(isinstance(c_mm, np.memmap))
+            assert_array_almost_equal(c, c_mm)
+
+
+def test_epochs_shards():
+    """Test sharding the epochs across jobs"""
+    rng = np.random.RandomState(0)
+    info = create_info(['EEG %03d' % ii for ii in range(4)], 100.,
+                       ['eeg'] * 4)
+    raw = RawArray(rng.randn(4, 5000), info)
+    raw._data[1, 650] = 50.  # one epoch is rejected
+    events = np.array([[50 + 300 * ii, 0, 1] for ii in range(15)])
+    epochs = Epochs(raw, events, 1, 0, 2.99, baseline=None, preload=False,
+                    reject=dict(eeg=20.), add_eeg_ref=False)
+    for data in (epochs, epochs.get_data()):
+        con, _, _, n_epochs, _ = spectral_connectivity(data, sfreq=100.)
+        assert_true(n_epochs == 14)
+        for n_jobs in (2, 3):
+            con_j, _, _, n_epochs, _ = spectral_connectivity(
+                data, sfreq=100., n_jobs=n_jobs)
+            assert_true(n_epochs == 14)
+            assert_array_almost_equal(con, con_j)
+
+
+def test_cwt_decim():
+    """Test decimation of time-resolved wavelet connectivity"""
+    rng = np.random.RandomState(0)
+    data = rng.randn(3, 4, 300)
+    kwargs = dict(method=['plv', 'coh'], mode='cwt_morlet', sfreq=200.,
+                  cwt_frequencies=np.array([30., 50.]), tmin=0.2)
+    con, freqs, times, _, _ = spectral_connectivity(data, **kwargs)
+    for n_jobs in (1, 2):
+        con_d, freqs_d, times_d, _, _ = spectral_connectivity(
+            data, cwt_decim=3, n_jobs=n_jobs, **kwargs)
+        assert_array_almost_equal(times[::3], times_d)
+        for c, c_d in zip(con, con_d):
+            assert_true(c_d.shape == (4, 4, 2, len(times_d)))
+            assert_array_almost_equal(c[..., ::3], c_d)
+    assert_raises(ValueError, spectral_connectivity, data, cwt_decim=0,
+                  **kwargs)
+
+
 @slow_test
 def test_spectral_connectivity():
     """Test frequency-domain connectivity methods"""
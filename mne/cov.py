@@ -29,8 +29,11 @@ from .io.write import (start_block, end_block, write_int, write_name_list,
                        write_double, write_float_matrix, write_string)
 from .epochs import _is_good
 from .utils import (check_fname, logger, verbose, estimate_rank,
-                    _compute_row_norms, check_sklearn_version)
+                    _compute_row_norms, check_sklearn_version, object_hash,
+                    _BoundedCache, _gram_singular_values)
+from .parallel import parallel_func
 
+from .externals.six import string_types
 from .externals.six.moves import zip
 from .fixes import nanmean
 
@@ -212,10 +215,78 @@ def _check_n_samples(n_samples, n_chan):
         logger.warning(text)
 
 
+class _CovAccumulator(object):
+    """Streaming accumulator of the mean and covariance of data blocks
+
+    Blocks are combined with the pairwise update of Chan et al. (1979), a
+    generalization of Welford's algorithm, which remains accurate when the
+    mean is large compared to the variance. Accumulators filled with
+    different parts of the data (e.g., by different jobs) can be merged.
+
+    Parameters
+    ----------
+    n_channels : int
+        The number of channels.
+    """
+
+    def __init__(self, n_channels):
+        self.n_samples = 0
+        self.mean = np.zeros(n_channels)
+        self.cross = np.zeros((n_channels, n_channels))  # centered
+
+    def update(self, data):
+        """Add a block of data of shape (n_channels, n_times)"""
+        n_samples = data.shape[1]
+        if n_samples > 0:
+            mean = data.mean(axis=1)
+            data = data - mean[:, np.newaxis]
+            self._combine(n_samples, mean, np.dot(data, data.T))
+        return self
+
+    def merge(self, other):
+        """Add the statistics of another accumulator"""
+        self._combine(other.n_samples, other.mean, other.cross)
+        return self
+
+    def _combine(self, n_samples, mean, cross):
+        if n_samples == 0:
+            return
+        n_tot = self.n_samples + n_samples
+        delta = mean - self.mean
+        self.cross += cross
+        weight = self.n_samples * float(n_samples) / n_tot
+        self.cross += np.outer(delta, delta) * weight
+        self.mean += delta * (float(n_samples) / n_tot)
+        self.n_samples = n_tot
+
+    def get_cov(self, assume_centered=False, ddof=1):
+        """Get the covariance (or second moment if assume_centered)"""
+        cov = self.cross.copy()
+        if assume_centered:
+            cov += self.n_samples * np.outer(self.mean, self.mean)
+        cov /= float(self.n_samples - ddof)
+        return cov
+
+
+def _accumulate_raw_cov(raw, picks, firsts, step, stop, info, idx_by_type,
+                        reject, flat):
+    """Helper to accumulate the covariance of raw data segments"""
+    acc = _CovAccumulator(len(picks))
+    for first in firsts:
+        last = min(first + step, stop)
+        raw_segment, _ = raw[picks, first:last]
+        if _is_good(raw_segment, info['ch_names'], idx_by_type, reject, flat,
+                    ignore_chs=info['bads']):
+            acc.update(raw_segment)
+        else:
+            logger.info("Artefact detected in [%d, %d]" % (first, last))
+    return acc
+
+
 @verbose
 def compute_raw_data_covariance(raw, tmin=None, tmax=None, tstep=0.2,
                                 reject=None, flat=None, picks=None,
-                                verbose=None):
+                                n_jobs=1, verbose=None):
     """Estimate noise covariance matrix from a continuous segment of raw data
 
     It is typically useful to estimate a noise covariance
@@ -253,6 +324,9 @@ def compute_raw_data_covariance(raw, tmin=None, tmax=None, tstep=0.2,
     picks : array-like of int
         Indices of channels to include (if None, all channels
         except bad channels are used).
+    n_jobs : int
+        Number of jobs to run in parallel. Each job accumulates the
+        covariance of a contiguous part of the data.
     verbose : bool, str, int, or None
         If not None, override default verbose level (see mne.verbose).
 
@@ -276,34 +350,26 @@ def compute_raw_data_covariance(raw, tmin=None, tmax=None, tstep=0.2,
         picks = pick_types(raw.info, meg=True, eeg=True, eog=False,
                            ref_meg=False, exclude=[])
 
-    data = 0
-    n_samples = 0
-    mu = 0
-
     info = cp.copy(raw.info)
     info['chs'] = [info['chs'][k] for k in picks]
     info['ch_names'] = [info['ch_names'][k] for k in picks]
     info['nchan'] = len(picks)
     idx_by_type = channel_indices_by_type(info)
 
-    # Read data in chuncks
-    for first in range(start, stop, step):
-        last = first + step
-        if last >= stop:
-            last = stop
-        raw_segment, times = raw[picks, first:last]
-        if _is_good(raw_segment, info['ch_names'], idx_by_type, reject, flat,
-                    ignore_chs=info['bads']):
-            mu += raw_segment.sum(axis=1)
-            data += np.dot(raw_segment, raw_segment.T)
-            n_samples += raw_segment.shape[1]
-        else:
-            logger.info("Artefact detected in [%d, %d]" % (first, last))
+    # Read data in chuncks, each job handling contiguous chunks
+    firsts = np.arange(start, stop, step)
+    parallel, p_fun, n_jobs = parallel_func(_accumulate_raw_cov, n_jobs)
+    accs = parallel(p_fun(raw, picks, these_firsts, step, stop, info,
+                          idx_by_type, reject, flat)
+                    for these_firsts in np.array_split(firsts, n_jobs)
+                    if len(these_firsts) > 0)
+    acc = accs[0]
+    for this_acc in accs[1:]:
+        acc.merge(this_acc)
+    n_samples = acc.n_samples
 
     _check_n_samples(n_samples, len(picks))
-    mu /= n_samples
-    data -= n_samples * mu[:, None] * mu[None, :]
-    data /= (n_samples - 1.0)
+    data = acc.get_cov()
     logger.info("Number of samples used : %d" % n_samples)
     logger.info('[done]')
 
@@ -576,21 +642,23 @@ def compute_covariance(epochs, keep_sample_mean=True, tmin=None, tmax=None,
 
     info = pick_info(info, picks_meeg)
     tslice = _get_tslice(epochs[0], tmin, tmax)
-    epochs = [ee.get_data()[:, picks_meeg, tslice] for ee in epochs]
-    picks_meeg = np.arange(len(picks_meeg))
     picks_list = _picks_by_type(info)
 
-    if len(epochs) > 1:
-        epochs = np.concatenate(epochs, 0)
-    else:
-        epochs = epochs[0]
+    # the empirical covariance alone does not need all the data in memory,
+    # even its cross-validation only needs the statistics of the folds
+    streaming = list(method) == ['empirical']
+    if not streaming:
+        epochs = [ee.get_data()[:, picks_meeg, tslice] for ee in epochs]
+        if len(epochs) > 1:
+            epochs = np.concatenate(epochs, 0)
+        else:
+            epochs = epochs[0]
 
-    epochs = np.hstack(epochs)
-    n_samples_tot = epochs.shape[-1]
-    _check_n_samples(n_samples_tot, len(picks_meeg))
+        epochs = np.hstack(epochs)
+        n_samples_tot = epochs.shape[-1]
+        _check_n_samples(n_samples_tot, len(picks_meeg))
 
-    epochs = epochs.T  # sklearn | C-order
-    if ok_sklearn:
+        epochs = epochs.T  # sklearn | C-order
         cov_data = _compute_covariance_auto(epochs, method=method,
                                             method_params=_method_params,
                                             info=info,
@@ -602,11 +670,27 @@ def compute_covariance(epochs, keep_sample_mean=True, tmin=None, tmax=None,
                                             picks_list=picks_list,
                                             scalings=scalings)
     else:
-        if _method_params['empirical']['assume_centered'] is True:
-            cov = epochs.T.dot(epochs) / n_samples_tot
-        else:
-            cov = np.cov(epochs.T, bias=1)
+        acc = _CovAccumulator(len(picks_meeg))
+        for epochs_t in epochs:
+            for e in epochs_t:
+                acc.update(e[picks_meeg, tslice])
+        n_samples_tot = acc.n_samples
+        _check_n_samples(n_samples_tot, len(picks_meeg))
+        assume_centered = _method_params['empirical']['assume_centered']
+        assume_centered = assume_centered is True
+        cov = acc.get_cov(assume_centered=assume_centered, ddof=0)
         cov_data = {'empirical': {'data': cov}}
+        if ok_sklearn:
+            from sklearn.covariance import EmpiricalCovariance
+            logger.info('Using cross-validation to score the estimator.')
+            loglik = _empirical_cv_loglik(epochs, picks_meeg, tslice, cv,
+                                          n_samples_tot, assume_centered,
+                                          picks_list, scalings)
+            est = EmpiricalCovariance(**_method_params['empirical'])
+            est._set_covariance(cov)
+            est.location_ = (np.zeros(len(cov)) if assume_centered
+                             else acc.mean)
+            cov_data['empirical'].update(loglik=loglik, estimator=est)
 
     if keep_sample_mean is False:
         cov = cov_data['empirical']['data']
@@ -656,12 +740,12 @@ def _compute_covariance_auto(data, method, info, method_params, cv,
                              scalings, n_jobs, stop_early, picks_list,
                              verbose):
     """docstring for _compute_covariance_auto"""
-    from sklearn.grid_search import GridSearchCV
-    from sklearn.covariance import (LedoitWolf, ShrunkCovariance,
-                                    EmpiricalCovariance)
+    from sklearn.covariance import LedoitWolf, EmpiricalCovariance
 
     # rescale to improve numerical stability
     _apply_scaling_array(data.T, picks_list=picks_list, scalings=scalings)
+    # the same folds are used for all the estimators
+    splits = _get_cv_splits(data, cv)
     estimator_cov_info = list()
     msg = 'Estimating covariance using %s'
     for this_method in method:
@@ -700,18 +784,16 @@ def _compute_covariance_auto(data, method, info, method_params, cv,
 
         elif this_method == 'shrunk':
             shrinkage = method_params[this_method].pop('shrinkage')
-            tuned_parameters = [{'shrinkage': shrinkage}]
+            assume_centered = method_params[this_method]['assume_centered']
             shrinkages = []
-            gs = GridSearchCV(ShrunkCovariance(**method_params[this_method]),
-                              tuned_parameters, cv=cv)
             for ch_type, picks in picks_list:
-                gs.fit(data_[:, picks])
+                scores = _shrunk_cv_scores(data_[:, picks], shrinkage, splits,
+                                           assume_centered)
                 shrinkages.append((
                     ch_type,
-                    gs.best_estimator_.shrinkage,
+                    shrinkage[np.argmax(scores)],
                     picks
                 ))
-            shrinkages = [c[0] for c in zip(shrinkages)]
             sc = _ShrunkCovariance(shrinkage=shrinkages,
                                    **method_params[this_method])
             sc.fit(data_)
@@ -722,16 +804,18 @@ def _compute_covariance_auto(data, method, info, method_params, cv,
             mp = method_params[this_method]
             pca, _info = _auto_low_rank_model(data_, this_method,
                                               n_jobs=n_jobs,
-                                              method_params=mp, cv=cv,
+                                              method_params=mp, cv=splits,
                                               stop_early=stop_early)
+            _info['cv'] = cv
             pca.fit(data_)
             estimator_cov_info.append((pca, pca.get_covariance(), _info))
 
         elif this_method == 'factor_analysis':
             mp = method_params[this_method]
             fa, _info = _auto_low_rank_model(data_, this_method, n_jobs=n_jobs,
-                                             method_params=mp, cv=cv,
+                                             method_params=mp, cv=splits,
                                              stop_early=stop_early)
+            _info['cv'] = cv
             fa.fit(data_)
             estimator_cov_info.append((fa, fa.get_covariance(), _info))
         else:
@@ -741,7 +825,7 @@ def _compute_covariance_auto(data, method, info, method_params, cv,
 
     logger.info('Using cross-validation to select the best estimator.')
     estimators, _, _ = zip(*estimator_cov_info)
-    logliks = np.array([_cross_val(data, e, cv, n_jobs) for e in estimators])
+    logliks = _cross_val(data, estimators, splits, n_jobs)
 
     # undo scaling
     for c in estimator_cov_info:
@@ -760,10 +844,149 @@ def _compute_covariance_auto(data, method, info, method_params, cv,
     return out
 
 
+def _get_cv_splits(data, cv):
+    """Helper to get the list of (train, test) indices of the folds"""
+    from sklearn.cross_validation import check_cv
+    return list(check_cv(cv, data))
+
+
+def _fit_score(est, data, train, test):
+    """Helper to fit an estimator on a fold and score it on the rest"""
+    from sklearn.base import clone
+    return clone(est).fit(data[train]).score(data[test])
+
+
 def _cross_val(data, est, cv, n_jobs):
-    """Helper to compute cross validation"""
-    from sklearn.cross_validation import cross_val_score
-    return nanmean(cross_val_score(est, data, cv=cv, n_jobs=n_jobs))
+    """Helper to compute cross validation
+
+    ``est`` can be a list of estimators, in which case all the fits (for all
+    the estimators and all the folds) are run in parallel and an array of
+    scores is returned.
+    """
+    estimators = est if isinstance(est, (list, tuple)) else [est]
+    splits = _get_cv_splits(data, cv)
+    parallel, p_fun, _ = parallel_func(_fit_score, n_jobs)
+    scores = parallel(p_fun(e, data, train, test) for e in estimators
+                      for train, test in splits)
+    scores = nanmean(np.reshape(scores, (len(estimators), len(splits))),
+                     axis=1)
+    return scores if isinstance(est, (list, tuple)) else scores[0]
+
+
+def _empirical_cv_loglik(epochs, picks, tslice, cv, n_samples,
+                         assume_centered, picks_list, scalings):
+    """Helper to cross-validate the empirical covariance of epochs
+
+    The epochs are read again and each sample is added to the training and
+    test statistics of its folds, so the data are never concatenated. The
+    data are scaled and split like in _compute_covariance_auto.
+    """
+    # the folds only depend on the number of samples
+    splits = _get_cv_splits(np.empty((n_samples, 0)), cv)
+    masks = list()
+    for train, test in splits:
+        mask = np.zeros((2, n_samples), dtype=bool)
+        mask[0, train] = True
+        mask[1, test] = True
+        masks.append(mask)
+    fold_accs = [(_CovAccumulator(len(picks)), _CovAccumulator(len(picks)))
+                 for _ in splits]
+    start = 0
+    for epochs_t in epochs:
+        for e in epochs_t:
+            e = e[picks, tslice]  # a copy
+            _apply_scaling_array(e, picks_list=picks_list, scalings=scalings)
+            stop = start + e.shape[1]
+            for mask, accs in zip(masks, fold_accs):
+                for this_mask, acc in zip(mask[:, start:stop], accs):
+                    acc.update(e[:, this_mask])
+            start = stop
+    return _empirical_cv_score(fold_accs, assume_centered)
+
+
+def _empirical_cv_score(fold_accs, assume_centered):
+    """Helper to score the empirical covariance from the fold statistics
+
+    ``fold_accs`` is a list of (train, test) _CovAccumulator. Like in
+    _cross_val, the mean log-likelihood of the folds is returned.
+    """
+    scores = list()
+    for train, test in fold_accs:
+        location = 0. if assume_centered else train.mean
+        eig, eigvec = linalg.eigh(train.get_cov(assume_centered, ddof=0))
+        delta = test.mean - location
+        test_cov = test.cross / test.n_samples + np.outer(delta, delta)
+        test_var = np.sum(eigvec * np.dot(test_cov, eigvec), axis=0)
+        scores.append(_gaussian_loglik(eig, test_var))
+    return nanmean(scores)
+
+
+def _fold_eigh(data, train, test, assume_centered):
+    """Helper to decompose the training covariance of a fold
+
+    Returns the eigenvalues of the training covariance and the mean squared
+    projections of the test data on its eigenvectors, from which Gaussian
+    log-likelihoods of all the models sharing these eigenvectors follow.
+    """
+    train, test = data[train], data[test]
+    if assume_centered:
+        location = np.zeros(data.shape[1])
+    else:
+        location = train.mean(axis=0)
+    train = train - location
+    eig, eigvec = linalg.eigh(np.dot(train.T, train) / len(train))
+    proj = np.dot(test - location, eigvec)
+    return eig, np.mean(proj * proj, axis=0)
+
+
+def _gaussian_loglik(variances, test_var):
+    """Helper to compute the mean log-likelihood in the eigenbasis"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return -0.5 * (len(variances) * np.log(2 * np.pi) +
+                       np.sum(np.log(variances)) +
+                       np.sum(test_var / variances))
+
+
+def _shrunk_cv_scores(data, shrinkages, splits, assume_centered):
+    """Helper to score all the shrinkage values of ShrunkCovariance
+
+    The eigenvectors of the shrunk covariance do not depend on the amount
+    of shrinkage, so each fold is decomposed only once.
+    """
+    scores = np.zeros(len(shrinkages))
+    n_test = 0
+    for train, test in splits:
+        eig, test_var = _fold_eigh(data, train, test, assume_centered)
+        mu = eig.mean()
+        for ii, shrinkage in enumerate(shrinkages):
+            variances = (1. - shrinkage) * eig + shrinkage * mu
+            # folds are weighted by their size (like GridSearchCV)
+            scores[ii] += len(test) * _gaussian_loglik(variances, test_var)
+        n_test += len(test)
+    return scores / n_test
+
+
+def _pca_cv_scores(data, iter_n_components, splits):
+    """Helper to score all the numbers of components of probabilistic PCA
+
+    The model with n components keeps the n largest eigenvalues of the
+    training covariance and replaces the others by their mean, so all the
+    numbers of components are scored from a single decomposition per fold.
+    """
+    n_features = data.shape[1]
+    scores = np.zeros((len(splits), len(iter_n_components)))
+    for fi, (train, test) in enumerate(splits):
+        eig, test_var = _fold_eigh(data, train, test, False)
+        eig, test_var = eig[::-1], test_var[::-1]
+        for ii, n in enumerate(iter_n_components):
+            if n > n_features:
+                scores[fi, ii] = np.inf
+                continue
+            variances = eig.copy()
+            if n < n_features:
+                variances[n:] = eig[n:].mean()
+            scores[fi, ii] = _gaussian_loglik(variances, test_var)
+    return nanmean(scores, axis=0)
 
 
 def _auto_low_rank_model(data, mode, n_jobs, method_params, cv,
@@ -783,21 +1006,30 @@ def _auto_low_rank_model(data, mode, n_jobs, method_params, cv,
                          mode)
     est = est(**method_params)
     est.n_components = 1
-    scores = np.empty_like(iter_n_components, dtype=np.float64)
+    iter_n_components = list(iter_n_components)
+    scores = np.empty(len(iter_n_components), dtype=np.float64)
     scores.fill(np.nan)
 
-    # make sure we don't empty the thing if it's a generator
-    max_n = max(list(cp.deepcopy(iter_n_components)))
+    max_n = max(iter_n_components)
     if max_n > data.shape[1]:
         warnings.warn('You are trying to estimate %i components on matrix '
                       'with %i features.' % (max_n, data.shape[1]))
 
+    splits = _get_cv_splits(data, cv)
+    if mode == 'pca':
+        # all the ranks at once from one decomposition per fold
+        pca_scores = _pca_cv_scores(data, iter_n_components, splits)
+
     for ii, n in enumerate(iter_n_components):
         est.n_components = n
-        try:  # this may fail depending on rank and split
-            score = _cross_val(data=data, est=est, cv=cv, n_jobs=n_jobs)
-        except ValueError:
-            score = np.inf
+        if mode == 'pca':
+            score = pca_scores[ii]
+        else:
+            try:  # this may fail depending on rank and split
+                score = _cross_val(data=data, est=est, cv=splits,
+                                   n_jobs=n_jobs)
+            except ValueError:
+                score = np.inf
         if np.isinf(score) or score > 0:
             logger.info('... infinite values encountered. stopping estimation')
             break
@@ -1013,6 +1245,59 @@ def prepare_noise_cov(noise_cov, info, ch_names, rank=None,
 
     verbose : bool, str, int, or None
         If not None, override default verbose level (see mne.verbose).
+
+    Notes
+    -----
+    The eigendecomposition is cached, so preparing the same noise
+    covariance for the same channels, projections and rank again (e.g., to
+    compute several inverse operators or beamformers) does not repeat the
+    rank estimation and the eigendecompositions.
+    """
+    key = _noise_cov_key(noise_cov, info, ch_names, rank, scalings)
+    prepared = _noise_cov_cache.get(key)
+    if prepared is None:
+        prepared = _prepare_noise_cov(noise_cov, info, ch_names, rank,
+                                      scalings)
+        _noise_cov_cache[key] = prepared
+    else:
+        logger.info('    Using the cached eigendecomposition of the noise '
+                    'covariance')
+    pick_eeg = pick_types(info, meg=False, eeg=True, ref_meg=False,
+                          exclude='bads')
+    eeg_names = [info['chs'][k]['ch_name'] for k in pick_eeg]
+    if any(c in eeg_names for c in ch_names) and \
+            not _has_eeg_average_ref_proj(info['projs']):
+        warnings.warn('No average EEG reference present in info["projs"], '
+                      'covariance may be adversely affected. Consider '
+                      'recomputing covariance using a raw file with an '
+                      'average eeg reference projector added.')
+    # only the computed arrays are cached, the other entries (nfree, bads,
+    # projs, method, ...) are the ones of this noise_cov
+    noise_cov = cp.deepcopy(noise_cov)
+    noise_cov.update(cp.deepcopy(prepared))
+    return noise_cov
+
+
+_noise_cov_cache = _BoundedCache(max_size=8)
+
+
+def _noise_cov_key(noise_cov, info, ch_names, rank, scalings):
+    """Hash everything prepare_noise_cov depends on"""
+    projs = [dict(active=p['active'], col_names=p['data']['col_names'],
+                  data=p['data']['data']) for p in info['projs']]
+    return object_hash(dict(
+        cov_data=noise_cov.data, cov_names=list(noise_cov.ch_names),
+        cov_diag=bool(noise_cov['diag']), ch_names=list(ch_names),
+        info_ch_names=list(info['ch_names']), bads=list(info['bads']),
+        kinds=np.array([c['kind'] for c in info['chs']]),
+        coil_types=np.array([c['coil_type'] for c in info['chs']]),
+        projs=projs, rank=str(rank), scalings=str(scalings)))
+
+
+def _prepare_noise_cov(noise_cov, info, ch_names, rank, scalings):
+    """Helper to compute the eigendecomposition of a noise covariance
+
+    Returns the entries of the prepared noise covariance that are computed.
     """
     C_ch_idx = [noise_cov.ch_names.index(c) for c in ch_names]
     if noise_cov['diag'] is False:
@@ -1075,11 +1360,6 @@ def prepare_noise_cov(noise_cov, info, ch_names, rank=None,
             rank_eeg = _estimate_rank_meeg_cov(C_eeg, this_info, scalings_)
         C_eeg_eig, C_eeg_eigvec = _get_whitener(C_eeg, False, 'EEG',
                                                 rank_eeg)
-        if not _has_eeg_average_ref_proj(info['projs']):
-            warnings.warn('No average EEG reference present in info["projs"], '
-                          'covariance may be adversely affected. Consider '
-                          'recomputing covariance using a raw file with an '
-                          'average eeg reference projector added.')
 
     n_chan = len(ch_names)
     eigvec = np.zeros((n_chan, n_chan), dtype=np.float)
@@ -1094,11 +1374,8 @@ def prepare_noise_cov(noise_cov, info, ch_names, rank=None,
 
     assert(len(C_meg_idx) + len(C_eeg_idx) == n_chan)
 
-    noise_cov = cp.deepcopy(noise_cov)
-    noise_cov.update(data=C, eig=eig, eigvec=eigvec, dim=len(ch_names),
-                     diag=False, names=ch_names)
-
-    return noise_cov
+    return dict(data=C, eig=eig, eigvec=eigvec, dim=len(ch_names),
+                diag=False, names=list(ch_names))
 
 
 def regularize(cov, info, mag=0.1, grad=0.1, eeg=0.1, exclude='bads',
@@ -1252,23 +1529,20 @@ def compute_whitener(noise_cov, info, picks=None, rank=None,
 
     ch_names = [info['chs'][k]['ch_name'] for k in picks]
 
-    noise_cov = cp.deepcopy(noise_cov)
     noise_cov = prepare_noise_cov(noise_cov, info, ch_names,
                                   rank=rank, scalings=scalings)
-    n_chan = len(ch_names)
-
-    W = np.zeros((n_chan, n_chan), dtype=np.float)
     #
     #   Omit the zeroes due to projection
     #
     eig = noise_cov['eig']
     nzero = (eig > 0)
-    W[nzero, nzero] = 1.0 / np.sqrt(eig[nzero])
+    scale = np.zeros(len(ch_names))
+    scale[nzero] = 1.0 / np.sqrt(eig[nzero])
     #
     #   Rows of eigvec are the eigenvectors
     #
-    W = np.dot(W, noise_cov['eigvec'])
-    W = np.dot(noise_cov['eigvec'].T, W)
+    eigvec = noise_cov['eigvec']
+    W = np.dot(eigvec.T, scale[:, np.newaxis] * eigvec)
     return W, ch_names
 
 
@@ -1646,13 +1920,93 @@ def _estimate_rank_meeg_cov(data, info, scalings, tol=1e-4,
     """
     picks_list = _picks_by_type(info)
     _apply_scaling_cov(data, picks_list, scalings)
-    if data.shape[1] < data.shape[0]:
-        ValueError("You've got fewer samples than channels, your "
-                   "rank estimate might be inaccurate.")
-    out = estimate_rank(data, tol=tol, norm=False,
-                        return_singular=return_singular, copy=copy)
-    rank = out[0] if isinstance(out, tuple) else out
+    # the covariance is symmetric, so its singular values are the absolute
+    # values of its eigenvalues (much cheaper than a full SVD)
+    s = np.sort(np.abs(linalg.eigvalsh(data)))[::-1]
+    rank = np.sum(s >= tol)
+    out = (rank, s) if return_singular else rank
     ch_type = ' + '.join(list(zip(*picks_list))[0])
     logger.info('estimated rank (%s): %d' % (ch_type, rank))
     _undo_scaling_cov(data, picks_list, scalings)
     return out
+
+
+def _estimate_rank_raw(raw, picks, start, stop, scalings, tol=1e-4,
+                       return_singular=False, buffer_size=None):
+    """Estimate rank for M/EEG data without loading all of it at once.
+
+    The Gram matrix ``np.dot(data, data.T)`` is accumulated over chunks of
+    data and the singular values are obtained from its eigenvalues. If these
+    are not accurate enough to resolve ``tol``, the singular values are
+    instead computed from a QR decomposition that is updated chunk by chunk.
+
+    Parameters
+    ----------
+    raw : instance of Raw
+        The raw data.
+    picks : array-like of int
+        The channels to use.
+    start : int
+        First sample to use.
+    stop : int
+        Sample after the last sample to use.
+    scalings : dict | 'norm' | np.ndarray | None
+        The rescaling method to be applied, see
+        :func:`_estimate_rank_meeg_signals`.
+    tol : float
+        Tolerance for singular values to consider non-zero.
+    return_singular : bool
+        If True, also return the singular values that were used
+        to determine the rank.
+    buffer_size : int | None
+        Number of samples per chunk. If None, 10 s of data are used.
+
+    Returns
+    -------
+    rank : int
+        Estimated rank of the data.
+    s : array
+        If return_singular is True, the singular values that were
+        thresholded to determine the rank are also returned.
+    """
+    from .io.pick import pick_info
+    picks_list = _picks_by_type(pick_info(raw.info, picks))
+    n_channels = len(picks)
+    if buffer_size is None:
+        buffer_size = int(np.ceil(10. * raw.info['sfreq']))
+    starts = range(start, stop, buffer_size)
+
+    gram = np.zeros((n_channels, n_channels))
+    for first in starts:
+        data = raw[picks, first:min(first + buffer_size, stop)][0]
+        gram += np.dot(data, data.T)
+
+    if isinstance(scalings, string_types) and scalings == 'norm':
+        norms = np.sqrt(np.diag(gram))
+        norms[norms == 0] = 1.0
+        scales = 1. / norms
+    else:
+        scalings = _check_scaling_inputs(gram, picks_list, scalings)
+        scales = np.ones(n_channels)
+        if isinstance(scalings, dict):
+            for ch_type, idx in picks_list:
+                scales[idx] = scalings[ch_type]
+        elif scalings is not None:
+            scales = scalings
+    gram *= scales[:, np.newaxis] * scales[np.newaxis, :]
+    s = _gram_singular_values(gram, tol)
+    if s is None:
+        logger.info('Singular values too small for the Gram matrix, using '
+                    'a QR decomposition')
+        R = np.zeros((0, n_channels))
+        for first in starts:
+            data = raw[picks, first:min(first + buffer_size, stop)][0]
+            data *= scales[:, np.newaxis]
+            R = linalg.qr(np.concatenate([R, data.T]), mode='r',
+                          overwrite_a=True)[0][:n_channels]
+        s = linalg.svd(R, compute_uv=False, overwrite_a=True)
+    s = s[:min(n_channels, stop - start)]
+    rank = np.sum(s >= tol)
+    ch_type = ' + '.join(list(zip(*picks_list))[0])
+    logger.info('estimated rank (%s): %d' % (ch_type, rank))
+    return (rank, s) if return_singular else rank
@@ -234,6 +234,26 @@ else:
     unravel_index = np.unravel_index
 
 
+def _stacked_svd(x):
+    """Replacement for np.linalg.svd on a stack of matrices (numpy < 1.8)"""
+    u, s, vh = zip(*[np.linalg.svd(xx) for xx in x])
+    return np.array(u), np.array(s), np.array(vh)
+
+
+def _stacked_eigh(x):
+    """Replacement for np.linalg.eigh on a stack of matrices (numpy < 1.8)"""
+    w, v = zip(*[np.linalg.eigh(xx) for xx in x])
+    return np.array(w), np.array(v)
+
+
+if LooseVersion(np.__version__) < LooseVersion('1.8'):
+    stacked_svd = _stacked_svd
+    stacked_eigh = _stacked_eigh
+else:
+    stacked_svd = np.linalg.svd
+    stacked_eigh = np.linalg.eigh
+
+
 def _qr_economic_old(A, **kwargs):
     """
     Compat function for the QR-decomposition in economic mode
@@ -5,6 +5,9 @@
 #
 # License: BSD (3-clause)
 
+import os
+import os.path as op
+
 import numpy as np
 from copy import deepcopy
 
@@ -12,12 +15,48 @@ from ..surface import (fast_cross_3d, _find_nearest_tri_pt, _get_tri_supp_geom,
                        _triangle_coords)
 from ..io.constants import FIFF
 from ..transforms import apply_trans
-from ..utils import logger, verbose
+from ..utils import logger, verbose, object_hash, _BoundedCache
 from ..parallel import parallel_func
 from ..io.compensator import get_current_comp, make_compensator
 from ..io.pick import pick_types
 
 
+##############################################################################
+# CACHING
+
+# BEM-to-coil (and BEM-to-electrode) coupling matrices, keyed on the BEM
+# solution file and on the content hash of the sensor geometry
+_coil_sol_cache = _BoundedCache(max_size=8)
+
+# Approximate memory (in bytes) used by the per-block temporaries of the
+# infinite-medium potential and field computations
+_INF_BLOCK_BYTES = 2 ** 22
+
+
+def _get_bem_key(bem):
+    """Get the cache key of a BEM solution
+
+    A BEM read from disk is identified by its file (like the coil
+    definitions), otherwise by the surfaces and conductivities that
+    determine its solution, which is never hashed itself.
+    """
+    fname = bem.get('sol_name')
+    if fname is not None and op.isfile(fname):
+        return (op.realpath(fname), os.stat(fname).st_mtime)
+    return object_hash(dict(rr=[s['rr'] for s in bem['surfs']],
+                            tris=[s['tris'] for s in bem['surfs']],
+                            sigma=bem['sigma'], method=bem['bem_method']))
+
+
+def _concatenate_coils(coils):
+    """Helper to concatenate MEG coil parameters"""
+    rmags = np.concatenate([coil['rmag'] for coil in coils])
+    cosmags = np.concatenate([coil['cosmag'] for coil in coils])
+    ws = np.concatenate([coil['w'] for coil in coils])
+    counts = np.array([len(coil['rmag']) for coil in coils])
+    return rmags, cosmags, ws, counts
+
+
 ##############################################################################
 # COIL SPECIFICATION
 
@@ -111,10 +150,17 @@ def _bem_specify_coils(bem, coils, coord_frame, n_jobs):
     func = _bem_lin_field_coeffs_simple
 
     # Process each of the surfaces
-    rmags = np.concatenate([coil['rmag'] for coil in coils])
-    cosmags = np.concatenate([coil['cosmag'] for coil in coils])
-    counts = np.array([len(coil['rmag']) for coil in coils])
-    ws = np.concatenate([coil['w'] for coil in coils])
+    rmags, cosmags, ws, counts = _concatenate_coils(coils)
+
+    # The coupling only depends on the BEM and the coil geometry (in MRI
+    # coordinates), so it can be reused e.g. across source spaces
+    key = object_hash(dict(kind='meg', bem=str(_get_bem_key(bem)),
+                           rmags=rmags, cosmags=cosmags, ws=ws,
+                           counts=counts))
+    sol = _coil_sol_cache.get(key)
+    if sol is not None:
+        logger.info('    Using cached BEM-coil coupling matrix')
+        return sol.copy()  # the caller modifies the solution in-place
 
     lens = np.cumsum(np.r_[0, [len(s['rr']) for s in bem['surfs']]])
     coeff = np.empty((len(counts), lens[-1]))
@@ -124,11 +170,21 @@ def _bem_specify_coils(bem, coils, coord_frame, n_jobs):
                                            ws, counts, func, n_jobs)
     # put through the bem
     sol = np.dot(coeff, bem['solution'])
+    _coil_sol_cache[key] = sol.copy()
     return sol
 
 
 def _bem_specify_els(bem, els):
     """Set up for computing the solution at a set of electrodes"""
+    key = object_hash(dict(kind='eeg', bem=str(_get_bem_key(bem)),
+                           head_mri_t=bem['head_mri_t']['trans'],
+                           rmags=[el['rmag'] for el in els],
+                           ws=[el['w'] for el in els]))
+    sol = _coil_sol_cache.get(key)
+    if sol is not None:
+        logger.info('    Using cached BEM-electrode coupling matrix')
+        return sol.copy()  # the caller modifies the solution in-place
+
     sol = np.zeros((len(els), bem['solution'].shape[1]))
     # Go through all coils
     scalp = bem['surfs'][0]
@@ -148,6 +204,7 @@ def _bem_specify_els(bem, els):
             w = elw * np.array([(1.0 - x - y), x, y])
             amt = np.dot(w, bem['solution'][tri])
             sol[k] += amt
+    _coil_sol_cache[key] = sol.copy()
     return sol
 
 
@@ -186,15 +243,23 @@ def _make_ctf_comp_coils(info, coils):
 #    return np.sum(Q * diff, axis=1) / (diff2 * np.sqrt(diff2))
 
 
-def _bem_inf_pots(rr, surf_rr, Q=None):
-    """The infinite medium potential in all 3 directions"""
+def _bem_inf_pots(rr, surf_rr, Q=None, out=None):
+    """The infinite medium potential in all 3 directions
+
+    If ``out`` is given (and ``Q`` is None), it is used as the
+    (n_rr, 3, n_surf_rr) buffer for the result.
+    """
     # NOTE: the (4.0 * np.pi) that was in the denominator has been moved!
-    diff = surf_rr.T[np.newaxis, :, :] - rr[:, :, np.newaxis]  # n_rr, 3, n_bem
-    diff_norm = np.sum(diff * diff, axis=1)
+    if out is None or Q is not None:
+        out = np.empty((len(rr), 3, len(surf_rr)))
+    diff = out[:len(rr)]  # n_rr, 3, n_bem
+    np.subtract(surf_rr.T[np.newaxis, :, :], rr[:, :, np.newaxis], out=diff)
+    diff_norm = np.einsum('ijk,ijk->ik', diff, diff)
     diff_norm *= np.sqrt(diff_norm)
     diff_norm[diff_norm == 0] = 1  # avoid nans
     if Q is None:  # save time when Q=np.eye(3) (e.g., MEG sensors)
-        return diff / diff_norm[:, np.newaxis, :]
+        diff /= diff_norm[:, np.newaxis, :]
+        return diff
     else:  # get components in each direction (e.g., EEG sensors)
         return np.einsum('ijk,mj->imk', diff, Q) / diff_norm[:, np.newaxis, :]
 
@@ -208,24 +273,44 @@ def _bem_inf_pots(rr, surf_rr, Q=None):
 #    return np.sum(x * d, axis=1) / (diff2 * np.sqrt(diff2))
 
 
-def _bem_inf_fields(rr, rp, c):
-    """Infinite-medium magnetic field in all 3 basis directions"""
+def _bem_inf_fields(rr, rp, c, out=None):
+    """Infinite-medium magnetic field in all 3 basis directions
+
+    If ``out`` is given, it is used as the (n_rr, 3, n_rp) buffer for the
+    result.
+    """
     # Knowing that we're doing all directions, the above can be refactored:
     diff = rp.T[np.newaxis, :, :] - rr[:, :, np.newaxis]
-    diff_norm = np.sum(diff * diff, axis=1)
+    diff_norm = np.einsum('ijk,ijk->ik', diff, diff)
     diff_norm *= np.sqrt(diff_norm)
     diff_norm[diff_norm == 0] = 1  # avoid nans
     # This is the result of cross-prod calcs with basis vectors,
     # as if we had taken (Q=np.eye(3)), then multiplied by the cosmags (c)
     # factor, and then summed across directions
-    x = np.array([diff[:, 1] * c[:, 2] - diff[:, 2] * c[:, 1],
-                  diff[:, 2] * c[:, 0] - diff[:, 0] * c[:, 2],
-                  diff[:, 0] * c[:, 1] - diff[:, 1] * c[:, 0]])
-    return np.rollaxis(x / diff_norm, 1)
+    if out is None:
+        out = np.empty(diff.shape)
+    x = out[:len(rr)]
+    c = c.T[np.newaxis]
+    for ii, (j, k) in enumerate([(1, 2), (2, 0), (0, 1)]):
+        np.multiply(diff[:, j], c[:, k], out=x[:, ii])
+        x[:, ii] -= diff[:, k] * c[:, j]
+    x /= diff_norm[:, np.newaxis, :]
+    return x
+
+
+def _get_block_size(n_points, block_size=None):
+    """Get the number of sources to process at once
+
+    By default, the blocks are chosen such that the (n_block, 3, n_points)
+    temporaries take about _INF_BLOCK_BYTES of memory.
+    """
+    if block_size is None:
+        block_size = _INF_BLOCK_BYTES // (3 * 8 * max(n_points, 1))
+    return max(int(block_size), 1)
 
 
 def _bem_pot_or_field(rr, mri_rr, mri_Q, mults, coils, solution, srr,
-                      n_jobs, coil_type):
+                      n_jobs, coil_type, block_size=None):
     """Calculate the magnetic field or electric potential
 
     The code is very similar between EEG and MEG potentials, so we'll
@@ -235,57 +320,81 @@ def _bem_pot_or_field(rr, mri_rr, mri_Q, mults, coils, solution, srr,
     # we can do this one in-place because it's not used elsewhere
     solution *= mults
 
-    # Both MEG and EEG have the inifinite-medium potentials
-    # This could be just vectorized, but eats too much memory, so instead we
-    # reduce memory by chunking within _do_inf_pots and parallelize, too:
-    parallel, p_fun, _ = parallel_func(_do_inf_pots, n_jobs)
+    # The sources are independent of one another, so we split them into
+    # chunks and process each one in parallel; the results are then simply
+    # stacked (three rows per source)
+    parallel, p_fun, _ = parallel_func(_do_forward_chunk, n_jobs)
     nas = np.array_split
-    B = np.sum(parallel(p_fun(mri_rr, sr.copy(), mri_Q, sol.copy())
-                        for sr, sol in zip(nas(srr, n_jobs),
-                                           nas(solution.T, n_jobs))), axis=0)
-    # The copy()s above should make it so the whole objects don't need to be
-    # pickled...
+    B = parallel(p_fun(r, mr, mri_Q, coils, solution, srr, coil_type,
+                       block_size)
+                 for r, mr in zip(nas(rr, n_jobs), nas(mri_rr, n_jobs))
+                 if len(r) > 0)
+    return np.concatenate(B, axis=0)
+
+
+def _do_forward_chunk(rr, mri_rr, mri_Q, coils, solution, srr, coil_type,
+                      block_size=None):
+    """Compute the forward for a chunk of sources (parallel-friendly)"""
+    # Both MEG and EEG have the inifinite-medium potentials
+    B = _do_inf_pots(mri_rr, srr, mri_Q, solution.T, block_size)
 
     # Only MEG gets the primary current distribution
     if coil_type == 'meg':
         # Primary current contribution (can be calc. in coil/dipole coords)
-        parallel, p_fun, _ = parallel_func(_do_prim_curr, n_jobs)
-        pcc = np.concatenate(parallel(p_fun(rr, c)
-                                      for c in nas(coils, n_jobs)), axis=1)
-        B += pcc
+        B += _do_prim_curr(rr, coils, block_size)
         B *= 1e-7  # MAG_FACTOR from C code
     return B
 
 
-def _do_prim_curr(rr, coils):
+def _do_prim_curr(rr, coils, block_size=None):
     """Calculate primary currents in a set of coils"""
+    # The following code is equivalent to this, but vectorized over coils
+    #for ci, c in enumerate(coils):
+    #    out[:, ci] = np.sum(c['w'] * _bem_inf_fields(rr, c['rmag'],
+    #                                                 c['cosmag']), 2).ravel()
+    rmags, cosmags, ws, counts = _concatenate_coils(coils)
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    block_size = _get_block_size(len(rmags), block_size)
     out = np.empty((len(rr) * 3, len(coils)))
-    for ci, c in enumerate(coils):
-        out[:, ci] = np.sum(c['w'] * _bem_inf_fields(rr, c['rmag'],
-                                                     c['cosmag']), 2).ravel()
+    buf = np.empty((min(block_size, len(rr)), 3, len(rmags)))
+    for start in range(0, len(rr), block_size):
+        stop = min(start + block_size, len(rr))
+        x = _bem_inf_fields(rr[start:stop], rmags, cosmags, out=buf)
+        x *= ws
+        # sum the integration points of each coil
+        out[3 * start:3 * stop] = np.add.reduceat(
+            x.reshape(3 * (stop - start), len(rmags)), starts, axis=1)
     return out
 
 
-def _do_inf_pots(rr, srr, mri_Q, sol):
+def _do_inf_pots(rr, srr, mri_Q, sol, block_size=None):
     """Calculate infinite potentials using chunks"""
     # The following code is equivalent to this, but saves memory
     #v0s = _bem_inf_pots(rr, srr, mri_Q)  # n_rr x 3 x n_surf_rr
     #v0s.shape = (len(rr) * 3, v0s.shape[2])
     #B = np.dot(v0s, sol)
 
-    # We chunk the source rr's in order to save memory
-    bounds = np.r_[np.arange(0, len(rr), 1000), len(rr)]
+    # We chunk the source rr's in order to save memory, reusing the same
+    # buffer for each chunk. The rotation by mri_Q is linear, so it is
+    # applied after the product with the (much smaller) solution.
+    block_size = _get_block_size(len(srr), block_size)
     B = np.empty((len(rr) * 3, sol.shape[1]))
-    for bi in range(len(bounds) - 1):
-        v0s = _bem_inf_pots(rr[bounds[bi]:bounds[bi + 1]], srr, mri_Q)
-        v0s.shape = (v0s.shape[0] * 3, v0s.shape[2])
-        B[3 * bounds[bi]:3 * bounds[bi + 1]] = np.dot(v0s, sol)
+    buf = np.empty((min(block_size, len(rr)), 3, len(srr)))
+    for start in range(0, len(rr), block_size):
+        stop = min(start + block_size, len(rr))
+        n_rr = stop - start
+        v0s = _bem_inf_pots(rr[start:stop], srr, out=buf)
+        x = np.dot(v0s.reshape(n_rr * 3, len(srr)), sol)
+        x.shape = (n_rr, 3, sol.shape[1])
+        B[3 * start:3 * stop] = np.einsum('ijk,mj->imk', x, mri_Q).reshape(
+            n_rr * 3, sol.shape[1])
     return B
 
 
 @verbose
 def _compute_forwards(src, bem, coils_list, cfs, ccoils_list, ccfs,
-                      infos, coil_types, n_jobs, verbose=None):
+                      infos, coil_types, n_jobs, block_size=None,
+                      verbose=None):
     """Compute the MEG and EEG forward solutions"""
     if bem['bem_method'] != 'linear collocation':
         raise RuntimeError('only linear collocation supported')
@@ -330,14 +439,15 @@ def _compute_forwards(src, bem, coils_list, cfs, ccoils_list, ccfs,
                         % (coil_type.upper(), len(rr)))
             # Note: this function modifies "solution" in-place
             B = _bem_pot_or_field(rr, mri_rr, mri_Q, mults, coils,
-                                  solution, srr, n_jobs, coil_type)
+                                  solution, srr, n_jobs, coil_type,
+                                  block_size)
 
             # Compensate if needed (only done for MEG systems w/compensation)
             if compensator is not None:
                 # Compute the field in the compensation coils
                 work = _bem_pot_or_field(rr, mri_rr, mri_Q, mults,
                                          ccoils, csolution, srr, n_jobs,
-                                         coil_type)
+                                         coil_type, block_size)
                 # Combine solutions so we can do the compensation
                 both = np.zeros((work.shape[0], B.shape[1] + work.shape[1]))
                 picks = pick_types(info, meg=True, ref_meg=False)
@@ -12,9 +12,13 @@ from ._make_forward import _create_coils
 from ._lead_dots import (_do_self_dots, _do_surface_dots, _get_legen_table,
                          _get_legen_lut_fast, _get_legen_lut_accurate)
 from ..parallel import check_n_jobs
-from ..utils import logger, verbose
+from ..utils import logger, verbose, object_hash, _BoundedCache
 from ..fixes import partial
 
+# Field mapping data, keyed on the content hash of the sensor geometry, the
+# surface and the mapping parameters
+_mapping_cache = _BoundedCache(max_size=8)
+
 
 def _is_axial_coil(coil):
     is_ax = coil['coil_class'] in (FIFF.FWD_COILC_MAG,
@@ -153,6 +157,7 @@ def _make_surface_mapping(info, surf, ch_type='meg', trans=None, mode='fast',
     chs = pick_info(info, picks)['chs']
 
     # create coil defs in head coordinates
+    my_origin = np.array([0.0, 0.0, 0.04])
     if ch_type == 'meg':
         # Put them in head coordinates
         coils = _create_coils(chs, FIFF.FWD_COIL_ACCURACY_NORMAL,
@@ -164,10 +169,25 @@ def _make_surface_mapping(info, surf, ch_type='meg', trans=None, mode='fast',
         type_str = 'electrodes'
         miss = 1e-3  # Smoothing criterion for EEG
 
+    # The mapping only depends on the sensor geometry, the surface, the
+    # parameters and the projectors, so it can be reused e.g. for
+    # all evoked datasets recorded with the same device layout
+    projs = [(p['active'], p['data']['col_names'], p['data']['data'])
+             for p in info.get('projs', list())]
+    key = object_hash(dict(
+        ch_type=ch_type, mode=mode, origin=my_origin, projs=projs,
+        ch_names=[c['ch_name'] for c in chs],
+        coils=[(c['coil_class'], c['rmag'], c['cosmag'], c['w'])
+               for c in coils],
+        surf_rr=surf['rr'], surf_nn=surf['nn']))
+    fmd = _mapping_cache.get(key)
+    if fmd is not None:
+        logger.info('Using cached field mapping data')
+        return deepcopy(fmd)
+
     #
     # Step 2. Calculate the dot products
     #
-    my_origin = np.array([0.0, 0.0, 0.04])
     int_rad = 0.06
     noise = _ad_hoc_noise(coils, ch_type)
     if mode == 'fast':
@@ -204,6 +224,7 @@ def _make_surface_mapping(info, surf, ch_type='meg', trans=None, mode='fast',
     del fmd['surface_dots']
     del fmd['int_rad']
     del fmd['miss']
+    _mapping_cache[key] = deepcopy(fmd)
     return fmd
 
 
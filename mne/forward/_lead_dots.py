@@ -5,7 +5,14 @@ import numpy as np
 from numpy.polynomial import legendre
 
 from ..parallel import parallel_func
-from ..utils import logger, _get_extra_data_path
+from ..utils import logger, _get_extra_data_path, split_list
+
+# Approximate memory (in bytes) used by the Legendre sums of one block of
+# point pairs in the dot product computations
+_DOTS_BLOCK_BYTES = 2 ** 23
+
+# In-memory copies of the Legendre tables, keyed on the table parameters
+_legen_table_cache = dict()
 
 
 ##############################################################################
@@ -47,6 +54,9 @@ def _get_legen_table(ch_type, volume_integral=False, n_coeff=100,
     """Return a (generated) LUT of Legendre (derivative) polynomial coeffs"""
     if n_interp % 2 != 0:
         raise RuntimeError('n_interp must be even')
+    key = (ch_type, volume_integral, n_coeff, n_interp)
+    if not force_calc and key in _legen_table_cache:
+        return _legen_table_cache[key]
     fname = op.join(_get_extra_data_path(), 'tables')
     if not op.isdir(fname):
         # Updated due to API chang (GH 1167)
@@ -96,6 +106,8 @@ def _get_legen_table(ch_type, volume_integral=False, n_coeff=100,
         n_fact = (2.0 * n_fact + 1.0) * (2.0 * n_fact + 1.0) / n_fact
         # skip the first set of coefficients because they are not used
         lut = lut[:, 1:].copy()
+    if not force_calc:
+        _legen_table_cache[key] = (lut, n_fact)
     return lut, n_fact
 
 
@@ -210,7 +222,9 @@ def _fast_sphere_dot_r0(r, rr1, rr2, lr1, lr2, cosmags1, cosmags2,
         eeg_const = 1.0 / (4.0 * np.pi)
         result = eeg_const * sums / lr1lr2
     # new we add them all up with weights
-    if w1 is None:  # operating on surface, treat independently
+    if w1 is None and w2 is None:  # point-wise results, weighted by caller
+        pass
+    elif w1 is None:  # operating on surface, treat independently
         # result = np.sum(w2[np.newaxis, :] * result, axis=1)
         result = np.dot(result, w2)
     else:
@@ -219,38 +233,71 @@ def _fast_sphere_dot_r0(r, rr1, rr2, lr1, lr2, cosmags1, cosmags2,
     return result
 
 
+def _prep_dot_coils(coils, r0):
+    """Concatenate the integration points of all coils
+
+    The points are converted to normalized distances from the expansion
+    center.
+    """
+    rmags = np.concatenate([coil['rmag'] for coil in coils]) - r0
+    rlens = np.sqrt(np.sum(rmags * rmags, axis=1))
+    rmags /= rlens[:, np.newaxis]
+    cosmags = np.concatenate([coil['cosmag'] for coil in coils])
+    ws = np.concatenate([coil['w'] for coil in coils])
+    counts = np.array([len(coil['rmag']) for coil in coils])
+    starts = np.r_[0, np.cumsum(counts)]  # coil ci is starts[ci]:starts[ci+1]
+    return rmags, rlens, cosmags, ws, starts
+
+
+def _get_dots_block_size(n_cols, n_fact, ch_type):
+    """Get the number of rows to process at once"""
+    n_sums = 4 if ch_type == 'meg' else 1
+    return max(_DOTS_BLOCK_BYTES // (8 * n_sums * len(n_fact) * n_cols), 1)
+
+
 def _do_self_dots(intrad, volume, coils, r0, ch_type, lut, n_fact, n_jobs):
     """Perform the lead field dot product integrations"""
     if ch_type == 'eeg':
         intrad *= 0.7
     # convert to normalized distances from expansion center
-    rmags = [coil['rmag'] - r0[np.newaxis, :] for coil in coils]
-    rlens = [np.sqrt(np.sum(r * r, axis=1)) for r in rmags]
-    rmags = [r / rl[:, np.newaxis] for r, rl in zip(rmags, rlens)]
-    cosmags = [coil['cosmag'] for coil in coils]
-    ws = [coil['w'] for coil in coils]
+    rmags, rlens, cosmags, ws, starts = _prep_dot_coils(coils, r0)
+    # The dot products of all pairs of integration points are computed in
+    # blocks of coils (rows), then summed within each coil
+    block_size = _get_dots_block_size(len(rmags), n_fact, ch_type)
+    n_per = max(block_size * len(coils) // len(rmags), 1)
+    blocks = np.array_split(np.arange(len(coils)),
+                            max(n_jobs, len(coils) // n_per))
     parallel, p_fun, _ = parallel_func(_do_self_dots_subset, n_jobs)
-    prods = parallel(p_fun(intrad, rmags, rlens, cosmags,
-                           ws, volume, lut, n_fact, ch_type, idx)
-                     for idx in np.array_split(np.arange(len(rmags)), n_jobs))
-    products = np.sum(prods, axis=0)
+    prods = parallel(p_fun(intrad, rmags, rlens, cosmags, ws, starts,
+                           volume, lut, n_fact, ch_type, idx)
+                     for idx in split_list(blocks, n_jobs))
+    products = np.concatenate(prods, axis=0)
+    # make sure the result is exactly symmetric
+    products += products.T
+    products *= 0.5
     return products
 
 
-def _do_self_dots_subset(intrad, rmags, rlens, cosmags, ws, volume, lut,
-                         n_fact, ch_type, idx):
+def _do_self_dots_subset(intrad, rmags, rlens, cosmags, ws, starts, volume,
+                         lut, n_fact, ch_type, blocks):
     """Helper for parallelization"""
-    products = np.zeros((len(rmags), len(rmags)))
-    for ci1 in idx:
-        for ci2 in range(0, ci1 + 1):
-            res = _fast_sphere_dot_r0(intrad, rmags[ci1], rmags[ci2],
-                                      rlens[ci1], rlens[ci2],
-                                      cosmags[ci1], cosmags[ci2],
-                                      ws[ci1], ws[ci2], volume, lut,
-                                      n_fact, ch_type)
-            products[ci1, ci2] = res
-            products[ci2, ci1] = res
-    return products
+    products = np.zeros((sum(len(b) for b in blocks), len(starts) - 1))
+    oi = 0
+    for idx in blocks:
+        if len(idx) == 0:
+            continue
+        rows = slice(starts[idx[0]], starts[idx[-1] + 1])
+        res = _fast_sphere_dot_r0(intrad, rmags[rows], rmags,
+                                  rlens[rows], rlens, cosmags[rows], cosmags,
+                                  None, None, volume, lut, n_fact, ch_type)
+        res *= ws[rows, np.newaxis]
+        res *= ws[np.newaxis, :]
+        # sum over the integration points of each coil (rows and columns)
+        res = np.add.reduceat(res, starts[:-1], axis=1)
+        res = np.add.reduceat(res, starts[idx] - starts[idx[0]], axis=0)
+        products[oi:oi + len(idx)] = res
+        oi += len(idx)
+    return products[:oi]
 
 
 def _do_surface_dots(intrad, volume, coils, surf, sel, r0, ch_type,
@@ -258,11 +305,7 @@ def _do_surface_dots(intrad, volume, coils, surf, sel, r0, ch_type,
     """Compute the map construction products"""
     virt_ref = False
     # convert to normalized distances from expansion center
-    rmags = [coil['rmag'] - r0[np.newaxis, :] for coil in coils]
-    rlens = [np.sqrt(np.sum(r * r, axis=1)) for r in rmags]
-    rmags = [r / rl[:, np.newaxis] for r, rl in zip(rmags, rlens)]
-    cosmags = [coil['cosmag'] for coil in coils]
-    ws = [coil['w'] for coil in coils]
+    rmags, rlens, cosmags, ws, starts = _prep_dot_coils(coils, r0)
     rref = None
     refl = None
     if ch_type == 'eeg':
@@ -277,32 +320,42 @@ def _do_surface_dots(intrad, volume, coils, surf, sel, r0, ch_type,
     rsurf /= lsurf[:, np.newaxis]
     this_nn = surf['nn'][sel]
 
+    # The surface points are processed in blocks (rows), the products being
+    # summed within each coil
+    block_size = _get_dots_block_size(len(rmags), n_fact, ch_type)
+    blocks = np.array_split(np.arange(len(rsurf)),
+                            max(n_jobs, len(rsurf) // block_size))
     parallel, p_fun, _ = parallel_func(_do_surface_dots_subset, n_jobs)
     prods = parallel(p_fun(intrad, rsurf, rmags, rref, refl, lsurf, rlens,
-                           this_nn, cosmags, ws, volume, lut, n_fact, ch_type,
-                           idx)
-                     for idx in np.array_split(np.arange(len(rmags)), n_jobs))
-    products = np.sum(prods, axis=0)
+                           this_nn, cosmags, ws, starts, volume, lut, n_fact,
+                           ch_type, idx)
+                     for idx in split_list(blocks, n_jobs))
+    products = np.concatenate(prods, axis=0)
     return products
 
 
 def _do_surface_dots_subset(intrad, rsurf, rmags, rref, refl, lsurf, rlens,
-                            this_nn, cosmags, ws, volume, lut, n_fact, ch_type,
-                            idx):
+                            this_nn, cosmags, ws, starts, volume, lut, n_fact,
+                            ch_type, blocks):
     """Helper for parallelization"""
-    products = np.zeros((len(rsurf), len(rmags)))
-    for ci in idx:
-        res = _fast_sphere_dot_r0(intrad, rsurf, rmags[ci],
-                                  lsurf, rlens[ci],
-                                  this_nn, cosmags[ci],
-                                  None, ws[ci], volume, lut,
+    products = np.zeros((sum(len(b) for b in blocks), len(starts) - 1))
+    oi = 0
+    for idx in blocks:
+        if len(idx) == 0:
+            continue
+        res = _fast_sphere_dot_r0(intrad, rsurf[idx], rmags,
+                                  lsurf[idx], rlens,
+                                  this_nn[idx], cosmags,
+                                  None, None, volume, lut,
                                   n_fact, ch_type)
         if rref is not None:
-            vres = _fast_sphere_dot_r0(intrad, rref, rmags[ci],
-                                       refl, rlens[ci],
-                                       None, ws[ci], volume,
+            vres = _fast_sphere_dot_r0(intrad, rref, rmags,
+                                       refl, rlens,
+                                       None, cosmags, None, None, volume,
                                        lut, n_fact, ch_type)
-            products[:, ci] = res - vres
-        else:
-            products[:, ci] = res
-    return products
+            res -= vres
+        res *= ws[np.newaxis, :]
+        products[oi:oi + len(idx)] = np.add.reduceat(res, starts[:-1],
+                                                     axis=1)
+        oi += len(idx)
+    return products[:oi]
@@ -8,13 +8,15 @@
 from ..externals.six import string_types
 import os
 from os import path as op
+from copy import deepcopy
 import numpy as np
 
 from .. import pick_types, pick_info
 from ..io.pick import _has_kit_refs
 from ..io import read_info
 from ..io.constants import FIFF
-from .forward import Forward, write_forward_solution, _merge_meg_eeg_fwds
+from .forward import (Forward, write_forward_solution, _merge_meg_eeg_fwds,
+                      convert_forward_solution, is_fixed_orient)
 from ._compute_forward import _compute_forwards
 from ..transforms import (invert_transform, transform_surface_to,
                           read_trans, _get_mri_head_t_from_trans_file,
@@ -25,11 +27,24 @@ from ..source_space import (read_source_spaces, _filter_source_spaces,
 from ..surface import read_bem_solution, _normalize_vectors
 
 
+_coil_def_cache = dict()
+
+
 @verbose
 def _read_coil_defs(fname=None, verbose=None):
     """Read a coil definition file"""
     if fname is None:
         fname = op.join(op.split(__file__)[0], '..', 'data', 'coil_def.dat')
+    key = (op.realpath(fname), os.stat(fname).st_mtime)
+    if key not in _coil_def_cache:
+        _coil_def_cache[key] = _do_read_coil_defs(fname)
+    res = deepcopy(_coil_def_cache[key])
+    logger.info('%d coil definitions read', len(res['coils']))
+    return res
+
+
+def _do_read_coil_defs(fname):
+    """Actually read a coil definition file"""
     big_val = 0.5
     with open(fname, 'r') as fid:
         lines = fid.readlines()
@@ -73,7 +88,6 @@ def _read_coil_defs(fname=None, verbose=None):
                 cosmag /= size[:, np.newaxis]
                 coil.update(dict(w=w, cosmag=cosmag, rmag=rmag))
                 res['coils'].append(coil)
-    logger.info('%d coil definitions read', len(res['coils']))
     return res
 
 
@@ -165,6 +179,95 @@ def _create_coils(chs, acc=None, t=None, coil_type='meg', coilset=None):
     return coils, coils[0]['coord_frame']  # all get the same coord_frame
 
 
+def _prep_meg_channels(info, ignore_ref=False, templates=None,
+                       info_extra='info dict'):
+    """Prepare MEG coil definitions (in head coordinates)"""
+    megcoils, megcf, compcoils, compcf, megnames = [None] * 5
+    picks = pick_types(info, meg=True, eeg=False, ref_meg=False, exclude=[])
+    nmeg = len(picks)
+    if nmeg > 0:
+        megchs = pick_info(info, picks)['chs']
+        megnames = [info['ch_names'][p] for p in picks]
+        logger.info('Read %3d MEG channels from %s' % (nmeg, info_extra))
+
+    # comp channels
+    ncomp = 0
+    if not ignore_ref:
+        picks = pick_types(info, meg=False, ref_meg=True, exclude=[])
+        ncomp = len(picks)
+        if ncomp > 0:
+            compchs = pick_info(info, picks)['chs']
+            logger.info('Read %3d MEG compensation channels from %s'
+                        % (ncomp, info_extra))
+            # We need to check to make sure these are NOT KIT refs
+            if _has_kit_refs(info, picks):
+                err = ('Cannot create forward solution with KIT '
+                       'reference channels. Consider using '
+                       '"ignore_ref=True" in calculation')
+                raise NotImplementedError(err)
+        _print_coord_trans(info['dev_head_t'])
+    # make info structure to allow making compensator later
+    picks = pick_types(info, meg=True, ref_meg=not ignore_ref, exclude=[])
+    meg_info = pick_info(info, picks)
+
+    # Create coil descriptions with transformation to head frame
+    if nmeg > 0:
+        if templates is None:
+            templates = _read_coil_defs()
+        if ncomp > 0:  # Compensation channel information
+            logger.info('%d compensation data sets in %s'
+                        % (len(info['comps']), info_extra))
+        megcoils, megcf = _create_coils(megchs,
+                                        FIFF.FWD_COIL_ACCURACY_ACCURATE,
+                                        info['dev_head_t'], coil_type='meg',
+                                        coilset=templates)
+        if ncomp > 0:
+            compcoils, compcf = _create_coils(compchs,
+                                              FIFF.FWD_COIL_ACCURACY_NORMAL,
+                                              info['dev_head_t'],
+                                              coil_type='meg',
+                                              coilset=templates)
+    return megcoils, megcf, compcoils, compcf, megnames, meg_info
+
+
+def _prep_eeg_channels(info, templates=None, info_extra='info dict'):
+    """Prepare EEG electrode definitions (in head coordinates)"""
+    eegels, eegnames = None, None
+    picks = pick_types(info, meg=False, eeg=True, ref_meg=False, exclude=[])
+    if len(picks) > 0:
+        eegchs = pick_info(info, picks)['chs']
+        eegnames = [info['ch_names'][p] for p in picks]
+        logger.info('Read %3d EEG channels from %s'
+                    % (len(picks), info_extra))
+        eegels, _ = _create_coils(eegchs, coil_type='eeg', coilset=templates)
+    return eegels, eegnames
+
+
+def _setup_bem(bem, mri_head_t, eeg):
+    """Read a BEM solution and set its head->MRI transform"""
+    if not op.isfile(bem):
+        raise IOError('BEM file "%s" not found' % bem)
+    logger.info('Setting up the BEM model using %s...\n' % bem)
+    bem_name = bem
+    bem = read_bem_solution(bem)
+    if eeg and len(bem['surfs']) == 1:
+        raise RuntimeError('Cannot use a homogeneous model in EEG '
+                           'calculations')
+    logger.info('Employing the head->MRI coordinate transform with the '
+                'BEM model.')
+    # fwd_bem_set_head_mri_t: Set the coordinate transformation
+    to, fro = mri_head_t['to'], mri_head_t['from']
+    if fro == FIFF.FIFFV_COORD_HEAD and to == FIFF.FIFFV_COORD_MRI:
+        bem['head_mri_t'] = mri_head_t
+    elif fro == FIFF.FIFFV_COORD_MRI and to == FIFF.FIFFV_COORD_HEAD:
+        bem['head_mri_t'] = invert_transform(mri_head_t)
+    else:
+        raise RuntimeError('Improper coordinate transform')
+    logger.info('BEM model %s is now set up' % op.split(bem_name)[1])
+    logger.info('')
+    return bem
+
+
 @verbose
 def make_forward_solution(info, mri, src, bem, fname=None, meg=True, eeg=True,
                           mindist=0.0, ignore_ref=False, overwrite=False,
@@ -318,90 +421,27 @@ def make_forward_solution(info, mri, src, bem, fname=None, meg=True, eeg=True,
                 mri_file=mri_extra, mri_id=mri_id, meas_file=info_extra_long,
                 meas_id=None, working_dir=os.getcwd(),
                 command_line=cmd, bads=info['bads'])
-    meg_head_t = info['dev_head_t']
     logger.info('')
 
     # MEG channels
-    megnames = None
+    templates = _read_coil_defs()
+    megcoils, megcf, compcoils, compcf, megnames, meg_info = [None] * 6
     if meg:
-        picks = pick_types(info, meg=True, eeg=False, ref_meg=False,
-                           exclude=[])
-        nmeg = len(picks)
-        if nmeg > 0:
-            megchs = pick_info(info, picks)['chs']
-            megnames = [info['ch_names'][p] for p in picks]
-            logger.info('Read %3d MEG channels from %s'
-                        % (len(picks), info_extra))
-
-        # comp channels
-        if not ignore_ref:
-            picks = pick_types(info, meg=False, ref_meg=True, exclude=[])
-            ncomp = len(picks)
-            if (ncomp > 0):
-                compchs = pick_info(info, picks)['chs']
-                logger.info('Read %3d MEG compensation channels from %s'
-                            % (ncomp, info_extra))
-                # We need to check to make sure these are NOT KIT refs
-                if _has_kit_refs(info, picks):
-                    err = ('Cannot create forward solution with KIT '
-                           'reference channels. Consider using '
-                           '"ignore_ref=True" in calculation')
-                    raise NotImplementedError(err)
-            _print_coord_trans(meg_head_t)
-            # make info structure to allow making compensator later
-        else:
-            ncomp = 0
-        ncomp_data = len(info['comps'])
-        ref_meg = True if not ignore_ref else False
-        picks = pick_types(info, meg=True, ref_meg=ref_meg, exclude=[])
-        meg_info = pick_info(info, picks)
+        megcoils, megcf, compcoils, compcf, megnames, meg_info = \
+            _prep_meg_channels(info, ignore_ref, templates, info_extra)
     else:
         logger.info('MEG not requested. MEG channels omitted.')
-        nmeg = 0
-        meg_info = None
 
     # EEG channels
-    eegnames = None
+    eegels, eegnames = None, None
     if eeg:
-        picks = pick_types(info, meg=False, eeg=True, ref_meg=False,
-                           exclude=[])
-        neeg = len(picks)
-        if neeg > 0:
-            eegchs = pick_info(info, picks)['chs']
-            eegnames = [info['ch_names'][p] for p in picks]
-            logger.info('Read %3d EEG channels from %s'
-                        % (len(picks), info_extra))
+        eegels, eegnames = _prep_eeg_channels(info, templates, info_extra)
     else:
-        neeg = 0
         logger.info('EEG not requested. EEG channels omitted.')
 
-    if neeg <= 0 and nmeg <= 0:
+    if megcoils is None and eegels is None:
         raise RuntimeError('Could not find any MEG or EEG channels')
-
-    # Create coil descriptions with transformation to head or MRI frame
-    templates = _read_coil_defs()
-    if nmeg > 0 and ncomp > 0:  # Compensation channel information
-        logger.info('%d compensation data sets in %s'
-                    % (ncomp_data, info_extra))
-
-    meg_xform = meg_head_t
-    extra_str = 'Head'
-
-    megcoils, megcf, compcoils, compcf = None, None, None, None
-    if nmeg > 0:
-        megcoils, megcf = _create_coils(megchs,
-                                        FIFF.FWD_COIL_ACCURACY_ACCURATE,
-                                        meg_xform, coil_type='meg',
-                                        coilset=templates)
-        if ncomp > 0:
-            compcoils, compcf = _create_coils(compchs,
-                                              FIFF.FWD_COIL_ACCURACY_NORMAL,
-                                              meg_xform, coil_type='meg',
-                                              coilset=templates)
-    eegels = None
-    if neeg > 0:
-        eegels, _ = _create_coils(eegchs, coil_type='eeg', coilset=templates)
-    logger.info('%s coordinate coil definitions created.' % extra_str)
+    logger.info('Head coordinate coil definitions created.')
 
     # Transform the source spaces into the appropriate coordinates
     # (will either be HEAD or MRI)
@@ -412,24 +452,7 @@ def make_forward_solution(info, mri, src, bem, fname=None, meg=True, eeg=True,
 
     # Prepare the BEM model
     logger.info('')
-    logger.info('Setting up the BEM model using %s...\n' % bem)
-    bem_name = bem
-    bem = read_bem_solution(bem)
-    if neeg > 0 and len(bem['surfs']) == 1:
-        raise RuntimeError('Cannot use a homogeneous model in EEG '
-                           'calculations')
-    logger.info('Employing the head->MRI coordinate transform with the '
-                'BEM model.')
-    # fwd_bem_set_head_mri_t: Set the coordinate transformation
-    to, fro = mri_head_t['to'], mri_head_t['from']
-    if fro == FIFF.FIFFV_COORD_HEAD and to == FIFF.FIFFV_COORD_MRI:
-        bem['head_mri_t'] = mri_head_t
-    elif fro == FIFF.FIFFV_COORD_MRI and to == FIFF.FIFFV_COORD_HEAD:
-        bem['head_mri_t'] = invert_transform(mri_head_t)
-    else:
-        raise RuntimeError('Improper coordinate transform')
-    logger.info('BEM model %s is now set up' % op.split(bem_name)[1])
-    logger.info('')
+    bem = _setup_bem(bem, mri_head_t, eegels is not None)
 
     # Circumvent numerical problems by excluding points too close to the skull
     idx = np.where(np.array([s['id'] for s in bem['surfs']]) ==
@@ -487,6 +510,93 @@ def make_forward_solution(info, mri, src, bem, fname=None, meg=True, eeg=True,
     return fwd
 
 
+@verbose
+def update_forward_dev_head_t(fwd, info, bem, ignore_ref=False, n_jobs=1,
+                              copy=True, verbose=None):
+    """Recompute the MEG part of a forward solution for a new head position
+
+    Only the MEG gain matrix depends on the position of the head relative to
+    the MEG device, so the source space and the EEG part of the forward
+    solution are kept as they are. Since the BEM-sensor coupling matrices
+    are cached, this makes it cheap to compute the forward solutions of
+    several runs that only differ by their device-to-head transformation.
+
+    Parameters
+    ----------
+    fwd : instance of Forward
+        A forward solution in head coordinates, computed with free source
+        orientations (e.g., using make_forward_solution).
+    info : instance of mne.io.meas_info.Info | str
+        The measurement info holding the new device-to-head transformation
+        (``info['dev_head_t']``). If str, then it should be a filename to a
+        Raw, Epochs, or Evoked file with measurement information.
+    bem : str
+        Filename of the BEM (e.g., "sample-5120-5120-5120-bem-sol.fif") that
+        was used to compute ``fwd``.
+    ignore_ref : bool
+        If True, do not include reference channels in compensation.
+    n_jobs : int
+        Number of jobs to run in parallel.
+    copy : bool
+        If False, operation will be done in-place (modifying the input).
+    verbose : bool, str, int, or None
+        If not None, override default verbose level (see mne.verbose).
+
+    Returns
+    -------
+    fwd : instance of Forward
+        The forward solution for the new head position.
+    """
+    if isinstance(info, string_types):
+        info = read_info(info, verbose=False)
+    if not isinstance(fwd, Forward):
+        raise TypeError('fwd must be an instance of Forward')
+    if fwd['coord_frame'] != FIFF.FIFFV_COORD_HEAD or \
+            any(s['coord_frame'] != FIFF.FIFFV_COORD_HEAD
+                for s in fwd['src']):
+        raise RuntimeError('The forward solution must be in head '
+                           'coordinates')
+    if is_fixed_orient(fwd, orig=True):
+        raise ValueError('The forward solution must have been computed with '
+                         'free source orientations')
+    if copy is True:
+        fwd = deepcopy(fwd)
+
+    picks = pick_types(fwd['info'], meg=True, eeg=False, ref_meg=False,
+                       exclude=[])
+    fwd_megnames = [fwd['info']['ch_names'][p] for p in picks]
+    if len(fwd_megnames) == 0:
+        raise ValueError('The forward solution does not contain MEG '
+                         'channels')
+    megcoils, megcf, compcoils, compcf, megnames, meg_info = \
+        _prep_meg_channels(info, ignore_ref)
+    missing = [name for name in fwd_megnames
+               if megnames is None or name not in megnames]
+    if len(missing) > 0:
+        raise ValueError('Channels of the forward solution missing from '
+                         'info: %s' % missing)
+
+    bem = _setup_bem(bem, fwd['mri_head_t'], False)
+    megfwd = _compute_forwards(fwd['src'], bem, [megcoils], [megcf],
+                               [compcoils], [compcf], [meg_info], ['meg'],
+                               n_jobs)[0]
+
+    # only replace the MEG rows, the EEG ones do not change
+    rows = [fwd['sol']['row_names'].index(name) for name in fwd_megnames]
+    cols = [megnames.index(name) for name in fwd_megnames]
+    fwd['_orig_sol'][rows] = megfwd[:, cols].T
+    if fwd['sol_grad'] is not None:
+        logger.info('    Gradient of the forward solution cannot be updated '
+                    'and will be discarded')
+        fwd.update(sol_grad=None, _orig_sol_grad=None)
+    fwd['info']['dev_head_t'] = deepcopy(info['dev_head_t'])
+    fwd = convert_forward_solution(fwd, fwd['surf_ori'],
+                                   is_fixed_orient(fwd), copy=False,
+                                   verbose=False)
+    logger.info('Finished.')
+    return fwd
+
+
 def _to_forward_dict(fwd, fwd_grad, names, coord_frame, source_ori):
     """Convert forward solution matrices to dicts"""
     if fwd is not None:
@@ -10,7 +10,10 @@ from mne.datasets import testing
 from mne.forward._lead_dots import (_comp_sum_eeg, _comp_sums_meg,
                                     _get_legen_table,
                                     _get_legen_lut_fast,
-                                    _get_legen_lut_accurate)
+                                    _get_legen_lut_accurate,
+                                    _fast_sphere_dot_r0, _do_self_dots,
+                                    _do_surface_dots)
+from mne.forward._field_interpolation import _mapping_cache
 from mne import pick_types_evoked, read_evokeds
 from mne.fixes import partial
 from mne.externals.six.moves import zip
@@ -90,6 +93,51 @@ def test_legendre_table():
         assert_allclose(n_fact1, n_fact2)
 
 
+def test_dot_products():
+    """Test vectorized lead field dot products
+    """
+    rng = np.random.RandomState(0)
+    r0 = np.array([0., 0., 0.04])
+    coils = list()
+    for n in (1, 4, 2, 8, 1, 3):
+        d = rng.randn(3)
+        d /= np.sqrt(np.sum(d * d))
+        coils.append(dict(rmag=0.11 * d + 0.01 * rng.randn(n, 3),
+                          cosmag=np.tile(d, (n, 1)), w=rng.randn(n)))
+    surf = dict(rr=rng.randn(20, 3), nn=rng.randn(20, 3))
+    surf['rr'] *= 0.12 / np.sqrt(np.sum(surf['rr'] ** 2, axis=1))[:, None]
+    sel = np.arange(len(surf['rr']))
+    for ch_type in ('meg', 'eeg'):
+        lut, n_fact = _get_legen_table(ch_type, False, 50)
+        lut_fun = partial(_get_legen_lut_fast, lut=lut)
+        int_rad = 0.06 * (0.7 if ch_type == 'eeg' else 1.)
+        # one coil (pair) at a time
+        rmags = [c['rmag'] - r0 for c in coils]
+        rlens = [np.sqrt(np.sum(r * r, axis=1)) for r in rmags]
+        rmags = [r / rl[:, np.newaxis] for r, rl in zip(rmags, rlens)]
+        want = np.empty((len(coils), len(coils)))
+        for c1, (r1, l1, co1) in enumerate(zip(rmags, rlens, coils)):
+            for c2, (r2, l2, co2) in enumerate(zip(rmags, rlens, coils)):
+                want[c1, c2] = _fast_sphere_dot_r0(
+                    int_rad, r1, r2, l1, l2, co1['cosmag'], co2['cosmag'],
+                    co1['w'], co2['w'], False, lut_fun, n_fact, ch_type)
+        rsurf = surf['rr'] - r0
+        lsurf = np.sqrt(np.sum(rsurf * rsurf, axis=1))
+        rsurf /= lsurf[:, np.newaxis]
+        want_surf = np.array([_fast_sphere_dot_r0(
+            int_rad, rsurf, r, lsurf, l, surf['nn'], c['cosmag'], None,
+            c['w'], False, lut_fun, n_fact, ch_type)
+            for r, l, c in zip(rmags, rlens, coils)]).T
+        for n_jobs in (1, 2):
+            dots = _do_self_dots(0.06, False, coils, r0, ch_type, lut_fun,
+                                 n_fact, n_jobs)
+            assert_allclose(dots, want, rtol=1e-6)
+            assert_array_equal(dots, dots.T)
+            dots = _do_surface_dots(0.06, False, coils, surf, sel, r0,
+                                    ch_type, lut_fun, n_fact, n_jobs)
+            assert_allclose(dots, want_surf, rtol=1e-6)
+
+
 @testing.requires_testing_data
 def test_make_field_map_eeg():
     """Test interpolation of EEG field onto head
@@ -151,6 +199,16 @@ def test_make_field_map_meg():
     assert_array_equal(fmd[0]['data'].shape, (304, 106))  # maps data onto surf
     assert_true(len(fmd[0]['ch_names']), 106)
 
+    # the mapping is cached for the same geometry
+    assert_true(len(_mapping_cache) > 0)
+    fmd_2 = make_field_map(evoked, trans_fname=None,
+                           subject='sample', subjects_dir=subjects_dir)
+    assert_array_equal(fmd[0]['data'], fmd_2[0]['data'])
+    fmd_2[0]['data'][:] = 0.  # a copy is returned
+    fmd_2 = make_field_map(evoked, trans_fname=None,
+                           subject='sample', subjects_dir=subjects_dir)
+    assert_array_equal(fmd[0]['data'], fmd_2[0]['data'])
+
     assert_raises(ValueError, make_field_map, evoked, ch_type='foobar')
 
 
@@ -15,12 +15,16 @@ from mne.io import read_raw_kit
 from mne.io import read_raw_bti
 from mne.io.constants import FIFF
 from mne import (read_forward_solution, make_forward_solution,
-                 do_forward_solution, read_trans,
+                 do_forward_solution, read_trans, update_forward_dev_head_t,
                  convert_forward_solution, setup_volume_source_space,
                  read_source_spaces)
 from mne.utils import (requires_mne, requires_nibabel, _TempDir,
                        run_tests_if_main, slow_test)
 from mne.forward import Forward
+from mne.forward._compute_forward import (_coil_sol_cache, _do_inf_pots,
+                                          _do_prim_curr, _bem_inf_pots,
+                                          _bem_inf_fields, _get_bem_key)
+from mne.surface import read_bem_solution
 from mne.source_space import (get_volume_labels_from_aseg,
                               _compare_source_spaces, setup_source_space)
 
@@ -78,6 +82,28 @@ def _compare_forwards(fwd, fwd_py, n_sensors, n_src,
                             rtol=1e-3, atol=1e-3)
 
 
+def test_inf_pots_fields_blocks():
+    """Test block-wise infinite-medium potentials and fields
+    """
+    rng = np.random.RandomState(0)
+    rr = rng.randn(23, 3) * 0.03
+    srr = rng.randn(40, 3) * 0.09
+    sol = rng.randn(40, 5)
+    Q = np.linalg.qr(rng.randn(3, 3))[0]
+    coils = [dict(rmag=rng.randn(n, 3) * 0.1, cosmag=rng.randn(n, 3),
+                  w=rng.rand(n)) for n in (1, 4, 8, 4, 2)]
+    # unblocked versions
+    v0s = _bem_inf_pots(rr, srr, Q)
+    want_pots = np.dot(v0s.reshape(len(rr) * 3, len(srr)), sol)
+    want_curr = np.array([np.sum(c['w'] * _bem_inf_fields(
+        rr, c['rmag'], c['cosmag']), 2).ravel() for c in coils]).T
+    for block_size in (None, 1, 5, 23, 100):
+        assert_allclose(_do_inf_pots(rr, srr, Q, sol, block_size),
+                        want_pots, rtol=1e-10)
+        assert_allclose(_do_prim_curr(rr, coils, block_size), want_curr,
+                        rtol=1e-10)
+
+
 @testing.requires_testing_data
 @requires_mne
 def test_make_forward_solution_kit():
@@ -178,6 +204,53 @@ def test_make_forward_solution():
     _compare_forwards(fwd, fwd_py, 366, 1494, meg_rtol=1e-3)
 
 
+@testing.requires_testing_data
+def test_get_bem_key():
+    """Test the cache key of BEM solutions
+    """
+    bem_1, bem_2 = read_bem_solution(fname_bem), read_bem_solution(fname_bem)
+    assert_equal(_get_bem_key(bem_1), (op.realpath(fname_bem),
+                                       os.stat(fname_bem).st_mtime))
+    assert_equal(_get_bem_key(bem_1), _get_bem_key(bem_2))
+    assert_true(_get_bem_key(bem_1) != _get_bem_key(
+        read_bem_solution(fname_bem_meg)))
+    # without a file, the surfaces identify the solution
+    del bem_1['sol_name'], bem_2['sol_name']
+    assert_equal(_get_bem_key(bem_1), _get_bem_key(bem_2))
+    bem_2['sigma'] = bem_2['sigma'] * 2
+    assert_true(_get_bem_key(bem_1) != _get_bem_key(bem_2))
+
+
+@slow_test
+@testing.requires_testing_data
+def test_update_forward_dev_head_t():
+    """Test recomputing the forward solution for a new head position
+    """
+    fwd = make_forward_solution(fname_raw, src=fname_src, bem=fname_bem,
+                                mri=fname_mri, mindist=5.0)
+    # the BEM-sensor couplings are cached for later calls
+    assert_true(len(_coil_sol_cache) > 0)
+    info = Raw(fname_raw).info
+    info['dev_head_t']['trans'][:3, 3] += [0.005, -0.01, 0.002]
+    fwd_new = make_forward_solution(info, src=fname_src, bem=fname_bem,
+                                    mri=fname_mri, mindist=5.0)
+    fwd_up = update_forward_dev_head_t(fwd, info, fname_bem)
+    assert_allclose(fwd_up['sol']['data'], fwd_new['sol']['data'],
+                    rtol=1e-5, atol=1e-16)
+    assert_allclose(fwd_up['info']['dev_head_t']['trans'],
+                    info['dev_head_t']['trans'])
+    # the EEG part is untouched, the original is unchanged (copy=True)
+    assert_allclose(fwd_up['sol']['data'][306:], fwd['sol']['data'][306:])
+    assert_true(np.abs(fwd_up['sol']['data'][:306] -
+                       fwd['sol']['data'][:306]).max() > 0)
+    # the orientation of the forward is preserved
+    fwd_fixed = convert_forward_solution(fwd, force_fixed=True)
+    fwd_up = update_forward_dev_head_t(fwd_fixed, info, fname_bem)
+    assert_equal(fwd_up['sol']['data'].shape, (366, 1494 // 3))
+    assert_raises(TypeError, update_forward_dev_head_t, dict(), info,
+                  fname_bem)
+
+
 @testing.requires_testing_data
 @requires_mne
 def test_do_forward_solution():
@@ -2,6 +2,7 @@
 #          Martin Luessi <mluessi@nmr.mgh.harvard.edu>
 # License: Simplified BSD
 from copy import deepcopy
+from time import time
 
 import numpy as np
 from scipy import linalg
@@ -9,13 +10,14 @@ from scipy import linalg
 from ..forward import is_fixed_orient, _to_fixed_ori
 from ..io.pick import pick_channels_evoked
 from ..minimum_norm.inverse import _prepare_forward, _check_reference
-from ..utils import logger, verbose
+from ..utils import logger, verbose, sum_squared
 from .mxne_inverse import _make_sparse_stc, _prepare_gain
 
 
 @verbose
 def _gamma_map_opt(M, G, alpha, maxit=10000, tol=1e-6, update_mode=1,
-                   group_size=1, gammas=None, verbose=None):
+                   group_size=1, gammas=None, return_info=False,
+                   verbose=None):
     """Hierarchical Bayes (Gamma-MAP)
 
     Parameters
@@ -33,10 +35,13 @@ def _gamma_map_opt(M, G, alpha, maxit=10000, tol=1e-6, update_mode=1,
     group_size : int
         Number of consecutive sources which use the same gamma.
     update_mode : int
-        Update mode, 1: MacKay update (default), 3: Modified MacKay update.
+        Update mode, 1: MacKay update (default), 2: Modified MacKay update
+        (convex bounding).
     gammas : array, shape=(n_sources,)
         Initial values for posterior variances (gammas). If None, a
         variance of 1.0 is used.
+    return_info : bool
+        If True, also return the convergence diagnostics.
     verbose : bool, str, int, or None
         If not None, override default verbose level (see mne.verbose).
 
@@ -46,6 +51,16 @@ def _gamma_map_opt(M, G, alpha, maxit=10000, tol=1e-6, update_mode=1,
         Estimated source time courses.
     active_set : array, shape=(n_active,)
         Indices of active sources.
+    info : dict
+        The cost function ('cost'), the relative change of the gammas
+        ('err'), the active set size ('n_active') and the duration in seconds
+        ('time') of each iteration. Only returned if return_info is True.
+
+    Notes
+    -----
+    Once fewer sources than sensors are active, the model covariance
+    alpha * I + G * Gamma * G.T is never formed: the updates are computed
+    from the Gram matrix of the active sources with the Woodbury identity.
 
     References
     ----------
@@ -87,7 +102,12 @@ def _gamma_map_opt(M, G, alpha, maxit=10000, tol=1e-6, update_mode=1,
         def denom_fun(x):
             return x
 
+    # Gram matrix and G.T * M of the active sources, computed once fewer
+    # sources than sensors are active and then restricted when pruning
+    GTG, GTM = None, None
+    info = dict(cost=list(), err=list(), n_active=list(), time=list())
     for itno in np.arange(maxit):
+        t_start = time()
         gammas[np.isnan(gammas)] = 0.0
 
         gidx = (np.abs(gammas) > eps)
@@ -98,27 +118,60 @@ def _gamma_map_opt(M, G, alpha, maxit=10000, tol=1e-6, update_mode=1,
         if n_active > len(active_set):
             n_active = active_set.size
             G = G[:, gidx]
-
-        CM = alpha * np.eye(n_sensors) + np.dot(G * gammas[np.newaxis, :], G.T)
-        # Invert CM keeping symmetry
-        U, S, V = linalg.svd(CM, full_matrices=False)
-        S = S[np.newaxis, :]
-        CM = np.dot(U * S, U.T)
-        CMinv = np.dot(U / (S + eps), U.T)
-
-        CMinvG = np.dot(CMinv, G)
-        A = np.dot(CMinvG.T, M)  # mult. w. Diag(gamma) in gamma update
-
-        if update_mode == 1:
-            # MacKay fixed point update (10) in [1]
-            numer = gammas ** 2 * np.mean((A * A.conj()).real, axis=1)
-            denom = gammas * np.sum(G * CMinvG, axis=0)
-        elif update_mode == 2:
-            # modified MacKay fixed point update (11) in [1]
-            numer = gammas * np.sqrt(np.mean((A * A.conj()).real, axis=1))
-            denom = np.sum(G * CMinvG, axis=0)  # sqrt is applied below
+            if GTG is not None:
+                GTG = GTG[gidx][:, gidx]
+                GTM = GTM[gidx]
+
+        if 0 < n_active < n_sensors:
+            if GTG is None:
+                GTG = np.dot(G.T, G)
+                GTM = np.dot(G.T, M)
+            # With S = Gamma ** 0.5 and B = alpha * I + S * G.T * G * S
+            # G.T * CM^-1 * M = S^-1 * B^-1 * S * G.T * M and
+            # Gamma * diag(G.T * CM^-1 * G) = diag(B^-1 * S * G.T * G * S)
+            sgammas = np.sqrt(gammas)
+            SGTGS = sgammas[:, np.newaxis] * GTG * sgammas[np.newaxis, :]
+            B = SGTGS.copy()
+            B.flat[::n_active + 1] += alpha
+            B = linalg.cho_factor(B)
+            SGTM = sgammas[:, np.newaxis] * GTM
+            SA = linalg.cho_solve(B, SGTM)
+            A = SA / sgammas[:, np.newaxis]
+            gammas_denom = np.diag(linalg.cho_solve(B, SGTGS))
+            cost = ((n_sensors - n_active) * np.log(alpha) +
+                    2 * np.sum(np.log(np.diag(B[0]))) +
+                    (sum_squared(M) - np.sum(SGTM * SA)) / alpha / n_times)
+
+            if update_mode == 1:
+                # MacKay fixed point update (10) in [1]
+                numer = gammas * np.mean((SA * SA.conj()).real, axis=1)
+                denom = gammas_denom
+            elif update_mode == 2:
+                # modified MacKay fixed point update (11) in [1]
+                numer = sgammas * np.sqrt(np.mean((SA * SA.conj()).real,
+                                                  axis=1))
+                denom = gammas_denom / gammas  # sqrt is applied below
+            else:
+                raise ValueError('Invalid value for update_mode')
         else:
-            raise ValueError('Invalid value for update_mode')
+            CM = alpha * np.eye(n_sensors) + np.dot(G * gammas[np.newaxis, :],
+                                                    G.T)
+            CM = linalg.cho_factor(CM)
+            CMinvG = linalg.cho_solve(CM, G)
+            A = np.dot(CMinvG.T, M)  # mult. w. Diag(gamma) in gamma update
+            cost = (2 * np.sum(np.log(np.diag(CM[0]))) +
+                    np.sum(M * linalg.cho_solve(CM, M)) / n_times)
+
+            if update_mode == 1:
+                # MacKay fixed point update (10) in [1]
+                numer = gammas ** 2 * np.mean((A * A.conj()).real, axis=1)
+                denom = gammas * np.sum(G * CMinvG, axis=0)
+            elif update_mode == 2:
+                # modified MacKay fixed point update (11) in [1]
+                numer = gammas * np.sqrt(np.mean((A * A.conj()).real, axis=1))
+                denom = np.sum(G * CMinvG, axis=0)  # sqrt is applied below
+            else:
+                raise ValueError('Invalid value for update_mode')
 
         if group_size == 1:
             if denom is None:
@@ -144,8 +197,13 @@ def _gamma_map_opt(M, G, alpha, maxit=10000, tol=1e-6, update_mode=1,
 
         gammas_full_old = gammas_full
 
-        logger.info('Iteration: %d\t active set size: %d\t convergence: %0.3e'
-                    % (itno, len(gammas), err))
+        info['cost'].append(cost)
+        info['err'].append(err)
+        info['n_active'].append(len(gammas))
+        info['time'].append(time() - t_start)
+        logger.info('Iteration: %d\t active set size: %d\t convergence: '
+                    '%0.3e\t cost: %0.6e\t (%0.3f sec)'
+                    % (itno, len(gammas), err, cost, info['time'][-1]))
 
         if err < tol:
             break
@@ -162,6 +220,8 @@ def _gamma_map_opt(M, G, alpha, maxit=10000, tol=1e-6, update_mode=1,
     n_const = np.sqrt(M_normalize_constant) / G_normalize_constant
     x_active = n_const * gammas[:, None] * A
 
+    if return_info:
+        return x_active, active_set, info
     return x_active, active_set
 
 
@@ -140,10 +140,11 @@ def mixed_norm(evoked, forward, noise_cov, alpha, loose=0.2, depth=0.8,
     weights_min : float
         Do not consider in the estimation sources for which weights
         is less than weights_min.
-    solver : 'prox' | 'cd' | 'auto'
+    solver : 'prox' | 'cd' | 'bcd' | 'auto'
         The algorithm to use for the optimization. prox stands for
-        proximal interations using the FISTA algorithm while cd uses
-        coordinate descent. cd is only available for fixed orientation.
+        proximal interations using the FISTA algorithm, cd uses
+        coordinate descent and bcd applies block coordinate descent.
+        cd is only available for fixed orientation.
     verbose : bool, str, int, or None
         If not None, override default verbose level (see mne.verbose).
     return_residual : bool
@@ -10,6 +10,7 @@ from scipy import linalg
 
 from .mxne_debiasing import compute_bias
 from ..utils import logger, verbose, sum_squared
+from ..fixes import stacked_eigh
 from ..time_frequency.stft import stft_norm2, stft, istft
 
 
@@ -160,17 +161,32 @@ def dgap_l21(M, G, X, active_set, alpha, n_orient):
     R : array of shape [n_sensors, n_times]
         Current residual of M - G * X
     """
+    gap, pobj, dobj, R, _ = _dgap_l21(M, G, X, active_set, alpha, n_orient)
+    return gap, pobj, dobj, R
+
+
+def _dgap_l21(M, G, X, active_set, alpha, n_orient):
+    """Duality gap that also returns the norms of the groups of G.T * R"""
     GX = np.dot(G[:, active_set], X)
     R = M - GX
     penalty = norm_l21(X, n_orient, copy=True)
     nR2 = sum_squared(R)
     pobj = 0.5 * nR2 + alpha * penalty
-    dual_norm = norm_l2inf(np.dot(G.T, R), n_orient, copy=False)
-    scaling = alpha / dual_norm
-    scaling = min(scaling, 1.0)
+    GTR_norms = np.sqrt(groups_norm2(np.dot(G.T, R), n_orient))
+    dual_norm = np.max(GTR_norms) if len(GTR_norms) else 0.
+    scaling = alpha / max(dual_norm, alpha)
     dobj = 0.5 * (scaling ** 2) * nR2 + scaling * np.sum(R * GX)
     gap = pobj - dobj
-    return gap, pobj, dobj, R
+    return gap, pobj, dobj, R, GTR_norms
+
+
+def _block_lipschitz(G, n_orient):
+    """Squared spectral norms of the groups of n_orient columns of G"""
+    if n_orient == 1:
+        return np.sum(G * G, axis=0)
+    G = G.reshape(G.shape[0], -1, n_orient)
+    gram = np.einsum('ijk,ijl->jkl', G, G)
+    return stacked_eigh(gram)[0][:, -1]
 
 
 @verbose
@@ -202,6 +218,8 @@ def _mixed_norm_solver_prox(M, G, alpha, maxit=200, tol=1e-8, verbose=None,
 
     t = 1.0
     Y = np.zeros((n_sources, n_times))  # FISTA aux variable
+    if init is not None:
+        Y += X  # warm start
     E = []  # track cost function
 
     active_set = np.ones(n_sources, dtype=np.bool)  # start with full AS
@@ -261,6 +279,178 @@ def _mixed_norm_solver_cd(M, G, alpha, maxit=10000, tol=1e-8,
     return X, active_set, pobj
 
 
+@verbose
+def _mixed_norm_solver_bcd(M, G, alpha, maxit=200, tol=1e-8, verbose=None,
+                           init=None, n_orient=1):
+    """Solves L21 inverse problem with block coordinate descent"""
+    n_sensors, n_times = M.shape
+    n_sensors, n_sources = G.shape
+    n_positions = n_sources // n_orient
+
+    # each block is updated with a step given by its own Lipschitz constant
+    # (floored, so that blocks with a zero gain stay zero without NaNs)
+    lipschitz_constant = np.maximum(_block_lipschitz(G, n_orient),
+                                    np.finfo(float).tiny)
+    alpha_lc = alpha / lipschitz_constant
+
+    if init is None:
+        X = np.zeros((n_sources, n_times))
+        R = M.copy()
+    else:
+        X = init.copy()
+        R = M - np.dot(G, X)
+
+    E = []  # track cost function
+    active_set = np.zeros(n_sources, dtype=np.bool)
+    for i in range(maxit):
+        for j in range(n_positions):
+            idx = slice(j * n_orient, (j + 1) * n_orient)
+            G_j = G[:, idx]
+            X_j = X[idx]
+            X_j_new = np.dot(G_j.T, R) / lipschitz_constant[j]
+            was_non_zero = np.any(X_j)
+            if was_non_zero:
+                R += np.dot(G_j, X_j)
+                X_j_new += X_j
+            block_norm = sqrt(sum_squared(X_j_new))
+            if block_norm <= alpha_lc[j]:
+                X_j.fill(0.)
+                active_set[idx] = False
+            else:
+                X_j_new *= 1. - alpha_lc[j] / block_norm
+                R -= np.dot(G_j, X_j_new)
+                X_j[:] = X_j_new
+                active_set[idx] = True
+
+        gap, pobj, dobj, _ = dgap_l21(M, G, X[active_set], active_set, alpha,
+                                      n_orient)
+        E.append(pobj)
+        logger.debug("pobj : %s -- gap : %s" % (pobj, gap))
+        if gap < tol:
+            logger.debug('Convergence reached ! (gap: %s < %s)' % (gap, tol))
+            break
+    X = X[active_set]
+    return X, active_set, E
+
+
+def _get_l21_solver(solver, n_orient):
+    """Helper to pick the L21 solver"""
+    has_sklearn = True
+    try:
+        from sklearn.linear_model.coordinate_descent import MultiTaskLasso  # noqa
+    except ImportError:
+        has_sklearn = False
+
+    if solver == 'auto':
+        if has_sklearn and (n_orient == 1):
+            solver = 'cd'
+        else:
+            solver = 'bcd'
+
+    if solver == 'cd':
+        if n_orient == 1 and not has_sklearn:
+            warnings.warn("Scikit-learn >= 0.12 cannot be found. "
+                          "Using proximal iterations instead of coordinate "
+                          "descent.")
+            solver = 'prox'
+        if n_orient > 1:
+            warnings.warn("Coordinate descent is only available for fixed "
+                          "orientation. Using proximal iterations instead of "
+                          "coordinate descent")
+            solver = 'prox'
+
+    if solver == 'cd':
+        logger.info("Using coordinate descent")
+        l21_solver = _mixed_norm_solver_cd
+    elif solver == 'bcd':
+        logger.info("Using block coordinate descent")
+        l21_solver = _mixed_norm_solver_bcd
+    elif solver == 'prox':
+        logger.info("Using proximal iterations")
+        l21_solver = _mixed_norm_solver_prox
+    else:
+        raise ValueError("solver must be 'prox', 'cd', 'bcd' or 'auto', "
+                         "got %s" % solver)
+    return l21_solver
+
+
+def _mixed_norm_active_set(M, G, alpha, l21_solver, maxit, tol,
+                           active_set_size, n_orient, G_norms, X_init=None,
+                           active_set_init=None):
+    """Solves L21 inverse problem on a growing working set of sources
+
+    The working set is expanded with the sources that violate the KKT
+    conditions the most and the sources that the gap safe rule proves to
+    be inactive at the optimum are discarded.
+
+    For details on the screening rule see:
+    Ndiaye E., Fercoq O., Gramfort A. and Salmon J.,
+    GAP Safe screening rules for sparse multi-task and multi-class models,
+    Advances in Neural Information Processing Systems, 2015
+    """
+    n_sensors, n_times = M.shape
+    n_positions = G.shape[1] // n_orient
+    # positions that can still be active at the optimum
+    screened = np.ones(n_positions, dtype=np.bool)
+
+    if active_set_init is None or not np.any(active_set_init):
+        idx_large_corr = np.argsort(groups_norm2(np.dot(G.T, M), n_orient))
+        active_set = np.zeros(n_positions, dtype=np.bool)
+        active_set[idx_large_corr[-active_set_size:]] = True
+        X_init = None
+    else:
+        active_set = active_set_init[::n_orient].copy()
+    if n_orient > 1:
+        active_set = np.tile(active_set[:, None], [1, n_orient]).ravel()
+
+    for k in range(maxit):
+        X, as_, E = l21_solver(M, G[:, active_set], alpha,
+                               maxit=maxit, tol=tol, init=X_init,
+                               n_orient=n_orient)
+        as_ = np.where(active_set)[0][as_]
+        gap, pobj, dobj, R, GTR_norms = _dgap_l21(M, G, X, as_, alpha,
+                                                  n_orient)
+        logger.info('gap = %s, pobj = %s' % (gap, pobj))
+        if gap < tol:
+            logger.info('Convergence reached ! (gap: %s < %s)' % (gap, tol))
+            break
+
+        # gap safe screening: the dual optimum lies in a ball centered on
+        # the rescaled residual
+        dual_scale = max(alpha, np.max(GTR_norms))
+        radius = sqrt(2. * max(gap, 0.)) / alpha
+        screened &= GTR_norms / dual_scale + radius * G_norms >= 1.
+
+        # add the sources that violate the most the KKT conditions
+        active_pos = active_set[::n_orient]
+        candidates = np.where(screened & ~active_pos &
+                              (GTR_norms > alpha))[0]
+        new_active_idx = candidates[np.argsort(GTR_norms[candidates])]
+        new_active_idx = new_active_idx[-active_set_size:]
+        active_set_old = active_set.copy()
+        active_pos = (active_pos | np.in1d(np.arange(n_positions),
+                                           new_active_idx)) & screened
+        if n_orient > 1:
+            active_set = np.tile(active_pos[:, None], [1, n_orient]).ravel()
+        else:
+            active_set = active_pos
+        logger.info('active set size %s (%d sources screened out)'
+                    % (np.sum(active_set), np.sum(~screened)))
+        if np.all(active_set_old == active_set):
+            logger.info('Convergence stopped (AS did not change) !')
+            break
+        idx_active_set = np.where(active_set)[0]
+        keep = active_set[as_]
+        X_init = np.zeros((len(idx_active_set), n_times), dtype=X.dtype)
+        X_init[np.searchsorted(idx_active_set, as_[keep])] = X[keep]
+    else:
+        logger.warning('Did NOT converge ! (gap: %s > %s)' % (gap, tol))
+
+    active_set = np.zeros(G.shape[1], dtype=np.bool)
+    active_set[as_] = True
+    return X, active_set, E
+
+
 @verbose
 def mixed_norm_solver(M, G, alpha, maxit=3000, tol=1e-8, verbose=None,
                       active_set_size=50, debias=True, n_orient=1,
@@ -294,7 +484,7 @@ def mixed_norm_solver(M, G, alpha, maxit=3000, tol=1e-8, verbose=None,
         Debias source estimates
     n_orient : int
         The number of orientation (1 : fixed or 3 : free or loose).
-    solver : 'prox' | 'cd' | 'auto'
+    solver : 'prox' | 'cd' | 'bcd' | 'auto'
         The algorithm to use for the optimization.
 
     Returns
@@ -306,87 +496,17 @@ def mixed_norm_solver(M, G, alpha, maxit=3000, tol=1e-8, verbose=None,
     E : list
         The value of the objective function over the iterations.
     """
-    n_dipoles = G.shape[1]
-    n_positions = n_dipoles // n_orient
     alpha_max = norm_l2inf(np.dot(G.T, M), n_orient, copy=False)
     logger.info("-- ALPHA MAX : %s" % alpha_max)
     alpha = float(alpha)
 
-    has_sklearn = True
-    try:
-        from sklearn.linear_model.coordinate_descent import MultiTaskLasso  # noqa
-    except ImportError:
-        has_sklearn = False
-
-    if solver == 'auto':
-        if has_sklearn and (n_orient == 1):
-            solver = 'cd'
-        else:
-            solver = 'prox'
-
-    if solver == 'cd':
-        if n_orient == 1 and not has_sklearn:
-            warnings.warn("Scikit-learn >= 0.12 cannot be found. "
-                          "Using proximal iterations instead of coordinate "
-                          "descent.")
-            solver = 'prox'
-        if n_orient > 1:
-            warnings.warn("Coordinate descent is only available for fixed "
-                          "orientation. Using proximal iterations instead of "
-                          "coordinate descent")
-            solver = 'prox'
-
-    if solver == 'cd':
-        logger.info("Using coordinate descent")
-        l21_solver = _mixed_norm_solver_cd
-    else:
-        logger.info("Using proximal iterations")
-        l21_solver = _mixed_norm_solver_prox
+    l21_solver = _get_l21_solver(solver, n_orient)
 
     if active_set_size is not None:
-        X_init = None
-        n_sensors, n_times = M.shape
-        idx_large_corr = np.argsort(groups_norm2(np.dot(G.T, M), n_orient))
-        active_set = np.zeros(n_positions, dtype=np.bool)
-        active_set[idx_large_corr[-active_set_size:]] = True
-        if n_orient > 1:
-            active_set = np.tile(active_set[:, None], [1, n_orient]).ravel()
-        for k in range(maxit):
-            X, as_, E = l21_solver(M, G[:, active_set], alpha,
-                                   maxit=maxit, tol=tol, init=X_init,
-                                   n_orient=n_orient)
-            as_ = np.where(active_set)[0][as_]
-            gap, pobj, dobj, R = dgap_l21(M, G, X, as_, alpha, n_orient)
-            logger.info('gap = %s, pobj = %s' % (gap, pobj))
-            if gap < tol:
-                logger.info('Convergence reached ! (gap: %s < %s)'
-                            % (gap, tol))
-                break
-            else:  # add sources
-                idx_large_corr = np.argsort(groups_norm2(np.dot(G.T, R),
-                                                         n_orient))
-                new_active_idx = idx_large_corr[-active_set_size:]
-                if n_orient > 1:
-                    new_active_idx = (n_orient * new_active_idx[:, None] +
-                                      np.arange(n_orient)[None, :])
-                    new_active_idx = new_active_idx.ravel()
-                idx_old_active_set = as_
-                active_set_old = active_set.copy()
-                active_set[new_active_idx] = True
-                as_size = np.sum(active_set)
-                logger.info('active set size %s' % as_size)
-                X_init = np.zeros((as_size, n_times), dtype=X.dtype)
-                idx_active_set = np.where(active_set)[0]
-                idx = np.searchsorted(idx_active_set, idx_old_active_set)
-                X_init[idx] = X
-                if np.all(active_set_old == active_set):
-                    logger.info('Convergence stopped (AS did not change) !')
-                    break
-        else:
-            logger.warning('Did NOT converge ! (gap: %s > %s)' % (gap, tol))
-
-        active_set = np.zeros_like(active_set)
-        active_set[as_] = True
+        G_norms = np.sqrt(_block_lipschitz(G, n_orient))
+        X, active_set, E = _mixed_norm_active_set(M, G, alpha, l21_solver,
+                                                  maxit, tol, active_set_size,
+                                                  n_orient, G_norms)
     else:
         X, active_set, E = l21_solver(M, G, alpha, maxit=maxit,
                                       tol=tol, n_orient=n_orient)
@@ -398,6 +518,80 @@ def mixed_norm_solver(M, G, alpha, maxit=3000, tol=1e-8, verbose=None,
     return X, active_set, E
 
 
+@verbose
+def mixed_norm_solver_path(M, G, alphas, maxit=3000, tol=1e-8, verbose=None,
+                           active_set_size=50, debias=True, n_orient=1,
+                           solver='auto'):
+    """Solves L21 inverse problem along a regularization path
+
+    The problems are solved from the largest to the smallest value of alpha,
+    each solution being used to warm start the next one.
+
+    Parameters
+    ----------
+    M : array
+        The data
+    G : array
+        The forward operator
+    alphas : array of float
+        The values of the regularization parameter.
+    maxit : int
+        The number of iterations
+    tol : float
+        Tolerance on dual gap for convergence checking
+    verbose : bool, str, int, or None
+        If not None, override default verbose level (see mne.verbose).
+    active_set_size : int | None
+        Size of active set increase at each iteration. If None, no active set
+        strategy is used.
+    debias : bool
+        Debias source estimates
+    n_orient : int
+        The number of orientation (1 : fixed or 3 : free or loose).
+    solver : 'prox' | 'cd' | 'bcd' | 'auto'
+        The algorithm to use for the optimization.
+
+    Returns
+    -------
+    Xs : list of array
+        The source estimates for each value of alpha.
+    active_sets : list of array
+        The masks of active sources for each value of alpha.
+    Es : list of list
+        The values of the objective function over the iterations for each
+        value of alpha.
+    """
+    alphas = np.atleast_1d(np.asarray(alphas, dtype=np.float))
+    l21_solver = _get_l21_solver(solver, n_orient)
+    if active_set_size is not None:
+        G_norms = np.sqrt(_block_lipschitz(G, n_orient))
+
+    n_times = M.shape[1]
+    Xs, active_sets, Es = [None] * len(alphas), [None] * len(alphas), \
+        [None] * len(alphas)
+    X, active_set = None, None
+    for ii in np.argsort(alphas)[::-1]:
+        alpha = alphas[ii]
+        logger.info('Solving for alpha = %s' % alpha)
+        if active_set_size is not None:
+            X, active_set, E = _mixed_norm_active_set(
+                M, G, alpha, l21_solver, maxit, tol, active_set_size,
+                n_orient, G_norms, X_init=X, active_set_init=active_set)
+        else:
+            X_init = None
+            if X is not None:
+                X_init = np.zeros((G.shape[1], n_times))
+                X_init[active_set] = X
+            X, active_set, E = l21_solver(M, G, alpha, maxit=maxit, tol=tol,
+                                          init=X_init, n_orient=n_orient)
+        X_out = X
+        if (active_set.sum() > 0) and debias:
+            bias = compute_bias(M, G[:, active_set], X, n_orient=n_orient)
+            X_out = X * bias[:, np.newaxis]
+        Xs[ii], active_sets[ii], Es[ii] = X_out, active_set.copy(), E
+    return Xs, active_sets, Es
+
+
 ###############################################################################
 # TF-MxNE
 
@@ -468,10 +662,109 @@ class _PhiT(object):
                      self.n_times)
 
 
+def _tf_prox(Z, alpha_space_lc, alpha_time_lc, n_orient, shape):
+    """Proximity operator of the L1 + L21 penalty for a block of TF coefs"""
+    Z, active_set_l1 = prox_l1(Z, alpha_time_lc, n_orient)
+    Z, active_set_l21 = prox_l21(Z, alpha_space_lc, n_orient, shape=shape,
+                                 is_stft=True)
+    active_set_l1[active_set_l1] = active_set_l21
+    return Z, active_set_l1
+
+
+def _tf_violations(G_blocks, R, candidates, alpha_space_lc, alpha_time_lc,
+                   lipschitz_constant, phi, n_orient, shape, n_max,
+                   chunk_size=100):
+    """Find inactive locations that a gradient step would make active
+
+    The lipschitz constants must be positive (see tf_mixed_norm_solver).
+    """
+    violations = list()
+    for start in range(0, len(candidates), chunk_size):
+        idx = candidates[start:start + chunk_size]
+        GTR = np.concatenate([np.dot(G_blocks[j].T, R) / lipschitz_constant[j]
+                              for j in idx], axis=0)
+        Z = phi(GTR)
+        # each location has its own thresholds
+        for ii, j in enumerate(idx):
+            _, active = _tf_prox(Z[ii * n_orient:(ii + 1) * n_orient],
+                                 alpha_space_lc[j], alpha_time_lc[j],
+                                 n_orient, shape)
+            if np.any(active):
+                violations.append(j)
+                if len(violations) == n_max:
+                    return violations
+    return violations
+
+
+def _tf_mixed_norm_solver_bcd(G_blocks, R, Z, X, positions, alpha_space,
+                              alpha_time, lipschitz_constant, phi, phiT,
+                              n_orient, shape, maxit, tol, log_objective):
+    """Block coordinate descent for TF L21+L1 on a set of locations
+
+    Z and X hold the TF coefficients and time courses of the active locations
+    and are updated inplace. The residual R is returned. The lipschitz
+    constants must be positive (see tf_mixed_norm_solver).
+    """
+    alpha_space_lc = alpha_space / lipschitz_constant
+    alpha_time_lc = alpha_time / lipschitz_constant
+    E = []
+    for i in range(maxit):
+        max_diff = 0.0
+        changed = False
+        for j in positions:
+            G_j = G_blocks[j]
+            GTR = np.dot(G_j.T, R) / lipschitz_constant[j]
+            was_active = j in Z
+            if was_active:
+                Z_j = Z[j] + phi(GTR)
+            elif sqrt(sum_squared(GTR)) <= alpha_space_lc[j]:
+                # phi being a tight frame the norm of phi(GTR) is the one of
+                # GTR and the prox can only shrink it: the block stays zero
+                continue
+            else:
+                Z_j = phi(GTR)
+            Z_j, active = _tf_prox(Z_j, alpha_space_lc[j], alpha_time_lc[j],
+                                   n_orient, shape)
+            if not np.any(active):
+                if was_active:
+                    R += np.dot(G_j, X.pop(j))
+                    max_diff = max(max_diff, np.max(np.abs(Z.pop(j))))
+                    changed = True
+                continue
+            X_j = phiT(Z_j)
+            if was_active:
+                R -= np.dot(G_j, X_j - X[j])
+                max_diff = max(max_diff, np.max(np.abs(Z_j - Z[j])))
+            else:
+                R -= np.dot(G_j, X_j)
+                max_diff = max(max_diff, np.max(np.abs(Z_j)))
+                changed = True
+            Z[j], X[j] = Z_j, X_j
+
+        if log_objective:  # log cost function value
+            pobj = 0.5 * sum_squared(R)
+            for Z_j in Z.values():
+                Z2 = np.abs(Z_j) ** 2
+                pobj += (alpha_space * sqrt(np.sum(stft_norm2(
+                         Z_j.reshape(*shape)))) +
+                         alpha_time * np.sqrt(np.sum(
+                             Z2.T.reshape(-1, n_orient), axis=1)).sum())
+            E.append(pobj)
+            logger.info("Iteration %d :: pobj %f :: n_active %d" % (
+                        i + 1, pobj, len(Z)))
+        else:
+            logger.info("Iteration %d" % (i + 1))
+
+        if not changed and max_diff < tol:
+            break
+    return R, E
+
+
 @verbose
 def tf_mixed_norm_solver(M, G, alpha_space, alpha_time, wsize=64, tstep=4,
                          n_orient=1, maxit=200, tol=1e-8, log_objective=True,
-                         lipschitz_constant=None, debias=True, verbose=None):
+                         lipschitz_constant=None, debias=True,
+                         active_set_size=10, verbose=None):
     """Solves TF L21+L1 inverse solver
 
     Algorithm is detailed in:
@@ -516,11 +809,14 @@ def tf_mixed_norm_solver(M, G, alpha_space, alpha_time, wsize=64, tstep=4,
     log_objective : bool
         If True, the value of the minimized objective function is computed
         and stored at every iteration.
-    lipschitz_constant : float | None
-        The lipschitz constant of the spatio temporal linear operator.
-        If None it is estimated.
+    lipschitz_constant : float | array | None
+        The lipschitz constants of the spatio temporal linear operator
+        restricted to each source location. If None they are computed.
     debias : bool
         Debias source estimates.
+    active_set_size : int
+        Maximum number of source locations added to the active set at each
+        iteration.
     verbose : bool, str, int, or None
         If not None, override default verbose level (see mne.verbose).
 
@@ -533,97 +829,71 @@ def tf_mixed_norm_solver(M, G, alpha_space, alpha_time, wsize=64, tstep=4,
     E : list
         The value of the objective function at each iteration. If log_objective
         is False, it will be empty.
+
+    Notes
+    -----
+    The problem is solved with block coordinate descent on an active set of
+    source locations. Each location is updated with its own Lipschitz
+    constant and only the active locations are transformed with the STFT.
     """
     n_sensors, n_times = M.shape
     n_dipoles = G.shape[1]
+    n_positions = n_dipoles // n_orient
 
     n_step = int(ceil(n_times / float(tstep)))
     n_freq = wsize // 2 + 1
     n_coefs = n_step * n_freq
+    shape = (-1, n_freq, n_step)
     phi = _Phi(wsize, tstep, n_coefs)
     phiT = _PhiT(tstep, n_freq, n_step, n_times)
 
-    Z = np.zeros((0, n_coefs), dtype=np.complex)
-    active_set = np.zeros(n_dipoles, dtype=np.bool)
-    R = M.copy()  # residual
-
+    # As phi is a tight frame, the Lipschitz constant of each location is
+    # the one of its block of the gain matrix
     if lipschitz_constant is None:
-        lipschitz_constant = 1.1 * tf_lipschitz_constant(M, G, phi, phiT)
-
-    logger.info("lipschitz_constant : %s" % lipschitz_constant)
+        lipschitz_constant = _block_lipschitz(G, n_orient)
+    # floored once for the helpers, so that locations with a zero gain are
+    # never active and stay zero without NaNs
+    lipschitz_constant = np.maximum(lipschitz_constant * np.ones(n_positions),
+                                    np.finfo(float).tiny)
+    logger.info("lipschitz_constant : %s" % np.max(lipschitz_constant))
+    alpha_space_lc = alpha_space / lipschitz_constant
+    alpha_time_lc = alpha_time / lipschitz_constant
 
-    t = 1.0
-    Y = np.zeros((n_dipoles, n_coefs), dtype=np.complex)  # FISTA aux variable
-    Y[active_set] = Z
+    G_blocks = [np.ascontiguousarray(G[:, j * n_orient:(j + 1) * n_orient])
+                for j in range(n_positions)]
+    Z, X = dict(), dict()  # coefficients and time courses of active blocks
+    R = M.copy()  # residual
     E = []  # track cost function
-    Y_time_as = None
-    Y_as = None
-
-    alpha_time_lc = alpha_time / lipschitz_constant
-    alpha_space_lc = alpha_space / lipschitz_constant
-    for i in range(maxit):
-        Z0, active_set_0 = Z, active_set  # store previous values
-
-        if active_set.sum() < len(R) and Y_time_as is not None:
-            # trick when using tight frame to do a first screen based on
-            # L21 prox (L21 norms are not changed by phi)
-            GTR = np.dot(G.T, R) / lipschitz_constant
-            A = GTR.copy()
-            A[Y_as] += Y_time_as
-            _, active_set_l21 = prox_l21(A, alpha_space_lc, n_orient)
-            # just compute prox_l1 on rows that won't be zeroed by prox_l21
-            B = Y[active_set_l21] + phi(GTR[active_set_l21])
-            Z, active_set_l1 = prox_l1(B, alpha_time_lc, n_orient)
-            active_set_l21[active_set_l21] = active_set_l1
-            active_set_l1 = active_set_l21
-        else:
-            Y += np.dot(G.T, phi(R)) / lipschitz_constant  # ISTA step
-            Z, active_set_l1 = prox_l1(Y, alpha_time_lc, n_orient)
-
-        Z, active_set_l21 = prox_l21(Z, alpha_space_lc, n_orient,
-                                     shape=(-1, n_freq, n_step), is_stft=True)
-        active_set = active_set_l1
-        active_set[active_set_l1] = active_set_l21
-
-        # Check convergence : max(abs(Z - Z0)) < tol
-        stop = (safe_max_abs(Z, ~active_set_0[active_set]) < tol and
-                safe_max_abs(Z0, ~active_set[active_set_0]) < tol and
-                safe_max_abs_diff(Z, active_set_0[active_set],
-                                  Z0, active_set[active_set_0]) < tol)
-        if stop:
-            print('Convergence reached !')
+    for k in range(maxit):
+        # add the locations that violate the most the optimality conditions
+        GTR_norms = np.sqrt(groups_norm2(np.dot(G.T, R), n_orient))
+        GTR_norms /= lipschitz_constant
+        candidates = np.where(GTR_norms > alpha_space_lc)[0]
+        candidates = candidates[np.argsort(GTR_norms[candidates])[::-1]]
+        candidates = [j for j in candidates if j not in Z]
+        new_active = _tf_violations(G_blocks, R, candidates, alpha_space_lc,
+                                    alpha_time_lc, lipschitz_constant, phi,
+                                    n_orient, shape, active_set_size)
+        if len(new_active) == 0:
+            logger.info('Convergence reached !')
             break
+        positions = np.sort(list(Z.keys()) + list(new_active))
+        logger.info('active set size %d' % len(positions))
+        R, E_k = _tf_mixed_norm_solver_bcd(
+            G_blocks, R, Z, X, positions, alpha_space, alpha_time,
+            lipschitz_constant, phi, phiT, n_orient, shape, maxit, tol,
+            log_objective)
+        E.extend(E_k)
+    else:
+        logger.warning('Did NOT converge !')
 
-        # FISTA 2 steps
-        # compute efficiently : Y = Z + ((t0 - 1.0) / t) * (Z - Z0)
-        t0 = t
-        t = 0.5 * (1.0 + sqrt(1.0 + 4.0 * t ** 2))
-        Y.fill(0.0)
-        dt = ((t0 - 1.0) / t)
-        Y[active_set] = (1.0 + dt) * Z
-        if len(Z0):
-            Y[active_set_0] -= dt * Z0
-        Y_as = active_set_0 | active_set
-
-        Y_time_as = phiT(Y[Y_as])
-        R = M - np.dot(G[:, Y_as], Y_time_as)
-
-        if log_objective:  # log cost function value
-            Z2 = np.abs(Z)
-            Z2 **= 2
-            X = phiT(Z)
-            RZ = M - np.dot(G[:, active_set], X)
-            pobj = (0.5 * linalg.norm(RZ, ord='fro') ** 2 +
-                    alpha_space * norm_l21(X, n_orient) +
-                    alpha_time * np.sqrt(np.sum(Z2.T.reshape(-1, n_orient),
-                                                axis=1)).sum())
-            E.append(pobj)
-            logger.info("Iteration %d :: pobj %f :: n_active %d" % (i + 1,
-                        pobj, np.sum(active_set)))
-        else:
-            logger.info("Iteration %d" % i + 1)
-
-    X = phiT(Z)
+    positions = np.sort(list(Z.keys()))
+    active_set = np.zeros(n_positions, dtype=np.bool)
+    active_set[positions] = True
+    if n_orient > 1:
+        active_set = np.tile(active_set[:, None], [1, n_orient]).ravel()
+    X = np.concatenate([X[j] for j in positions], axis=0) if len(positions) \
+        else np.zeros((0, n_times))
 
     if (active_set.sum() > 0) and debias:
         bias = compute_bias(M, G[:, active_set], X, n_orient=n_orient)
@@ -5,12 +5,14 @@
 import os.path as op
 import numpy as np
 from nose.tools import assert_true
-from numpy.testing import assert_array_almost_equal
+from numpy.testing import (assert_array_almost_equal, assert_array_equal,
+                           assert_allclose)
 
 from mne.datasets import testing
 from mne import read_cov, read_forward_solution, read_evokeds
 from mne.cov import regularize
 from mne.inverse_sparse import gamma_map
+from mne.inverse_sparse._gamma_map import _gamma_map_opt
 from mne import pick_types_forward
 from mne.utils import run_tests_if_main, slow_test
 
@@ -56,4 +58,30 @@ def test_gamma_map():
     assert_array_almost_equal(evoked.times, res.times)
 
 
+def test_gamma_map_opt():
+    """Test Gamma MAP optimization in sensor and source space"""
+    rng = np.random.RandomState(0)
+    n_sensors, n_sources, n_times = 20, 12, 30
+    G = rng.randn(n_sensors, n_sources)
+    X = np.zeros((n_sources, n_times))
+    X[[2, 7]] = rng.randn(2, n_times)
+    M = np.dot(G, X) + 0.1 * rng.randn(n_sensors, n_times)
+    # zero columns make the first iteration use the sensor space covariance
+    G_pad = np.concatenate([G, np.zeros((n_sensors, n_sensors))], axis=1)
+    for update_mode in (1, 2):
+        for group_size in (1, 2):
+            X_hat, active_set, info = _gamma_map_opt(
+                M, G, 0.1, tol=1e-8, update_mode=update_mode,
+                group_size=group_size, return_info=True, verbose=False)
+            X_pad, active_set_pad = _gamma_map_opt(
+                M, G_pad, 0.1, tol=1e-8, update_mode=update_mode,
+                group_size=group_size, verbose=False)
+            assert_array_equal(active_set, active_set_pad)
+            assert_allclose(X_hat, X_pad, rtol=1e-7, atol=1e-10)
+            assert_true(np.all(np.in1d([2, 7], active_set)))
+            n_iter = len(info['cost'])
+            assert_true(all(len(v) == n_iter for v in info.values()))
+            assert_true(info['err'][-1] < 1e-8)
+
+
 run_tests_if_main()
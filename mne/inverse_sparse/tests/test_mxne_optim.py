@@ -5,8 +5,10 @@
 import numpy as np
 import warnings
 from numpy.testing import assert_array_equal, assert_array_almost_equal
+from nose.tools import assert_true
 
 from mne.inverse_sparse.mxne_optim import (mixed_norm_solver,
+                                           mixed_norm_solver_path,
                                            tf_mixed_norm_solver)
 
 warnings.simplefilter('always')  # enable b/c these tests throw warnings
@@ -60,6 +62,10 @@ def test_l21_mxne():
     X_hat_prox, active_set, _ = mixed_norm_solver(
         *args, active_set_size=2, debias=True, n_orient=2, solver='prox')
     assert_array_equal(np.where(active_set)[0], [0, 1, 4, 5])
+    X_hat_bcd, active_set, _ = mixed_norm_solver(
+        *args, active_set_size=2, debias=True, n_orient=2, solver='bcd')
+    assert_array_equal(np.where(active_set)[0], [0, 1, 4, 5])
+    assert_array_almost_equal(X_hat_prox, X_hat_bcd, 5)
     # suppress a coordinate-descent warning here
     with warnings.catch_warnings(record=True):
         X_hat_cd, active_set, _ = mixed_norm_solver(
@@ -67,6 +73,16 @@ def test_l21_mxne():
     assert_array_equal(np.where(active_set)[0], [0, 1, 4, 5])
     assert_array_equal(X_hat_prox, X_hat_cd)
 
+    # a location with a zero gain stays inactive
+    G_0 = G.copy()
+    G_0[:, 2:4] = 0.
+    for active_set_size in (None, 2):
+        X_hat_bcd_0, active_set, _ = mixed_norm_solver(
+            M, G_0, alpha, 1000, 1e-8, active_set_size=active_set_size,
+            debias=True, n_orient=2, solver='bcd')
+        assert_array_equal(np.where(active_set)[0], [0, 1, 4, 5])
+        assert_array_almost_equal(X_hat_bcd, X_hat_bcd_0, 5)
+
     X_hat_prox, active_set, _ = mixed_norm_solver(
         *args, active_set_size=2, debias=True, n_orient=5)
     assert_array_equal(np.where(active_set)[0], [0, 1, 2, 3, 4])
@@ -76,6 +92,30 @@ def test_l21_mxne():
     assert_array_equal(np.where(active_set)[0], [0, 1, 2, 3, 4])
 
 
+def test_l21_mxne_path():
+    """Test MxNE solver along a regularization path"""
+    n, p, t = 30, 40, 20
+    rng = np.random.RandomState(0)
+    G = rng.randn(n, p)
+    G /= np.std(G, axis=0)[None, :]
+    X = np.zeros((p, t))
+    X[0] = 3
+    X[4] = -2
+    M = np.dot(G, X) + 0.1 * rng.randn(n, t)
+
+    alphas = [5., 50., 20.]
+    for n_orient, active_set_size in ((1, None), (2, 2), (1, 2)):
+        Xs, active_sets, _ = mixed_norm_solver_path(
+            M, G, alphas, 1000, 1e-8, active_set_size=active_set_size,
+            debias=True, n_orient=n_orient, solver='bcd')
+        for alpha, X_hat, active_set in zip(alphas, Xs, active_sets):
+            X_ref, active_set_ref, _ = mixed_norm_solver(
+                M, G, alpha, 1000, 1e-8, active_set_size=active_set_size,
+                debias=True, n_orient=n_orient, solver='bcd')
+            assert_array_equal(active_set, active_set_ref)
+            assert_array_almost_equal(X_hat, X_ref, 5)
+
+
 def test_tf_mxne():
     """Test convergence of TF-MxNE solver"""
     alpha_space = 10
@@ -89,6 +129,20 @@ def test_tf_mxne():
 
     assert_array_equal(np.where(active_set_hat)[0], active_set)
 
+    X_hat, active_set_hat, E = tf_mixed_norm_solver(
+        M, G, alpha_space, alpha_time, maxit=200, tol=1e-8, verbose=True,
+        n_orient=2, tstep=4, wsize=32, active_set_size=1)
+
+    assert_array_equal(np.where(active_set_hat)[0], [0, 1, 4, 5])
+
+    # a location with a zero gain stays inactive
+    G[:, 2] = 0.
+    X_hat, active_set_hat, E = tf_mixed_norm_solver(
+        M, G, alpha_space, alpha_time, maxit=200, tol=1e-8,
+        n_orient=1, tstep=4, wsize=32, lipschitz_constant=np.sum(G * G, 0))
+    assert_array_equal(np.where(active_set_hat)[0], active_set)
+    assert_true(np.all(np.isfinite(X_hat)))
+
 
 def test_tf_mxne_vs_mxne():
     """Test equivalence of TF-MxNE (with alpha_time=0) and MxNE"""
@@ -106,3 +160,13 @@ def test_tf_mxne_vs_mxne():
         M, G, alpha_space, maxit=200, tol=1e-8, verbose=False, n_orient=1,
         active_set_size=None, debias=False)
     assert_array_almost_equal(X_hat, X_hat_l21, decimal=2)
+
+    for n_orient in (1, 2):
+        X_hat, active_set_hat, E = tf_mixed_norm_solver(
+            M, G, alpha_space, alpha_time, maxit=1000, tol=1e-10,
+            debias=False, n_orient=n_orient, tstep=4, wsize=32)
+        X_hat_l21, active_set_l21, _ = mixed_norm_solver(
+            M, G, alpha_space, maxit=1000, tol=1e-10, n_orient=n_orient,
+            active_set_size=None, debias=False, solver='bcd')
+        assert_array_equal(active_set_hat, active_set_l21)
+        assert_array_almost_equal(X_hat, X_hat_l21, decimal=8)
@@ -19,7 +19,7 @@ from scipy.signal import hilbert
 from scipy import linalg
 
 from .constants import FIFF
-from .pick import pick_types, channel_type, pick_channels, pick_info
+from .pick import pick_types, channel_type, pick_channels
 from .meas_info import write_meas_info
 from .proj import setup_proj, activate_proj, proj_equal, ProjMixin
 from ..channels.channels import (ContainsMixin, PickDropChannelsMixin,
@@ -133,6 +133,56 @@ class _BaseRaw(ProjMixin, ContainsMixin, PickDropChannelsMixin,
                                              verbose=self.verbose)
         return data, times
 
+    def _dot_operator(self, mult, sel, n_times=None):
+        """Prepare mult for several calls to _dot_data with the same sel
+
+        Readers that combine ``mult`` with the operators applied while
+        reading the data can override this to combine them only once.
+
+        Parameters
+        ----------
+        mult : array, shape (n_out, n_sel_channels)
+            The linear operator.
+        sel : array-like of int
+            The channels to apply the operator to.
+        n_times : int | None
+            The total number of samples the operator will be applied to.
+            If None, all the samples.
+
+        Returns
+        -------
+        op : array | dict
+            The operator to pass to _dot_data instead of mult.
+        """
+        return mult
+
+    def _dot_data(self, mult, sel, start=0, stop=None):
+        """Compute np.dot(mult, self[sel, start:stop][0])
+
+        Readers that load data on demand can override this to combine
+        ``mult`` with the operators applied while reading the data.
+
+        Parameters
+        ----------
+        mult : array, shape (n_out, n_sel_channels) | dict
+            The linear operator, or the output of _dot_operator.
+        sel : array-like of int
+            The channels to apply the operator to.
+        start : int
+            First sample to include.
+        stop : int | None
+            First sample to not include. If None, data is included to the end.
+
+        Returns
+        -------
+        data : array, shape (n_out, n_samples)
+            The transformed data.
+        times : array, shape (n_samples,)
+            The time values corresponding to the samples.
+        """
+        data, times = self[sel, start:stop]
+        return np.dot(mult, data), times
+
     def __setitem__(self, item, value):
         """setting raw data content with python slicing"""
         if not self.preload:
@@ -1002,8 +1052,8 @@ class _BaseRaw(ProjMixin, ContainsMixin, PickDropChannelsMixin,
 
         Notes
         -----
-        If data are not pre-loaded, the appropriate data will be loaded
-        by this function (can be memory intensive).
+        The data are processed in chunks of 10 s, so they do not need to
+        be loaded into memory at once.
 
         Projectors are not taken into account unless they have been applied
         to the data using apply_proj(), since it is not always possible
@@ -1011,28 +1061,22 @@ class _BaseRaw(ProjMixin, ContainsMixin, PickDropChannelsMixin,
 
         Bad channels will be excluded from calculations.
         """
-        from ..cov import _estimate_rank_meeg_signals
+        from ..cov import _estimate_rank_raw
 
         start = max(0, self.time_as_index(tstart)[0])
         if tstop is None:
             stop = self.n_times - 1
         else:
             stop = min(self.n_times - 1, self.time_as_index(tstop)[0])
-        tslice = slice(start, stop + 1)
         if picks is None:
             picks = pick_types(self.info, meg=True, eeg=True, ref_meg=False,
                                exclude='bads')
         # ensure we don't get a view of data
         if len(picks) == 1:
             return 1.0, 1.0
-        # this should already be a copy, so we can overwrite it
-        data = self[picks, tslice][0]
-        out = _estimate_rank_meeg_signals(
-            data, pick_info(self.info, picks),
-            scalings=scalings, tol=tol, return_singular=return_singular,
-            copy=False)
-
-        return out
+        return _estimate_rank_raw(self, picks, start, stop + 1,
+                                  scalings=scalings, tol=tol,
+                                  return_singular=return_singular)
 
     @property
     def ch_names(self):
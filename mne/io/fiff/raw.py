@@ -385,8 +385,79 @@ class RawFIFF(_BaseRaw):
 
         return raw, next_fname
 
+    def _dot_operator(self, mult, sel, n_times=None):
+        """Combine mult with the read operators once for _dot_data"""
+        if self.preload:
+            return mult
+        if n_times is None:
+            n_times = self.n_times
+        read_mult = self._read_operator(sel, self._projector, mult, n_times)
+        return dict(mult=mult, sel=sel, projector=self._projector,
+                    read_mult=read_mult)
+
+    def _dot_data(self, mult, sel, start=0, stop=None):
+        """Compute np.dot(mult, self[sel, start:stop][0])"""
+        op = mult if isinstance(mult, dict) else None
+        if op is not None:
+            mult = op['mult']
+            if op['projector'] is not self._projector or \
+                    not np.array_equal(op['sel'], sel):
+                op = None  # the operator was prepared for other reads
+        if self.preload:
+            return super(RawFIFF, self)._dot_data(mult, sel, start, stop)
+        return self._read_segment(
+            start=start, stop=stop, sel=sel, projector=self._projector,
+            mult=mult, verbose=self.verbose,
+            read_mult=None if op is None else op['read_mult'])
+
+    def _read_operator(self, sel, projector, mult, n_times):
+        """Combine the operators applied to the data read from disk
+
+        Calibration, compensation, projection and channel selection are
+        combined into a single matrix, which is also fused with mult if this
+        is cheaper (including the cost of fusing them) than applying both to
+        the n_times samples that are read. Returns None (only calibrate the
+        data) or a tuple (matrices, used) such that the data are
+        np.dot(matrices[0], np.dot(matrices[1], data[used])) (or a single
+        matrix product).
+        """
+        nchan = self.info['nchan']
+        idx = slice(None, None, None) if sel is None else sel
+        cals = self.cals.ravel()[np.newaxis, :]
+        if self.comp is not None:
+            if projector is not None:
+                read_mult = np.dot(projector[idx], self.comp * cals)
+            else:
+                read_mult = self.comp[idx] * cals
+        elif projector is not None:
+            read_mult = projector[idx] * cals
+        elif mult is not None:
+            read_mult = np.eye(nchan)[idx] * cals
+        else:
+            return None
+        # only the channels that contribute need to be multiplied
+        used = np.where(np.any(read_mult != 0, axis=0))[0]
+        if len(used) == nchan:
+            used = slice(None, None, None)
+        else:
+            read_mult = read_mult[:, used]
+        read_mult = [read_mult]
+        if mult is not None:
+            # fuse the requested operator with the others unless applying
+            # them one after another is cheaper
+            n_out, n_in = mult.shape
+            n_used = read_mult[0].shape[1]
+            cost_fused = n_out * n_used * (n_in + n_times)
+            cost_chained = n_times * n_in * (n_out + n_used)
+            if cost_fused <= cost_chained:
+                read_mult = [np.dot(mult, read_mult[0])]
+            else:
+                read_mult = [mult] + read_mult
+        return read_mult, used
+
     def _read_segment(self, start=0, stop=None, sel=None, data_buffer=None,
-                      verbose=None, projector=None):
+                      verbose=None, projector=None, mult=None,
+                      read_mult=None):
         """Read a chunk of raw data
 
         Parameters
@@ -407,6 +478,15 @@ class RawFIFF(_BaseRaw):
             If not None, override default verbose level (see mne.verbose).
         projector : array
             SSP operator to apply to the data.
+        mult : array, shape (n_out, n_sel_channels) | None
+            Linear operator to apply to the selected channels after
+            calibration, compensation and projection. It is combined with
+            these operators beforehand, so that each buffer read from disk is
+            transformed by a single matrix product. The returned data then
+            have n_out rows instead of one row per selected channel.
+        read_mult : tuple | None
+            The combined operators, as returned by _read_operator for the
+            same sel, projector and mult, to avoid combining them again.
 
         Returns
         -------
@@ -434,7 +514,8 @@ class RawFIFF(_BaseRaw):
         if sel is not None and len(sel) > 1 and np.all(np.diff(sel) == 1):
             sel = slice(sel[0], sel[-1] + 1)
         idx = slice(None, None, None) if sel is None else sel
-        data_shape = (n_sel_channels, stop - start)
+        n_out = n_sel_channels if mult is None else len(mult)
+        data_shape = (n_out, stop - start)
         if isinstance(data_buffer, np.ndarray):
             if data_buffer.shape != data_shape:
                 raise ValueError('data_buffer has incorrect shape')
@@ -442,14 +523,15 @@ class RawFIFF(_BaseRaw):
         else:
             data = None  # we will allocate it later, once we know the type
 
-        mult = list()
-        for ri in range(len(self._raw_lengths)):
-            mult.append(np.diag(self.cals.ravel()))
-            if self.comp is not None:
-                mult[ri] = np.dot(self.comp, mult[ri])
-            if projector is not None:
-                mult[ri] = np.dot(projector, mult[ri])
-            mult[ri] = mult[ri][idx]
+        # combine calibration, compensation, projection and channel selection
+        # (and mult) into a single matrix, unless it was done beforehand
+        if read_mult is None:
+            read_mult = self._read_operator(idx, projector, mult,
+                                            stop - start)
+        if read_mult is None:
+            mult = None
+        else:
+            mult, used = read_mult
 
         # deal with having multiple files accessed by the raw object
         cumul_lens = np.concatenate(([0], np.array(self._raw_lengths,
@@ -525,29 +607,29 @@ class RawFIFF(_BaseRaw):
                                 dtype = np.complex128
                             one.shape = (picksamp, nchan)
                             one = one.T.astype(dtype)
-                            # use proj + cal factors in mult
-                            if mult is not None:
-                                one[idx] = np.dot(mult[fi], one)
-                            else:  # apply just the calibration factors
-                                # this logic is designed to limit memory copies
-                                if isinstance(idx, slice):
-                                    # This is a view operation, so it's fast
-                                    one[idx] *= cals
-                                else:
-                                    # Extra operations are actually faster here
-                                    # than creating a new array
-                                    # (fancy indexing)
-                                    one *= cals
-
                             # if not already done, allocate array with
                             # right type
                             data = _allocate_data(data, data_buffer,
                                                   data_shape, dtype)
-                            if isinstance(idx, slice):
+                            # use proj + cal factors in mult
+                            if mult is not None:
+                                one = one[used]
+                                for this_mult in mult[::-1]:
+                                    one = np.dot(this_mult, one)
+                                data[:, dest:(dest + picksamp)] = one
+                            # apply just the calibration factors
+                            # this logic is designed to limit memory copies
+                            elif isinstance(idx, slice):
+                                # This is a view operation, so it's fast
+                                one[idx] *= cals
                                 # faster to slice in data than doing
                                 # one = one[idx] sooner
                                 data[:, dest:(dest + picksamp)] = one[idx]
                             else:
+                                # Extra operations are actually faster here
+                                # than creating a new array
+                                # (fancy indexing)
+                                one *= cals
                                 # faster than doing one = one[idx]
                                 data_view = data[:, dest:(dest + picksamp)]
                                 for ii, ix in enumerate(idx):
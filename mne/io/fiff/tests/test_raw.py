@@ -996,6 +996,38 @@ def test_compensation_raw():
     assert_allclose(data1, data5, rtol=1e-12, atol=1e-22)
 
 
+def test_dot_data():
+    """Test applying a linear operator while reading raw data
+    """
+    rng = np.random.RandomState(0)
+    raw = Raw(ctf_comp_fname, compensation=1, proj=False)
+    projs = compute_proj_raw(raw, duration=None, n_grad=0, n_mag=2,
+                             n_eeg=0)
+    raw_pre = Raw(ctf_comp_fname, compensation=1, proj=False, preload=True)
+    for r in (raw, raw_pre):
+        r.add_proj(projs)
+        r.apply_proj()
+    for picks in (pick_types(raw.info, meg=True, ref_meg=False),
+                  np.array([3, 1, 7, 20])):
+        mult = rng.randn(5, len(picks))
+        data, times = raw[picks, 10:200]
+        for r in (raw, raw_pre):
+            data_mult, times_mult = r._dot_data(mult, picks, 10, 200)
+            assert_equal(data_mult.shape, (5, 190))
+            assert_allclose(data_mult, np.dot(mult, data), rtol=1e-7)
+            assert_array_equal(times_mult, times)
+            # the operators can be combined once for several reads
+            op = r._dot_operator(mult, picks, 190)
+            for start, stop in ((10, 100), (100, 200)):
+                assert_allclose(r._dot_data(op, picks, start, stop)[0],
+                                np.dot(mult, data[:, start - 10:stop - 10]),
+                                rtol=1e-7)
+    # only calibration
+    raw = Raw(ctf_comp_fname)
+    assert_allclose(raw._dot_data(mult, picks)[0],
+                    np.dot(mult, raw[picks, :][0]), rtol=1e-7)
+
+
 @requires_mne
 def test_compensation_raw_mne():
     """Test Raw compensation by comparing with MNE
@@ -2,6 +2,7 @@
 
 from .inverse import (InverseOperator, read_inverse_operator, apply_inverse,
                       apply_inverse_raw, make_inverse_operator,
+                      make_inverse_operators,
                       apply_inverse_epochs, write_inverse_operator,
                       compute_rank_inverse, prepare_inverse_operator)
 from .psf_ctf import point_spread_function, cross_talk_function
@@ -5,6 +5,7 @@
 
 import warnings
 from copy import deepcopy
+from itertools import product
 from math import sqrt
 import numpy as np
 from scipy import linalg
@@ -31,7 +32,9 @@ from ..source_space import (_read_source_spaces_from_tree,
                             _write_source_spaces_to_fid, label_src_vertno_sel)
 from ..transforms import invert_transform, transform_surface_to
 from ..source_estimate import _make_stc
-from ..utils import check_fname, logger, verbose
+from ..utils import check_fname, logger, verbose, object_hash
+from ..parallel import parallel_func
+from ..externals.six import string_types
 from functools import reduce
 
 
@@ -882,38 +885,53 @@ def apply_inverse_raw(raw, inverse_operator, lambda2, method="dSPM",
     logger.info('Picked %d channels from the data' % len(sel))
     logger.info('Computing inverse...')
 
-    data, times = raw[sel, start:stop]
-
-    if time_func is not None:
-        data = time_func(data)
-
     K, noise_norm, vertno = _assemble_kernel(inv, label, method, pick_ori)
 
     is_free_ori = (inverse_operator['source_ori'] ==
                    FIFF.FIFFV_MNE_FREE_ORI and pick_ori is None)
 
-    if buffer_size is not None and is_free_ori:
+    start = 0 if start is None else int(start)
+    stop = raw.n_times if stop is None else min(int(stop), raw.n_times)
+    if time_func is not None:
+        data, times = raw[sel, start:stop]
+        data = time_func(data)
+        n_times = data.shape[1]
+    else:
+        # the kernel is combined with the calibration, compensation and
+        # projection operators that are used when reading the data, once
+        # for all the segments
+        data = None
+        n_times = stop - start
+        K_read = raw._dot_operator(K, sel, n_times)
+    if buffer_size is None or not is_free_ori:
+        buffer_size = n_times
+    n_seg = int(np.ceil(n_times / float(buffer_size)))
+    if n_seg > 1:
         # Process the data in segments to conserve memory
-        n_seg = int(np.ceil(data.shape[1] / float(buffer_size)))
         logger.info('computing inverse and combining the current '
                     'components (using %d segments)...' % (n_seg))
 
-        # Allocate space for inverse solution
-        n_times = data.shape[1]
-        sol = np.empty((K.shape[0] // 3, n_times),
-                       dtype=(K[0, 0] * data[0, 0]).dtype)
-
-        for pos in range(0, n_times, buffer_size):
-            sol[:, pos:pos + buffer_size] = \
-                combine_xyz(np.dot(K, data[:, pos:pos + buffer_size]))
-
+    for pos in range(0, n_times, buffer_size):
+        if data is None:
+            this_sol, this_times = raw._dot_data(
+                K_read, sel, start + pos, min(start + pos + buffer_size, stop))
+            if pos == 0:
+                times = this_times
+        else:
+            this_sol = np.dot(K, data[:, pos:pos + buffer_size])
+        if is_free_ori:
+            if n_seg == 1:
+                logger.info('combining the current components...')
+            this_sol = combine_xyz(this_sol)
+        if n_seg == 1:
+            sol = this_sol
+        else:
+            if pos == 0:
+                # Allocate space for inverse solution
+                sol = np.empty((len(this_sol), n_times), this_sol.dtype)
+            sol[:, pos:pos + buffer_size] = this_sol
             logger.info('segment %d / %d done..'
                         % (pos / buffer_size + 1, n_seg))
-    else:
-        sol = np.dot(K, data)
-        if is_free_ori:
-            logger.info('combining the current components...')
-            sol = combine_xyz(sol)
 
     if noise_norm is not None:
         sol *= noise_norm
@@ -1133,10 +1151,7 @@ def _prepare_forward(forward, info, noise_cov, pca=False, rank=None,
         #   Rows of eigvec are the eigenvectors
         whitener = np.dot(whitener, noise_cov['eigvec'])
 
-    gain = forward['sol']['data']
-
-    fwd_idx = [fwd_ch_names.index(name) for name in ch_names]
-    gain = gain[fwd_idx]
+    gain = _pick_gain(forward, ch_names)
     info_idx = [info['ch_names'].index(name) for name in ch_names]
     fwd_info = pick_info(info, info_idx)
 
@@ -1145,10 +1160,17 @@ def _prepare_forward(forward, info, noise_cov, pca=False, rank=None,
     return fwd_info, gain, noise_cov, whitener, n_nzero
 
 
+def _pick_gain(forward, ch_names):
+    """Pick the rows of the gain matrix in the order of ch_names"""
+    fwd_ch_names = [c['ch_name'] for c in forward['info']['chs']]
+    fwd_idx = [fwd_ch_names.index(name) for name in ch_names]
+    return forward['sol']['data'][fwd_idx]
+
+
 @verbose
 def make_inverse_operator(info, forward, noise_cov, loose=0.2, depth=0.8,
                           fixed=False, limit_depth_chs=True, rank=None,
-                          verbose=None):
+                          svd='full', verbose=None):
     """Assemble inverse operator
 
     Parameters
@@ -1178,6 +1200,12 @@ def make_inverse_operator(info, forward, noise_cov, loose=0.2, depth=0.8,
         detected automatically. If int, the rank is specified for the MEG
         channels. A dictionary with entries 'eeg' and/or 'meg' can be used
         to specify the rank for each modality.
+    svd : 'full' | 'gram'
+        How to decompose the whitened and weighted lead field matrix. 'full'
+        uses a full singular value decomposition. 'gram' uses the
+        eigenvalue decomposition of the (n_channels x n_channels) Gram
+        matrix, which gives equivalent results much faster for large
+        source spaces.
     verbose : bool, str, int, or None
         If not None, override default verbose level (see mne.verbose).
 
@@ -1221,6 +1249,35 @@ def make_inverse_operator(info, forward, noise_cov, loose=0.2, depth=0.8,
     weighting. Thus slightly different results are to be expected with
     and without this information.
     """  # noqa
+    forward, loose, is_fixed_ori = _check_inverse_params(forward, loose,
+                                                         depth, fixed, svd)
+
+    #
+    # 1. Read the bad channels
+    # 2. Read the necessary data from the forward solution matrix file
+    # 3. Load the projection data
+    # 4. Load the sensor noise covariance matrix and attach it to the forward
+    #
+
+    gain_info, gain, noise_cov, whitener, n_nzero = \
+        _prepare_forward(forward, info, noise_cov, rank=rank)
+
+    #
+    # 5. Compose the depth-weighting matrix
+    #
+
+    depth_prior = _compute_inverse_depth_prior(forward, gain, gain_info,
+                                               is_fixed_ori, depth,
+                                               limit_depth_chs)
+    return _make_inverse_operator(info, forward, gain_info, gain, noise_cov,
+                                  whitener, n_nzero, depth_prior, loose,
+                                  depth, fixed, is_fixed_ori, svd)
+
+
+def _check_inverse_params(forward, loose, depth, fixed, svd='full'):
+    """Check the inverse parameters and convert the forward if needed"""
+    if svd not in ('full', 'gram'):
+        raise ValueError('svd must be "full" or "gram", got %s' % (svd,))
     is_fixed_ori = is_fixed_orient(forward)
 
     if fixed and loose is not None:
@@ -1264,21 +1321,12 @@ def make_inverse_operator(info, forward, noise_cov, loose=0.2, depth=0.8,
                              'coordinates. A loose inverse operator requires '
                              'a surface-based, free orientation forward '
                              'operator.')
+    return forward, loose, is_fixed_ori
 
-    #
-    # 1. Read the bad channels
-    # 2. Read the necessary data from the forward solution matrix file
-    # 3. Load the projection data
-    # 4. Load the sensor noise covariance matrix and attach it to the forward
-    #
-
-    gain_info, gain, noise_cov, whitener, n_nzero = \
-        _prepare_forward(forward, info, noise_cov, rank=rank)
-
-    #
-    # 5. Compose the depth-weighting matrix
-    #
 
+def _compute_inverse_depth_prior(forward, gain, gain_info, is_fixed_ori,
+                                 depth, limit_depth_chs):
+    """Compute the depth prior of the inverse operator"""
     if depth is not None:
         patch_areas = forward.get('patch_areas', None)
         depth_prior = compute_depth_prior(gain, gain_info, is_fixed_ori,
@@ -1286,7 +1334,37 @@ def make_inverse_operator(info, forward, noise_cov, loose=0.2, depth=0.8,
                                           limit_depth_chs=limit_depth_chs)
     else:
         depth_prior = np.ones(gain.shape[1], dtype=gain.dtype)
+    return depth_prior
 
+
+def _gain_svd(gain, svd='full'):
+    """Compute the economy-size SVD of the whitened gain matrix
+
+    With svd='gram', the decomposition is obtained from the eigenvalue
+    decomposition of the small (n_channels x n_channels) matrix
+    ``gain @ gain.T``, which is much faster than a full SVD for wide gain
+    matrices. Singular values that cannot be resolved in this way (i.e.,
+    those of the directions removed by the projections) are set to zero.
+    """
+    if svd == 'full':
+        return linalg.svd(gain, full_matrices=False)
+    eig, eigen_fields = linalg.eigh(np.dot(gain, gain.T))
+    order = np.argsort(eig)[::-1]
+    eig, eigen_fields = eig[order], eigen_fields[:, order]
+    sing = np.sqrt(np.maximum(eig, 0.))
+    # eigenvalues are only accurate to eps * max(eig)
+    nzero = sing > sing[0] * np.sqrt(np.finfo(gain.dtype).eps) * 10
+    sing[~nzero] = 0.
+    eigen_leads = np.dot(eigen_fields.T, gain)
+    eigen_leads[nzero] /= sing[nzero, np.newaxis]
+    eigen_leads[~nzero] = 0.
+    return eigen_fields, sing, eigen_leads
+
+
+def _make_inverse_operator(info, forward, gain_info, gain, noise_cov,
+                           whitener, n_nzero, depth_prior, loose, depth,
+                           fixed, is_fixed_ori, svd='full'):
+    """Assemble the inverse operator from the whitener and the priors"""
     # Deal with fixed orientation forward / inverse
     if fixed:
         if depth is not None:
@@ -1299,8 +1377,8 @@ def make_inverse_operator(info, forward, noise_cov, loose=0.2, depth=0.8,
             forward = convert_forward_solution(
                 forward, surf_ori=forward['surf_ori'], force_fixed=True)
             is_fixed_ori = is_fixed_orient(forward)
-            gain_info, gain, noise_cov, whitener, n_nzero = \
-                _prepare_forward(forward, info, noise_cov, verbose=False)
+            # the channels (and thus the whitener) are the same
+            gain = _pick_gain(forward, gain_info['ch_names'])
 
     logger.info("Computing inverse operator with %d channels."
                 % len(gain_info['ch_names']))
@@ -1367,7 +1445,8 @@ def make_inverse_operator(info, forward, noise_cov, loose=0.2, depth=0.8,
 
     logger.info('Computing SVD of whitened and weighted lead field '
                 'matrix.')
-    eigen_fields, sing, eigen_leads = linalg.svd(gain, full_matrices=False)
+    eigen_fields, sing, eigen_leads = _gain_svd(gain, svd)
+    del gain
     logger.info('    largest singular value = %g' % np.max(sing))
     logger.info('    scaling factor to adjust the trace = %g' % trace_GRGT)
 
@@ -1418,6 +1497,177 @@ def make_inverse_operator(info, forward, noise_cov, loose=0.2, depth=0.8,
     return InverseOperator(inv_op)
 
 
+def _as_grid(param, name):
+    """Make a list of values from a parameter of the grid"""
+    if isinstance(param, (list, tuple)):
+        if len(param) == 0:
+            raise ValueError('%s must contain at least one value' % name)
+        return list(param)
+    return [param]
+
+
+def _whitener_key(info, noise_cov, fwd_ch_names, rank):
+    """Hash everything the whitener of _prepare_forward depends on"""
+    projs = [dict(active=p['active'], col_names=p['data']['col_names'],
+                  data=p['data']['data']) for p in info['projs']]
+    return object_hash(dict(
+        cov_data=noise_cov['data'], cov_names=list(noise_cov['names']),
+        cov_bads=list(noise_cov['bads']), cov_diag=bool(noise_cov['diag']),
+        ch_names=list(info['ch_names']), bads=list(info['bads']),
+        kinds=np.array([c['kind'] for c in info['chs']]),
+        fwd_ch_names=list(fwd_ch_names), projs=projs, rank=rank))
+
+
+def _iter_inverse_jobs(info, forward, noise_cov, params, fixed,
+                       limit_depth_chs, svd, whiteners):
+    """Generate the arguments of _make_inverse_operator for a forward"""
+    fwd_ch_names = [c['ch_name'] for c in forward['info']['chs']]
+    # only depth weighting needs the forward in surface orientation, it is
+    # converted once for all the operators with depth weighting
+    surf_fwd = list()
+    gains = dict()
+    depth_priors = dict()
+    for this_loose, this_depth, this_rank in params:
+        this_fwd = forward
+        if this_depth is not None and not forward['surf_ori'] and \
+                not is_fixed_orient(forward):
+            if len(surf_fwd) == 0:
+                surf_fwd.append(convert_forward_solution(forward,
+                                                         surf_ori=True))
+            this_fwd = surf_fwd[0]
+        this_fwd, this_loose, is_fixed_ori = _check_inverse_params(
+            this_fwd, this_loose, this_depth, fixed, svd)
+        w_key = _whitener_key(info, noise_cov, fwd_ch_names, this_rank)
+        if w_key not in whiteners:
+            gain_info, gain, this_cov, whitener, n_nzero = \
+                _prepare_forward(this_fwd, info, noise_cov, rank=this_rank)
+            whiteners[w_key] = (gain_info, this_cov, whitener, n_nzero)
+            gains[(this_fwd['surf_ori'], tuple(gain_info['ch_names']))] = gain
+        else:
+            logger.info('    Using a previously computed whitener')
+            gain_info, this_cov, whitener, n_nzero = whiteners[w_key]
+        ch_key = (this_fwd['surf_ori'], tuple(gain_info['ch_names']))
+        if ch_key not in gains:
+            gains[ch_key] = _pick_gain(this_fwd, gain_info['ch_names'])
+        gain = gains[ch_key]
+        d_key = (ch_key, this_depth)
+        if d_key not in depth_priors:
+            depth_priors[d_key] = _compute_inverse_depth_prior(
+                this_fwd, gain, gain_info, is_fixed_ori, this_depth,
+                limit_depth_chs)
+        yield (info, this_fwd, gain_info, gain, deepcopy(this_cov), whitener,
+               n_nzero, depth_priors[d_key].copy(), this_loose, this_depth,
+               fixed, is_fixed_ori, svd)
+
+
+@verbose
+def make_inverse_operators(info, forwards, noise_covs, loose=0.2, depth=0.8,
+                           fixed=False, limit_depth_chs=True, rank=None,
+                           svd='full', fnames=None, n_jobs=1, verbose=None):
+    """Assemble a batch of inverse operators
+
+    This is equivalent to calling :func:`make_inverse_operator` for every
+    forward solution and every combination of ``loose``, ``depth`` and
+    ``rank``, but the noise whiteners and the depth priors are only
+    computed once for all the operators that share them (e.g., the same
+    noise covariance used with several forward solutions or several
+    values of ``loose``).
+
+    Parameters
+    ----------
+    info : dict | list of dict
+        The measurement info to specify the channels to include. Can be a
+        list with one info per forward solution.
+    forwards : list of dict
+        The forward operators (e.g., one per subject).
+    noise_covs : Covariance | list of Covariance
+        The noise covariance matrix. Can be a list with one covariance per
+        forward solution.
+    loose : None | float in [0, 1] | list
+        Value that weights the source variances of the dipole components
+        defining the tangent space of the cortical surfaces. A list of
+        values makes one inverse operator per value.
+    depth : None | float in [0, 1] | list
+        Depth weighting coefficients. If None, no depth weighting is
+        performed. A list of values makes one inverse operator per value.
+    fixed : bool
+        Use fixed source orientations normal to the cortical mantle. If True,
+        the loose parameter is ignored.
+    limit_depth_chs : bool
+        If True, use only grad channels in depth weighting (equivalent to MNE
+        C code). If grad chanels aren't present, only mag channels will be
+        used (if no mag, then eeg). If False, use all channels.
+    rank : None | int | dict | list
+        Specified rank of the noise covariance matrix (see
+        :func:`make_inverse_operator`). A list of values makes one inverse
+        operator per value.
+    svd : 'full' | 'gram'
+        How to decompose the whitened and weighted lead field matrix (see
+        :func:`make_inverse_operator`).
+    fnames : None | list of list of str
+        If not None, the inverse operators are written to disk with
+        :func:`write_inverse_operator`. Must have the same nested shape as
+        the returned list of inverse operators.
+    n_jobs : int
+        Number of jobs to run in parallel.
+    verbose : bool, str, int, or None
+        If not None, override default verbose level (see mne.verbose).
+
+    Returns
+    -------
+    invs : list of list of InverseOperator
+        The inverse operators. ``invs[ii][jj]`` is the operator for
+        ``forwards[ii]`` and the ``jj``-th combination of the parameters,
+        the combinations being ordered like
+        ``itertools.product(loose, depth, rank)``.
+
+    See Also
+    --------
+    make_inverse_operator
+    """
+    if not isinstance(forwards, (list, tuple)):
+        raise TypeError('forwards must be a list of forward solutions, got '
+                        '%s' % type(forwards))
+    n_fwd = len(forwards)
+    infos = info if isinstance(info, (list, tuple)) else [info] * n_fwd
+    noise_covs = (noise_covs if isinstance(noise_covs, (list, tuple))
+                  else [noise_covs] * n_fwd)
+    if len(infos) != n_fwd or len(noise_covs) != n_fwd:
+        raise ValueError('info and noise_covs must have one entry per '
+                         'forward solution (%d), got %d and %d'
+                         % (n_fwd, len(infos), len(noise_covs)))
+    params = list(product(_as_grid(loose, 'loose'), _as_grid(depth, 'depth'),
+                          _as_grid(rank, 'rank')))
+    if fnames is not None:
+        if len(fnames) != n_fwd or any(isinstance(f, string_types) or
+                                       len(f) != len(params)
+                                       for f in fnames):
+            raise ValueError('fnames must be a list of %d lists of %d file '
+                             'names' % (n_fwd, len(params)))
+        for fname in sum([list(f) for f in fnames], []):
+            check_fname(fname, 'inverse operator', ('-inv.fif',
+                                                    '-inv.fif.gz'))
+
+    # the whiteners are shared by all the forward solutions, the gain
+    # matrices and the depth priors by the operators of each forward
+    whiteners = dict()
+    parallel, p_fun, _ = parallel_func(_make_inverse_operator, n_jobs)
+    invs = list()
+    for fi, (this_info, fwd, cov) in enumerate(zip(infos, forwards,
+                                                   noise_covs)):
+        logger.info('Preparing forward solution %d/%d' % (fi + 1, n_fwd))
+        invs.append(parallel(p_fun(*args) for args in _iter_inverse_jobs(
+            this_info, fwd, cov, params, fixed, limit_depth_chs, svd,
+            whiteners)))
+    logger.info('Assembled %d inverse operators (%d unique whiteners)'
+                % (n_fwd * len(params), len(whiteners)))
+    if fnames is not None:
+        for these_fnames, these_invs in zip(fnames, invs):
+            for fname, inv in zip(these_fnames, these_invs):
+                write_inverse_operator(fname, inv)
+    return invs
+
+
 def compute_rank_inverse(inv):
     """Compute the rank of a linear inverse operator (MNE, dSPM, etc.)
 
@@ -2,8 +2,8 @@ from __future__ import print_function
 import os.path as op
 import numpy as np
 from numpy.testing import (assert_array_almost_equal, assert_equal,
-                           assert_allclose)
-from scipy import sparse
+                           assert_allclose, assert_array_equal)
+from scipy import sparse, linalg
 from nose.tools import assert_true, assert_raises
 import copy
 import warnings
@@ -19,9 +19,10 @@ from mne.io import Raw
 from mne.minimum_norm.inverse import (apply_inverse, read_inverse_operator,
                                       apply_inverse_raw, apply_inverse_epochs,
                                       make_inverse_operator,
+                                      make_inverse_operators,
                                       write_inverse_operator,
                                       compute_rank_inverse,
-                                      prepare_inverse_operator)
+                                      prepare_inverse_operator, _gain_svd)
 from mne.utils import _TempDir, run_tests_if_main, slow_test
 from mne.externals import six
 
@@ -192,6 +193,32 @@ def test_make_inverse_operator():
     _compare_inverses_approx(my_inv_op, inverse_operator, evoked, 1e-2, 1e-2)
     assert_true('dev_head_t' in my_inv_op['info'])
     assert_true('mri_head_t' in my_inv_op)
+    # Decomposition from the Gram matrix
+    gram_inv_op = make_inverse_operator(evoked.info, fwd_op, noise_cov,
+                                        loose=0.2, depth=0.8, svd='gram')
+    _compare_inverses_approx(my_inv_op, gram_inv_op, evoked, 0, 1e-2)
+    assert_raises(ValueError, make_inverse_operator, evoked.info, fwd_op,
+                  noise_cov, svd='foo')
+
+
+def test_gain_svd():
+    """Test SVD of the gain matrix from the Gram matrix
+    """
+    rng = np.random.RandomState(0)
+    gain = rng.randn(20, 300)
+    # remove two dimensions like a projection would
+    proj = linalg.qr(rng.randn(20, 2), mode='economic')[0]
+    gain -= np.dot(proj, np.dot(proj.T, gain))
+    u, s, v = _gain_svd(gain, 'full')
+    u_gram, s_gram, v_gram = _gain_svd(gain, 'gram')
+    assert_allclose(s_gram[:18], s[:18], rtol=1e-10)
+    assert_array_equal(s_gram[18:], 0.)
+    assert_array_equal(v_gram[18:], 0.)
+    # same decomposition up to the sign of the components
+    sign = np.sign(np.sum(u[:, :18] * u_gram[:, :18], axis=0))
+    assert_allclose(u_gram[:, :18] * sign, u[:, :18], atol=1e-10)
+    assert_allclose(v_gram[:18] * sign[:, np.newaxis], v[:18], atol=1e-10)
+    assert_allclose(np.dot(u_gram * s_gram, v_gram), gain, atol=1e-10)
 
 
 @slow_test
@@ -333,6 +360,61 @@ def test_inverse_operator_noise_cov_rank():
     assert_true(compute_rank_inverse(inv) == 20)
 
 
+@testing.requires_testing_data
+def test_make_inverse_operators():
+    """Test batch computation of inverse operators
+    """
+    tempdir = _TempDir()
+    evoked = _get_evoked()
+    noise_cov = read_cov(fname_cov)
+    fwd_1 = read_forward_solution_meg(fname_fwd, surf_ori=True)
+    fwd_2 = read_forward_solution_meg(fname_fwd, surf_ori=False)
+    fnames = [[op.join(tempdir, 'test%d%d-inv.fif' % (ii, jj))
+               for jj in range(4)] for ii in range(2)]
+    invs = make_inverse_operators(evoked.info, [fwd_1, fwd_1], noise_cov,
+                                  loose=[0.2, 1.], depth=[None, 0.8],
+                                  fnames=fnames)
+    assert_equal(len(invs), 2)
+    for these_invs, these_fnames in zip(invs, fnames):
+        assert_equal(len(these_invs), 4)
+        for inv, fname, (loose, depth) in zip(these_invs, these_fnames,
+                                              [(0.2, None), (0.2, 0.8),
+                                               (1., None), (1., 0.8)]):
+            inv_ref = make_inverse_operator(evoked.info, fwd_1, noise_cov,
+                                            loose=loose, depth=depth)
+            _compare_inverses_approx(inv_ref, inv, evoked, 0, 1e-2)
+            _compare_inverses_approx(inv, read_inverse_operator(fname),
+                                     evoked, 0, 1e-2)
+    # only depth weighting converts the forward to surface orientation
+    invs = make_inverse_operators(evoked.info, [fwd_2], noise_cov, loose=1.,
+                                  depth=[None, 0.8])[0]
+    for inv, depth in zip(invs, [None, 0.8]):
+        inv_ref = make_inverse_operator(evoked.info, fwd_2, noise_cov,
+                                        loose=1., depth=depth)
+        assert_array_equal(inv['source_nn'], inv_ref['source_nn'])
+        _compare_inverses_approx(inv_ref, inv, evoked, 0, 1e-2)
+    assert_true(not fwd_2['surf_ori'])
+    assert_raises(ValueError, make_inverse_operators, evoked.info, [fwd_2],
+                  noise_cov, loose=0.2, depth=[None, 0.8])
+    # fixed orientation with a parallel build
+    inv = make_inverse_operators(evoked.info, [fwd_1], noise_cov, loose=None,
+                                 fixed=True, n_jobs=2)[0][0]
+    inv_ref = make_inverse_operator(evoked.info, fwd_1, noise_cov,
+                                    loose=None, fixed=True)
+    _compare_inverses_approx(inv_ref, inv, evoked, 0, 1e-2)
+    # rank grid
+    invs = make_inverse_operators(evoked.info, [fwd_1], noise_cov,
+                                  rank=[None, 64])[0]
+    assert_equal(compute_rank_inverse(invs[1]), 64)
+    assert_true(compute_rank_inverse(invs[0]) > 64)
+    assert_raises(TypeError, make_inverse_operators, evoked.info, fwd_1,
+                  noise_cov)
+    assert_raises(ValueError, make_inverse_operators, evoked.info, [fwd_1],
+                  [noise_cov, noise_cov])
+    assert_raises(ValueError, make_inverse_operators, evoked.info, [fwd_1],
+                  noise_cov, depth=[0.8, 0.5], fnames=[['test-inv.fif']])
+
+
 @testing.requires_testing_data
 def test_inverse_operator_volume():
     """Test MNE inverse computation on volume source space
@@ -6,7 +6,8 @@
 import os.path as op
 
 from nose.tools import assert_true, assert_equal
-from numpy.testing import assert_array_almost_equal, assert_array_equal
+from numpy.testing import (assert_array_almost_equal, assert_array_equal,
+                           assert_allclose)
 from nose.tools import assert_raises
 import numpy as np
 from scipy import linalg
@@ -15,13 +16,18 @@ import itertools as itt
 
 from mne.cov import (regularize, whiten_evoked, _estimate_rank_meeg_cov,
                      _auto_low_rank_model, _apply_scaling_cov,
-                     _undo_scaling_cov)
+                     _undo_scaling_cov, _CovAccumulator, _pca_cv_scores,
+                     _shrunk_cv_scores, _empirical_cv_score,
+                     prepare_noise_cov, compute_whitener,
+                     _noise_cov_cache, _estimate_rank_meeg_signals,
+                     _estimate_rank_raw)
 
 from mne import (read_cov, write_cov, Epochs, merge_events,
                  find_events, compute_raw_data_covariance,
                  compute_covariance, read_evokeds, compute_proj_raw,
-                 pick_channels_cov, pick_channels, pick_types, pick_info)
-from mne.io import Raw
+                 pick_channels_cov, pick_channels, pick_types, pick_info,
+                 create_info)
+from mne.io import Raw, RawArray
 from mne.utils import _TempDir, slow_test, requires_module
 from mne.io.proc_history import _get_sss_rank
 from mne.io.pick import channel_type, _picks_by_type
@@ -121,6 +127,37 @@ def test_cov_estimation_on_raw_segment():
     assert_true(len(w) == 1)
 
 
+def test_cov_accumulator():
+    """Test streaming covariance accumulation
+    """
+    rng = np.random.RandomState(0)
+    data = rng.randn(5, 1000) + 1e4  # large mean
+    cov_ref = np.cov(data)
+    acc = _CovAccumulator(5)
+    for block in np.array_split(data, 7, axis=1):
+        acc.update(block)
+    assert_equal(acc.n_samples, 1000)
+    assert_allclose(acc.mean, data.mean(axis=1))
+    assert_allclose(acc.get_cov(), cov_ref, rtol=1e-10)
+    assert_allclose(acc.get_cov(assume_centered=True, ddof=0),
+                    np.dot(data, data.T) / 1000., rtol=1e-10)
+    # merging accumulators
+    acc_1 = _CovAccumulator(5).update(data[:, :300])
+    acc_2 = _CovAccumulator(5).update(data[:, 300:])
+    acc_1.merge(_CovAccumulator(5)).merge(acc_2)
+    assert_allclose(acc_1.get_cov(), cov_ref, rtol=1e-10)
+
+    # parallel computation on raw data
+    info = create_info(['EEG %03d' % ii for ii in range(5)], 1000.,
+                       ['eeg'] * 5)
+    raw = RawArray(data * 1e-6, info)
+    cov = compute_raw_data_covariance(raw, tstep=0.1)
+    assert_allclose(cov.data, np.cov(data[:, :999] * 1e-6), rtol=1e-8)
+    cov_par = compute_raw_data_covariance(raw, tstep=0.1, n_jobs=2)
+    assert_allclose(cov_par.data, cov.data, rtol=1e-10)
+    assert_equal(cov_par.nfree, cov.nfree)
+
+
 def test_cov_estimation_with_triggers():
     """Test estimation from raw with triggers
     """
@@ -251,6 +288,56 @@ def test_evoked_whiten():
     assert_true(np.all(mean_baseline > 0.2))
 
 
+def test_prepare_noise_cov_cache():
+    """Test caching of the noise covariance eigendecomposition"""
+    evoked = read_evokeds(ave_fname, condition=0, baseline=(None, 0),
+                          proj=True)
+    cov = read_cov(cov_fname)
+    picks = pick_types(evoked.info, meg=True, eeg=True, ref_meg=False,
+                       exclude='bads')
+    ch_names = [evoked.ch_names[k] for k in picks]
+    _noise_cov_cache.clear()
+    prepared = prepare_noise_cov(cov, evoked.info, ch_names)
+    assert_equal(len(_noise_cov_cache), 1)
+    prepared['eig'][:] = 0.  # must not alter the cache
+    prepared_2 = prepare_noise_cov(cov, evoked.info, ch_names)
+    assert_equal(len(_noise_cov_cache), 1)
+    assert_true(np.all(prepared_2['eig'][-10:] > 0))
+    W, _ = compute_whitener(cov, evoked.info, picks)
+    assert_equal(len(_noise_cov_cache), 1)
+    eig, eigvec = prepared_2['eig'], prepared_2['eigvec']
+    nzero = eig > 0
+    W_ref = np.dot(eigvec[nzero].T,
+                   eigvec[nzero] / np.sqrt(eig[nzero])[:, np.newaxis])
+    assert_allclose(W, W_ref, rtol=1e-10, atol=1e-10 * np.abs(W).max())
+    # a different rank or channel set is another entry
+    prepare_noise_cov(cov, evoked.info, ch_names, rank=dict(meg=50))
+    assert_equal(len(_noise_cov_cache), 2)
+    picks = pick_types(evoked.info, meg=True, eeg=False, exclude='bads')
+    prepare_noise_cov(cov, evoked.info, [evoked.ch_names[k] for k in picks])
+    assert_equal(len(_noise_cov_cache), 3)
+    cov_2 = read_cov(cov_fname)
+    cov_2['data'] *= 2.
+    prepare_noise_cov(cov_2, evoked.info, ch_names)
+    assert_equal(len(_noise_cov_cache), 4)
+    # the metadata are the ones of the covariance, not of the cached one
+    cov_3 = read_cov(cov_fname)
+    cov_3.update(nfree=12345, bads=[cov_3.ch_names[0]], method='shrunk',
+                 loglik=-1.)
+    prepared_3 = prepare_noise_cov(cov_3, evoked.info, ch_names)
+    assert_equal(len(_noise_cov_cache), 4)
+    assert_equal(prepared_3['nfree'], 12345)
+    assert_equal(prepared_3['bads'], [cov_3.ch_names[0]])
+    assert_equal(prepared_3['method'], 'shrunk')
+    assert_equal(prepared_3['loglik'], -1.)
+    assert_array_equal(prepared_3['eig'], prepared_2['eig'])
+    prepared = prepare_noise_cov(cov, evoked.info, ch_names)
+    assert_equal(prepared['nfree'], cov['nfree'])
+    assert_equal(prepared['bads'], cov['bads'])
+    assert_true('method' not in prepared)
+    _noise_cov_cache.clear()
+
+
 @slow_test
 def test_rank():
     """Test cov rank estimation"""
@@ -334,6 +421,32 @@ def test_rank():
             assert_equal(expected_rank, est_rank)
 
 
+def test_rank_raw_chunks():
+    """Test rank estimation on chunks of raw data"""
+    rng = np.random.RandomState(0)
+    ch_types = ['mag'] * 6 + ['grad'] * 12 + ['eeg'] * 10
+    info = create_info(['CH%02d' % ii for ii in range(len(ch_types))],
+                       1000., ch_types)
+    data = np.dot(rng.randn(len(ch_types), 20), rng.randn(20, 2500))
+    data *= np.array([1e-13] * 6 + [1e-11] * 12 + [1e-5] * 10)[:, np.newaxis]
+    raw = RawArray(data, info)
+    picks = np.arange(len(ch_types))
+    for scalings in ('norm', dict(mag=1e15, grad=1e13, eeg=1e6),
+                     dict(mag=1e11, grad=1e9, eeg=1e5)):
+        rank, s = _estimate_rank_meeg_signals(
+            data.copy(), info, scalings=scalings, return_singular=True)
+        assert_equal(rank, 20)
+        for buffer_size in (300, None):
+            rank_raw, s_raw = _estimate_rank_raw(
+                raw, picks, 0, raw.n_times, scalings=scalings,
+                return_singular=True, buffer_size=buffer_size)
+            assert_equal(rank_raw, rank)
+            assert_allclose(s_raw[:20], s[:20], rtol=1e-10)
+        assert_equal(raw.estimate_rank(scalings=scalings), rank)
+    # fewer samples than channels
+    assert_equal(_estimate_rank_raw(raw, picks, 0, 10, 'norm'), 10)
+
+
 def test_cov_scaling():
     """Test rescaling covs"""
     evoked = read_evokeds(ave_fname, condition=0, baseline=(None, 0),
@@ -407,6 +520,73 @@ def test_auto_low_rank():
                   n_jobs=n_jobs, method_params=method_params, cv=cv)
 
 
+def test_cv_scores():
+    """Test analytic cross-validation scores of covariance models
+    """
+    rng = np.random.RandomState(0)
+    n_features = 8
+    X = np.dot(rng.randn(300, n_features), rng.randn(n_features, n_features))
+    X += 3.
+    splits = [(np.arange(100, 300), np.arange(100)),
+              (np.concatenate([np.arange(100), np.arange(200, 300)]),
+               np.arange(100, 200))]
+
+    def loglik(cov, location, X_test):
+        precision = linalg.inv(cov)
+        X_test = X_test - location
+        return np.mean(-0.5 * (n_features * np.log(2 * np.pi) +
+                               np.linalg.slogdet(cov)[1] +
+                               np.sum(np.dot(X_test, precision) * X_test, 1)))
+
+    shrinkages = [0.01, 0.5]
+    for assume_centered in (True, False):
+        scores = list()
+        for shrinkage in shrinkages:
+            fold_scores = list()
+            for train, test in splits:
+                location = (np.zeros(n_features) if assume_centered
+                            else X[train].mean(axis=0))
+                cov = np.cov((X[train] - location).T, bias=1)
+                if assume_centered:
+                    cov += np.outer(X[train].mean(axis=0),
+                                    X[train].mean(axis=0))
+                cov = ((1 - shrinkage) * cov + shrinkage *
+                       np.trace(cov) / n_features * np.eye(n_features))
+                fold_scores.append(loglik(cov, location, X[test]))
+            scores.append(np.mean(fold_scores))
+        assert_allclose(_shrunk_cv_scores(X, shrinkages, splits,
+                                          assume_centered), scores)
+
+    # the empirical covariance, scored from the statistics of the folds
+    for assume_centered in (True, False):
+        fold_accs = list()
+        fold_scores = list()
+        for train, test in splits:
+            fold_accs.append((_CovAccumulator(n_features).update(X[train].T),
+                              _CovAccumulator(n_features).update(X[test].T)))
+            location = (np.zeros(n_features) if assume_centered
+                        else X[train].mean(axis=0))
+            cov = np.dot((X[train] - location).T,
+                         X[train] - location) / len(train)
+            fold_scores.append(loglik(cov, location, X[test]))
+        assert_allclose(_empirical_cv_score(fold_accs, assume_centered),
+                        np.mean(fold_scores))
+
+    iter_n_components = [2, 5, n_features]
+    scores = list()
+    for n in iter_n_components:
+        fold_scores = list()
+        for train, test in splits:
+            eig, eigvec = linalg.eigh(np.cov(X[train].T, bias=1))
+            if n < n_features:
+                eig[:n_features - n] = eig[:n_features - n].mean()
+            fold_scores.append(loglik(np.dot(eigvec * eig, eigvec.T),
+                                      X[train].mean(axis=0), X[test]))
+        scores.append(np.mean(fold_scores))
+    assert_allclose(_pca_cv_scores(X, iter_n_components, splits), scores)
+    assert_true(np.isinf(_pca_cv_scores(X, [n_features + 1], splits)[0]))
+
+
 @requires_sklearn_0_15
 def test_compute_covariance_auto_reg():
     """Test automated regularization"""
@@ -449,6 +629,15 @@ def test_compute_covariance_auto_reg():
     assert_equal(set([c['method'] for c in cov3]),
                  set(['empirical', 'factor_analysis']))
 
+    # the streamed empirical covariance is scored like the other estimators
+    cov4 = compute_covariance(epochs, method='empirical', projs=False,
+                              return_estimators=True)
+    assert_equal(len(cov4), 1)
+    cov3_emp = [c for c in cov3 if c['method'] == 'empirical'][0]
+    assert_allclose(cov4[0]['data'], cov3_emp['data'], rtol=1e-10)
+    assert_allclose(cov4[0]['loglik'], cov3_emp['loglik'], rtol=1e-6)
+    assert_true('estimator' in cov4[0])
+
     # projs not allowed with FA or PCA
     assert_raises(ValueError, compute_covariance, epochs, method='pca',
                   projs=True)
@@ -6,14 +6,15 @@
 import numpy as np
 
 from nose.tools import assert_equal, assert_raises
-from numpy.testing import assert_array_equal
+from numpy.testing import assert_array_equal, assert_array_almost_equal
 from distutils.version import LooseVersion
 from scipy import signal, sparse
 
 from mne.utils import run_tests_if_main
 from mne.fixes import (_in1d, _tril_indices, _copysign, _unravel_index,
                        _Counter, _unique, _bincount, _digitize,
-                       _sparse_block_diag, _matrix_rank)
+                       _sparse_block_diag, _matrix_rank, _stacked_svd,
+                       _stacked_eigh)
 from mne.fixes import _firwin2 as mne_firwin2
 from mne.fixes import _filtfilt as mne_filtfilt
 
@@ -155,6 +156,22 @@ def test_sparse_block_diag():
     assert_equal(len(x.data), 0)
 
 
+def test_stacked_linalg():
+    """Test stacked svd and eigh replacements"""
+    rng = np.random.RandomState(0)
+    x = rng.randn(4, 3, 3)
+    u, s, vh = _stacked_svd(x)
+    assert_equal(u.shape, (4, 3, 3))
+    assert_equal(s.shape, (4, 3))
+    assert_array_almost_equal(np.einsum('kij,kj,kjl->kil', u, s, vh), x)
+    x = np.einsum('kij,klj->kil', x, x)
+    w, v = _stacked_eigh(x)
+    assert_equal(w.shape, (4, 3))
+    assert_array_almost_equal(np.einsum('kij,kj,klj->kil', v, w, v), x)
+    for xx, ww in zip(x, w):
+        assert_array_almost_equal(np.linalg.eigvalsh(xx), ww)
+
+
 def test_rank():
     """Test rank replacement"""
     assert_equal(_matrix_rank(np.ones(10)), 1)
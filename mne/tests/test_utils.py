@@ -1,9 +1,9 @@
-from numpy.testing import assert_equal, assert_array_equal
+from numpy.testing import assert_equal, assert_array_equal, assert_allclose
 from nose.tools import assert_true, assert_raises, assert_not_equal
 from copy import deepcopy
 import os.path as op
 import numpy as np
-from scipy import sparse
+from scipy import linalg, sparse
 import os
 import warnings
 
@@ -15,7 +15,8 @@ from mne.utils import (set_log_level, set_log_file, _TempDir,
                        requires_good_network, run_tests_if_main, md5sum,
                        ArgvSetter, _memory_usage, check_random_state,
                        _check_mayavi_version, requires_mayavi,
-                       set_memmap_min_size, _get_stim_channel, _check_fname)
+                       set_memmap_min_size, _get_stim_channel, _check_fname,
+                       _BoundedCache)
 from mne.io import show_fiff
 from mne import Evoked
 from mne.externals.six.moves import StringIO
@@ -172,6 +173,25 @@ def test_hash():
     assert_true('type mismatch' in object_diff(x, y))
 
 
+def test_bounded_cache():
+    """Test size-bounded cache"""
+    cache = _BoundedCache(max_size=2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert_equal(cache.get('a'), 1)  # now 'b' is the least recently used
+    cache['c'] = 3
+    assert_equal(len(cache), 2)
+    assert_true('b' not in cache)
+    assert_true('a' in cache and 'c' in cache)
+    assert_true(cache.get('b') is None)
+    assert_equal(cache.get('b', 0), 0)
+    cache.clear()
+    assert_equal(len(cache), 0)
+    cache = _BoundedCache(max_size=0)
+    cache['a'] = 1
+    assert_true('a' not in cache)
+
+
 def test_md5sum():
     """Test md5sum calculation
     """
@@ -205,6 +225,20 @@ def test_estimate_rank():
                        np.ones(10))
     data[0, 0] = 0
     assert_equal(estimate_rank(data), 9)
+    # the Gram matrix based estimate matches the SVD
+    rng = np.random.RandomState(0)
+    data = np.dot(rng.randn(20, 15), rng.randn(15, 1000))
+    for this_data in (data, data.T):
+        rank, s = estimate_rank(this_data, return_singular=True)
+        assert_equal(rank, 15)
+        assert_equal(len(s), 20)
+        s_svd = linalg.svd(this_data / np.sqrt(np.sum(this_data ** 2, axis=1))
+                           [:, np.newaxis], compute_uv=False)
+        assert_allclose(s[:15], s_svd[:15], rtol=1e-10)
+    # tolerances that the Gram matrix cannot resolve fall back to the SVD
+    rank, s = estimate_rank(data, tol=1e-14, return_singular=True)
+    assert_equal(rank, 15)
+    assert_true(s[-1] < 1e-14)
 
 
 def test_logging():
@@ -6,11 +6,12 @@
 from copy import deepcopy
 import math
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
 from scipy import fftpack
 # XXX explore cuda optimazation at some point.
 
 from ..io.pick import pick_types, pick_info
-from ..utils import logger, verbose
+from ..utils import logger, verbose, _BoundedCache
 from ..parallel import parallel_func, check_n_jobs
 from .tfr import AverageTFR, _get_data
 
@@ -29,7 +30,7 @@ def _check_input_st(x_in, n_fft):
     elif n_fft < n_times:
         raise ValueError("n_fft cannot be smaller than signal size. "
                          "Got %s < %s." % (n_fft, n_times))
-    zero_pad = None
+    zero_pad = 0
     if n_times < n_fft:
         msg = ('The input signal is shorter ({0}) than "n_fft" ({1}). '
                'Applying zero padding.').format(x_in.shape[-1], n_fft)
@@ -37,28 +38,37 @@ def _check_input_st(x_in, n_fft):
         zero_pad = n_fft - n_times
         pad_array = np.zeros(x_in.shape[:-1] + (zero_pad,), x_in.dtype)
         x_in = np.concatenate((x_in, pad_array), axis=-1)
-        return x_in, n_fft, zero_pad
+    return x_in, n_fft, zero_pad
 
 
 def _precompute_st_windows(n_samp, start_f, stop_f, sfreq, width):
-    """Precompute stockwell gausian windows (in the freq domain)"""
+    """Precompute stockwell gausian windows (in the freq domain)
+
+    The windows are cached (and read-only).
+    """
+    key = (int(n_samp), int(start_f), int(stop_f), float(sfreq),
+           float(width))
+    windows = _st_windows_cache.get(key)
+    if windows is not None:
+        return windows
     tw = fftpack.fftfreq(n_samp, 1. / sfreq) / n_samp
     tw = np.r_[tw[:1], tw[1:][::-1]]
 
     k = width  # 1 for classical stowckwell transform
-    f_range = np.arange(start_f, stop_f, 1)
-    windows = np.empty((len(f_range), len(tw)), dtype=np.complex)
-    for i_f, f in enumerate(f_range):
-        if f == 0.:
-            window = np.ones(len(tw))
-        else:
-            window = ((f / (np.sqrt(2. * np.pi) * k)) *
-                      np.exp(-0.5 * (1. / k ** 2.) * (f ** 2.) * tw ** 2.))
-        window /= window.sum()  # normalisation
-        windows[i_f] = fftpack.fft(window)
+    f_range = np.arange(start_f, stop_f, 1)[:, np.newaxis]
+    windows = ((f_range / (np.sqrt(2. * np.pi) * k)) *
+               np.exp(-0.5 * (1. / k ** 2.) * (f_range ** 2.) * tw ** 2.))
+    windows[f_range[:, 0] == 0] = 1.
+    windows /= windows.sum(axis=1)[:, np.newaxis]  # normalisation
+    windows = fftpack.fft(windows)
+    windows.flags.writeable = False
+    _st_windows_cache[key] = windows
     return windows
 
 
+_st_windows_cache = _BoundedCache(max_size=8)
+
+
 def _st(x, start_f, windows):
     """Implementation based on Ali Moukadem Matlab code (only used in tests)"""
     n_samp = x.shape[-1]
@@ -72,25 +82,46 @@ def _st(x, start_f, windows):
     return ST
 
 
+_st_block_bytes = 2 ** 22
+
+
 def _st_power_itc(x, start_f, compute_itc, zero_pad, decim, W):
-    """Aux function"""
+    """Aux function
+
+    The frequencies are processed in blocks of about ``_st_block_bytes``,
+    with one inverse FFT per block. If possible, the decimation is done
+    in the frequency domain (by folding the spectra), which shortens the
+    inverse FFTs.
+    """
     n_samp = x.shape[-1]
     n_out = (n_samp - zero_pad)
     n_out = n_out // decim + bool(n_out % decim)
     psd = np.empty((len(W), n_out))
     itc = np.empty_like(psd) if compute_itc else None
     X = fftpack.fft(x)
-    XX = np.concatenate([X, X], axis=-1)
-    for i_f, window in enumerate(W):
-        f = start_f + i_f
-        ST = fftpack.ifft(XX[:, f:f + n_samp] * window)
-        TFR = ST[:, :-zero_pad:decim]
+    XX = np.concatenate([X, X], axis=-1)[:, start_f:]
+    # the spectra shifted for each frequency, as a view of XX
+    XX = as_strided(XX, shape=(len(x), len(W), n_samp),
+                    strides=XX.strides[:1] + XX.strides[1:] * 2)
+    fold = decim > 1 and n_samp % decim == 0
+    n_block = max(1, int(_st_block_bytes // (16 * len(x) * n_samp)))
+    for start in range(0, len(W), n_block):
+        block = slice(start, start + n_block)
+        ST = XX[:, block] * W[block]
+        if fold:
+            # keeping every decim-th time point is equivalent to summing
+            # decim segments of the spectra
+            ST = ST.reshape(ST.shape[:2] + (decim, n_samp // decim))
+            TFR = fftpack.ifft(ST.sum(axis=2))[..., :n_out]
+            TFR /= decim
+        else:
+            TFR = fftpack.ifft(ST)[..., :n_samp - zero_pad:decim]
         TFR_abs = np.abs(TFR)
         if compute_itc:
             TFR /= TFR_abs
-            itc[i_f] = np.abs(np.mean(TFR, axis=0))
+            itc[block] = np.abs(np.mean(TFR, axis=0))
         TFR_abs *= TFR_abs
-        psd[i_f] = np.mean(TFR_abs, axis=0)
+        psd[block] = np.mean(TFR_abs, axis=0)
     return psd, itc
 
 
@@ -6,12 +6,13 @@ import warnings
 import copy as cp
 
 import numpy as np
+from scipy import linalg
 from scipy.fftpack import fftfreq
 
 from ..io.pick import pick_types
 from ..utils import logger, verbose
 from ..time_frequency.multitaper import (dpss_windows, _mt_spectra,
-                                         _csd_from_mt, _psd_from_mt_adaptive)
+                                         _psd_from_mt_adaptive)
 
 
 class CrossSpectralDensity(object):
@@ -145,6 +146,7 @@ def compute_epochs_csd(epochs, mode='multitaper', fmin=0, fmax=np.inf,
     # Preparing frequencies of interest
     sfreq = epochs.info['sfreq']
     frequencies = fftfreq(n_fft, 1. / sfreq)
+    frequencies = frequencies[frequencies >= 0]
     freq_mask = (frequencies > fmin) & (frequencies < fmax)
     frequencies = frequencies[freq_mask]
     n_freqs = len(frequencies)
@@ -184,8 +186,20 @@ def compute_epochs_csd(epochs, mode='multitaper', fmin=0, fmax=np.inf,
     else:
         raise ValueError('Mode has an invalid value.')
 
-    csds_mean = np.zeros((len(ch_names), len(ch_names), n_freqs),
-                         dtype=complex)
+    # Scaling by number of samples and compensating for loss of power due
+    # to windowing (see section 11.5.2 in Bendat & Piersol), and by
+    # sampling frequency for compatibility with Matlab
+    scale = 1. / sfreq
+    if mode == 'fourier':
+        scale *= 8 / (3. * n_times)
+
+    # Only the upper triangle of the Hermitian CSD matrices is accumulated,
+    # with rank-k updates over the tapers (and frequencies if fsum is True)
+    n_channels = len(ch_names)
+    n_csds = 1 if fsum is True else n_freqs
+    csds_mean = [np.zeros((n_channels, n_channels), dtype=np.complex128,
+                          order='F') for _ in range(n_csds)]
+    herk, = linalg.get_blas_funcs(('herk',), (csds_mean[0],))
 
     # Compute CSD for each epoch
     n_epochs = 0
@@ -199,57 +213,45 @@ def compute_epochs_csd(epochs, mode='multitaper', fmin=0, fmax=np.inf,
             # Compute adaptive weights
             _, weights = _psd_from_mt_adaptive(x_mt, eigvals, freq_mask,
                                                return_weights=True)
-            # Tiling weights so that we can easily use _csd_from_mt()
-            weights = weights[:, np.newaxis, :, :]
-            weights = np.tile(weights, [1, x_mt.shape[0], 1, 1])
+        elif mode == 'multitaper':
+            weights = np.sqrt(eigvals)[np.newaxis, :, np.newaxis]
         else:
-            # Do not use adaptive weights
-            if mode == 'multitaper':
-                weights = np.sqrt(eigvals)[np.newaxis, np.newaxis, :,
-                                           np.newaxis]
-            else:
-                # Hack so we can sum over axis=-2
-                weights = np.array([1.])[:, None, None, None]
-
-        # Picking frequencies of interest
-        x_mt = x_mt[:, :, freq_mask]
-
-        # Calculating CSD
-        # Tiling x_mt so that we can easily use _csd_from_mt()
-        x_mt = x_mt[:, np.newaxis, :, :]
-        x_mt = np.tile(x_mt, [1, x_mt.shape[0], 1, 1])
-        y_mt = np.transpose(x_mt, axes=[1, 0, 2, 3])
-        weights_y = np.transpose(weights, axes=[1, 0, 2, 3])
-        csds_epoch = _csd_from_mt(x_mt, y_mt, weights, weights_y)
-
-        # Scaling by number of samples and compensating for loss of power due
-        # to windowing (see section 11.5.2 in Bendat & Piersol).
-        if mode == 'fourier':
-            csds_epoch /= n_times
-            csds_epoch *= 8 / 3.
-
-        # Scaling by sampling frequency for compatibility with Matlab
-        csds_epoch /= sfreq
-
-        csds_mean += csds_epoch
+            weights = np.ones((1, 1, 1))
+
+        # Picking frequencies of interest and weighting the tapered spectra
+        # such that the CSD is their product summed over tapers (see
+        # _csd_from_mt)
+        x_mt = x_mt[:, :, freq_mask] * weights
+        x_mt *= np.sqrt(2. / np.sum(weights * weights, axis=1))[:, None]
+
+        if fsum is True:
+            x_mt = x_mt.reshape(n_channels, -1)
+            csds_mean[0] = herk(scale, x_mt, beta=1., c=csds_mean[0],
+                                overwrite_c=True)
+        else:
+            for i in range(n_freqs):
+                csds_mean[i] = herk(scale, x_mt[:, :, i], beta=1.,
+                                    c=csds_mean[i], overwrite_c=True)
         n_epochs += 1
 
-    csds_mean /= n_epochs
+    # fill in the lower triangle
+    for i, csd in enumerate(csds_mean):
+        csd = np.triu(csd)
+        csds_mean[i] = (csd + np.triu(csd, 1).conj().T) / n_epochs
 
     logger.info('[done]')
 
     # Summing over frequencies of interest or returning a list of separate CSD
     # matrices for each frequency
     if fsum is True:
-        csd_mean_fsum = np.sum(csds_mean, 2)
-        csd = CrossSpectralDensity(csd_mean_fsum, ch_names, projs,
+        csd = CrossSpectralDensity(csds_mean[0], ch_names, projs,
                                    epochs.info['bads'],
                                    frequencies=frequencies, n_fft=n_fft)
         return csd
     else:
         csds = []
         for i in range(n_freqs):
-            csds.append(CrossSpectralDensity(csds_mean[:, :, i], ch_names,
+            csds.append(CrossSpectralDensity(csds_mean[i], ch_names,
                                              projs, epochs.info['bads'],
                                              frequencies=frequencies[i],
                                              n_fft=n_fft))
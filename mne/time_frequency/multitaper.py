@@ -3,13 +3,17 @@
 
 # Parts of this code were copied from NiTime http://nipy.sourceforge.net/nitime
 from warnings import warn
+import os
+import os.path as op
+import tempfile
 
 import numpy as np
 from scipy import fftpack, linalg, interpolate
 import warnings
 
 from ..parallel import parallel_func
-from ..utils import verbose, sum_squared
+from ..utils import (verbose, sum_squared, logger, get_config,
+                     _BoundedCache)
 
 
 def tridisolve(d, e, b, overwrite_b=True):
@@ -146,7 +150,59 @@ def dpss_windows(N, half_nbw, Kmax, low_bias=True, interp_from=None,
     Slepian, D. Prolate spheroidal wave functions, Fourier analysis, and
     uncertainty V: The discrete case. Bell System Technical Journal,
     Volume 57 (1978), 1371430
+
+    The windows and eigenvalues are cached in memory, so asking for the
+    same tapers again (e.g., once per epoch) does not recompute them. If
+    the ``MNE_DPSS_CACHE_DIR`` config is set, they are also stored in (and
+    read from) that directory.
     """
+    key = (int(N), float(half_nbw), int(Kmax), bool(low_bias),
+           None if interp_from is None else int(interp_from),
+           str(interp_kind))
+    out = _dpss_cache.get(key)
+    if out is None:
+        cache_dir = get_config('MNE_DPSS_CACHE_DIR', None)
+        fname = None
+        if cache_dir is not None:
+            fname = op.join(cache_dir, 'dpss_%d_%r_%d_%d_%s_%s.npz' % key)
+        if fname is not None and op.isfile(fname):
+            logger.debug('Reading DPSS windows from %s' % fname)
+            try:
+                with np.load(fname) as fid:
+                    out = (fid['dpss'], fid['eigvals'])
+            except Exception as exp:  # e.g., a truncated or corrupt file
+                logger.debug('Could not read %s (%s), recomputing the DPSS '
+                             'windows' % (fname, exp))
+        if out is None:
+            out = _compute_dpss_windows(N, half_nbw, Kmax, low_bias,
+                                        interp_from, interp_kind)
+            if fname is not None:
+                _write_dpss_cache(fname, out)
+        _dpss_cache[key] = out
+    # copy so that the cached values cannot be modified
+    return out[0].copy(), out[1].copy()
+
+
+_dpss_cache = _BoundedCache(max_size=16)
+
+
+def _write_dpss_cache(fname, out):
+    """Write DPSS windows atomically, as several jobs may write them"""
+    fd, tmp_fname = tempfile.mkstemp(dir=op.dirname(fname), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fid:
+            np.savez(fid, dpss=out[0], eigvals=out[1])
+        os.rename(tmp_fname, fname)
+    except (IOError, OSError) as exp:
+        # the cache is optional, e.g. another job may have written it
+        logger.debug('Could not write %s (%s)' % (fname, exp))
+        if op.isfile(tmp_fname):
+            os.remove(tmp_fname)
+
+
+def _compute_dpss_windows(N, half_nbw, Kmax, low_bias, interp_from,
+                          interp_kind):
+    """Compute the DPSS windows (see dpss_windows)"""
     Kmax = int(Kmax)
     W = float(half_nbw) / N
     nidx = np.arange(N, dtype='d')
@@ -292,70 +348,84 @@ def _psd_from_mt_adaptive(x_mt, eigvals, freq_mask, max_iter=150,
     if n_tapers < 3:
         raise ValueError('Not enough tapers to compute adaptive weights.')
 
+    eigvals = np.asarray(eigvals, dtype=np.float64)
     rt_eig = np.sqrt(eigvals)
 
+    # the weights are real, so only the power of the tapered spectra is
+    # needed
+    x_pow = x_mt.real ** 2 + x_mt.imag ** 2
+
     # estimate the variance from an estimate with fixed weights
-    psd_est = _psd_from_mt(x_mt, rt_eig[np.newaxis, :, np.newaxis])
+    psd_est = _psd_from_mt_power(x_pow, eigvals[np.newaxis, :, np.newaxis])
     x_var = np.trapz(psd_est, dx=np.pi / n_freqs) / (2 * np.pi)
     del psd_est
 
-    # allocate space for output
-    psd = np.empty((n_signals, np.sum(freq_mask)))
-
     # only keep the frequencies of interest
-    x_mt = x_mt[:, :, freq_mask]
+    x_pow = x_pow[:, :, freq_mask]
 
-    if return_weights:
-        weights = np.empty((n_signals, n_tapers, psd.shape[1]))
-
-    for i, (xk, var) in enumerate(zip(x_mt, x_var)):
-        # combine the SDFs in the traditional way in order to estimate
-        # the variance of the timeseries
-
-        # The process is to iteratively switch solving for the following
-        # two expressions:
-        # (1) Adaptive Multitaper SDF:
-        # S^{mt}(f) = [ sum |d_k(f)|^2 S_k(f) ]/ sum |d_k(f)|^2
-        #
-        # (2) Weights
-        # d_k(f) = [sqrt(lam_k) S^{mt}(f)] / [lam_k S^{mt}(f) + E{B_k(f)}]
-        #
-        # Where lam_k are the eigenvalues corresponding to the DPSS tapers,
-        # and the expected value of the broadband bias function
-        # E{B_k(f)} is replaced by its full-band integration
-        # (1/2pi) int_{-pi}^{pi} E{B_k(f)} = sig^2(1-lam_k)
-
-        # start with an estimate from incomplete data--the first 2 tapers
-        psd_iter = _psd_from_mt(xk[:2, :], rt_eig[:2, np.newaxis])
-
-        err = np.zeros_like(xk)
-        for n in range(max_iter):
-            d_k = (psd_iter / (eigvals[:, np.newaxis] * psd_iter +
-                   (1 - eigvals[:, np.newaxis]) * var))
-            d_k *= rt_eig[:, np.newaxis]
-            # Test for convergence -- this is overly conservative, since
-            # iteration only stops when all frequencies have converged.
-            # A better approach is to iterate separately for each freq, but
-            # that is a nonvectorized algorithm.
-            # Take the RMS difference in weights from the previous iterate
-            # across frequencies. If the maximum RMS error across freqs is
-            # less than 1e-10, then we're converged
-            err -= d_k
-            if np.max(np.mean(err ** 2, axis=0)) < 1e-10:
+    # allocate space for output
+    psd = np.empty((n_signals, x_pow.shape[2]))
+    weights = np.empty((n_signals, n_tapers, x_pow.shape[2]))
+
+    # combine the SDFs in the traditional way in order to estimate
+    # the variance of the timeseries
+
+    # The process is to iteratively switch solving for the following
+    # two expressions:
+    # (1) Adaptive Multitaper SDF:
+    # S^{mt}(f) = [ sum |d_k(f)|^2 S_k(f) ]/ sum |d_k(f)|^2
+    #
+    # (2) Weights
+    # d_k(f) = [sqrt(lam_k) S^{mt}(f)] / [lam_k S^{mt}(f) + E{B_k(f)}]
+    #
+    # Where lam_k are the eigenvalues corresponding to the DPSS tapers,
+    # and the expected value of the broadband bias function
+    # E{B_k(f)} is replaced by its full-band integration
+    # (1/2pi) int_{-pi}^{pi} E{B_k(f)} = sig^2(1-lam_k)
+
+    # All signals are iterated at once, the ones that have converged are
+    # removed from the set of active signals.
+    active = np.arange(n_signals)
+    eigvals = eigvals[np.newaxis, :, np.newaxis]
+    rt_eig = rt_eig[np.newaxis, :, np.newaxis]
+    bias = (1 - eigvals) * x_var[:, np.newaxis, np.newaxis]
+
+    # start with an estimate from incomplete data--the first 2 tapers
+    psd_iter = _psd_from_mt_power(x_pow[:, :2, :], eigvals[:, :2])
+
+    err = np.zeros(x_pow.shape)
+    for n in range(max_iter):
+        d_k = eigvals * psd_iter[:, np.newaxis, :]
+        d_k += bias
+        np.divide(psd_iter[:, np.newaxis, :], d_k, out=d_k)
+        d_k *= rt_eig
+        # Test for convergence -- this is overly conservative, since
+        # iteration only stops when all frequencies have converged.
+        # A better approach is to iterate separately for each freq, but
+        # that is a nonvectorized algorithm.
+        # Take the RMS difference in weights from the previous iterate
+        # across frequencies. If the maximum RMS error across freqs is
+        # less than 1e-10, then we're converged
+        err -= d_k
+        err *= err
+        converged = np.max(np.mean(err, axis=1), axis=1) < 1e-10
+        if converged.any():
+            psd[active[converged]] = psd_iter[converged]
+            weights[active[converged]] = d_k[converged]
+            keep = np.logical_not(converged)
+            active, x_pow, bias = active[keep], x_pow[keep], bias[keep]
+            d_k = d_k[keep]
+            if len(active) == 0:
                 break
 
-            # update the iterative estimate with this d_k
-            psd_iter = _psd_from_mt(xk, d_k)
-            err = d_k
-
-        if n == max_iter - 1:
-            warn('Iterative multi-taper PSD computation did not converge.',
-                 RuntimeWarning)
-
-        psd[i, :] = psd_iter
-
-        if return_weights:
-            weights[i, :, :] = d_k
+        # update the iterative estimate with this d_k
+        psd_iter = _psd_from_mt_power(x_pow, d_k ** 2)
+        err = d_k
+    else:
+        warn('Iterative multi-taper PSD computation did not converge.',
+             RuntimeWarning)
+        psd[active] = psd_iter
+        weights[active] = d_k
 
     if return_weights:
         return psd, weights
@@ -384,6 +454,13 @@ def _psd_from_mt(x_mt, weights):
     return psd
 
 
+def _psd_from_mt_power(x_pow, weights_sq):
+    """Compute PSD from the power of tapered spectra and squared weights"""
+    psd = np.sum(weights_sq * x_pow, axis=-2)
+    psd *= 2 / weights_sq.sum(axis=-2)
+    return psd
+
+
 def _csd_from_mt(x_mt, y_mt, weights_x, weights_y):
     """ Compute CSD from tapered spectra
 
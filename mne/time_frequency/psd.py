@@ -3,11 +3,13 @@
 # License : BSD 3-clause
 
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
 
 from ..parallel import parallel_func
 from ..io.proj import make_projector_info
 from ..io.pick import pick_types
 from ..utils import logger, verbose
+from .tfr import _iter_epochs_batches
 
 
 @verbose
@@ -56,33 +58,58 @@ def compute_raw_psd(raw, tmin=0., tmax=np.inf, picks=None,
     freqs: array of float
         The frequencies
     """
-    start, stop = raw.time_as_index([tmin, tmax])
-    if picks is not None:
-        data, times = raw[picks, start:(stop + 1)]
+    n_fft = int(n_fft)
+    n_overlap = int(n_overlap)
+    pad_to = n_fft if pad_to is None else int(pad_to)
+    Fs = raw.info['sfreq']
+    start = raw.time_as_index(tmin)[0]
+    if np.isfinite(tmax):
+        stop = min(raw.time_as_index(tmax)[0] + 1, raw.n_times)
     else:
-        data, times = raw[:, start:(stop + 1)]
+        stop = raw.n_times
+    if picks is None:
+        picks = np.arange(raw.info['nchan'])
+    picks = np.asarray(picks)
 
+    mult = None
     if proj:
         proj, _ = make_projector_info(raw.info)
-        if picks is not None:
-            data = np.dot(proj[picks][:, picks], data)
-        else:
-            data = np.dot(proj, data)
-
-    n_fft = int(n_fft)
-    Fs = raw.info['sfreq']
+        mult = raw._dot_operator(proj[picks][:, picks], picks,
+                                 stop - start)
 
     logger.info("Effective window size : %0.3f (s)" % (n_fft / float(Fs)))
 
-    import matplotlib.pyplot as plt
-    parallel, my_psd, n_jobs = parallel_func(plt.psd, n_jobs)
-    fig = plt.figure()
-    out = parallel(my_psd(d, Fs=Fs, NFFT=n_fft, noverlap=n_overlap,
-                          pad_to=pad_to) for d in data)
-    if not plot:
-        plt.close(fig)
-    freqs = out[0][1]
-    psd = np.array([o[0] for o in out])
+    # Read the data in chunks that hold whole windows
+    step = n_fft - n_overlap
+    n_windows = max(1, 1 + (stop - start - n_fft) // step)
+    chunk_windows = max(1, int(10 * Fs) // step)
+    window = np.hanning(n_fft)
+    parallel, my_welch, n_jobs = parallel_func(_welch_sum, n_jobs)
+    blocks = [b for b in np.array_split(np.arange(len(picks)), n_jobs)
+              if len(b) > 0]
+    psd = np.zeros((len(picks), pad_to // 2 + 1))
+    for first in range(0, n_windows, chunk_windows):
+        this_start = start + first * step
+        n_chunk = min(chunk_windows, n_windows - first)
+        this_stop = min(this_start + (n_chunk - 1) * step + n_fft, stop)
+        if mult is None:
+            data = raw[picks, this_start:this_stop][0]
+        else:
+            data = raw._dot_data(mult, picks, this_start, this_stop)[0]
+        out = parallel(my_welch(data[block], window, n_overlap, pad_to)
+                       for block in blocks)
+        for block, psd_block in zip(blocks, out):
+            psd[block] += psd_block
+    psd = _welch_scale(psd, n_windows, Fs, window, pad_to)
+    freqs = np.arange(pad_to // 2 + 1) * (Fs / float(pad_to))
+
+    if plot:
+        import matplotlib.pyplot as plt
+        plt.figure()
+        plt.plot(freqs, 10 * np.log10(psd.T))
+        plt.xlabel('Frequency')
+        plt.ylabel('Power Spectral Density (dB/Hz)')
+        plt.grid(True)
 
     mask = (freqs >= fmin) & (freqs <= fmax)
     freqs = freqs[mask]
@@ -91,15 +118,43 @@ def compute_raw_psd(raw, tmin=0., tmax=np.inf, picks=None,
     return psd, freqs
 
 
-def _compute_psd(data, fmin, fmax, Fs, n_fft, psd, n_overlap, pad_to):
-    """Compute the PSD"""
-    out = [psd(d, Fs=Fs, NFFT=n_fft, noverlap=n_overlap, pad_to=pad_to)
-           for d in data]
-    psd = np.array([o[0] for o in out])
-    freqs = out[0][1]
-    mask = (freqs >= fmin) & (freqs <= fmax)
-    freqs = freqs[mask]
-    return psd[:, mask], freqs
+def _welch_sum(data, window, n_overlap, pad_to):
+    """Sum the periodograms of the overlapping windows of data
+
+    The windows are strided views of data of shape (..., n_times), which
+    are tapered and transformed with one rFFT per block of windows. Data
+    shorter than the window are zero padded.
+
+    Returns the sum over windows, of shape (..., n_freqs).
+    """
+    n_fft = len(window)
+    n_times = data.shape[-1]
+    if n_times < n_fft:
+        pad = np.zeros(data.shape[:-1] + (n_fft - n_times,))
+        data = np.concatenate([data, pad], axis=-1)
+        n_times = n_fft
+    step = n_fft - n_overlap
+    n_windows = 1 + (n_times - n_fft) // step
+    windows = as_strided(data, shape=data.shape[:-1] + (n_windows, n_fft),
+                         strides=data.strides[:-1] +
+                         (step * data.strides[-1], data.strides[-1]))
+    psd = np.zeros(data.shape[:-1] + (pad_to // 2 + 1,))
+    # limit the temporary arrays to about 2 ** 24 values
+    n_signals = max(1, int(np.prod(data.shape[:-1])))
+    n_block = max(1, 2 ** 24 // (n_signals * max(n_fft, pad_to)))
+    for first in range(0, n_windows, n_block):
+        spec = np.fft.rfft(windows[..., first:first + n_block, :] * window,
+                           n=pad_to)
+        psd += np.sum(spec.real ** 2 + spec.imag ** 2, axis=-2)
+    return psd
+
+
+def _welch_scale(psd, n_windows, sfreq, window, pad_to):
+    """Scale summed periodograms to a one-sided PSD (in place)"""
+    psd /= n_windows * sfreq * np.sum(window ** 2)
+    # double the power of the frequencies that have a negative counterpart
+    psd[..., 1:pad_to - pad_to // 2] *= 2.
+    return psd
 
 
 @verbose
@@ -141,20 +196,30 @@ def compute_epochs_psd(epochs, picks=None, fmin=0, fmax=np.inf, n_fft=256,
     """
 
     n_fft = int(n_fft)
+    n_overlap = int(n_overlap)
+    pad_to = n_fft if pad_to is None else int(pad_to)
     Fs = epochs.info['sfreq']
     if picks is None:
         picks = pick_types(epochs.info, meg=True, eeg=True, ref_meg=False,
                            exclude='bads')
+    picks = np.asarray(picks)
 
     logger.info("Effective window size : %0.3f (s)" % (n_fft / float(Fs)))
-    psds = []
-    import matplotlib.pyplot as plt
-    parallel, my_psd, n_jobs = parallel_func(_compute_psd, n_jobs)
-    fig = plt.figure()  # threading will induce errors otherwise
-    out = parallel(my_psd(data[picks], fmin, fmax, Fs, n_fft, plt.psd,
-                          n_overlap, pad_to)
-                   for data in epochs)
-    plt.close(fig)
-    psds = [o[0] for o in out]
-    freqs = [o[1] for o in out]
-    return np.array(psds), freqs[0]
+    window = np.hanning(n_fft)
+    freqs = np.arange(pad_to // 2 + 1) * (Fs / float(pad_to))
+    mask = (freqs >= fmin) & (freqs <= fmax)
+    n_windows = max(1, 1 + (len(epochs.times) - n_fft) // (n_fft - n_overlap))
+    parallel, my_welch, n_jobs = parallel_func(_welch_sum, n_jobs)
+    blocks = [b for b in np.array_split(np.arange(len(picks)), n_jobs)
+              if len(b) > 0]
+    # process the epochs in batches, without loading all of them
+    psds = list()
+    for batch in _iter_epochs_batches(epochs, picks, 20):
+        psd = np.empty((len(batch), len(picks), len(freqs)))
+        out = parallel(my_welch(batch[:, block], window, n_overlap, pad_to)
+                       for block in blocks)
+        for block, psd_block in zip(blocks, out):
+            psd[:, block] = psd_block
+        psd = _welch_scale(psd, n_windows, Fs, window, pad_to)
+        psds.append(psd[:, :, mask])
+    return np.concatenate(psds), freqs[mask]
@@ -1,6 +1,6 @@
 from math import ceil
 import numpy as np
-from scipy.fftpack import fft, ifft, fftfreq
+from scipy.fftpack import fftfreq
 
 from ..utils import logger, verbose
 
@@ -91,13 +91,12 @@ def stft(x, wsize, tstep=None, verbose=None):
     xp[:, (wsize - tstep) // 2: (wsize - tstep) // 2 + T] = x
     x = xp
 
-    for t in range(n_step):
-        # Framing
-        wwin = win / swin[t * tstep: t * tstep + wsize]
-        frame = x[:, t * tstep: t * tstep + wsize] * wwin[None, :]
-        # FFT
-        fframe = fft(frame)
-        X[:, :, t] = fframe[:, :n_freq]
+    # Framing all the time steps at once
+    idx = np.arange(n_step)[:, None] * tstep + np.arange(wsize)[None, :]
+    wwin = win[None, :] / swin[idx]
+    frames = x[:, idx] * wwin[None, :, :]
+    # FFT, the frames being real only the positive frequencies are computed
+    X[:] = np.fft.rfft(frames).transpose(0, 2, 1)
 
     return X
 
@@ -137,6 +136,7 @@ def istft(X, tstep=None, Tx=None):
     wsize = 2 * (n_win - 1)
     if tstep is None:
         tstep = wsize / 2
+    tstep = int(tstep)
 
     if wsize % tstep:
         raise ValueError('The step size must be a divider of two times the '
@@ -169,15 +169,19 @@ def istft(X, tstep=None, Tx=None):
         swin[t * tstep:t * tstep + wsize] += win ** 2
     swin = np.sqrt(swin / wsize)
 
-    fframe = np.empty((n_signals, n_win + wsize // 2 - 1), dtype=X.dtype)
-    for t in range(n_step):
-        # IFFT
-        fframe[:, :n_win] = X[:, :, t]
-        fframe[:, n_win:] = np.conj(X[:, wsize // 2 - 1: 0: -1, t])
-        frame = ifft(fframe)
-        wwin = win / swin[t * tstep:t * tstep + wsize]
-        # Overlap-add
-        x[:, t * tstep: t * tstep + wsize] += np.real(np.conj(frame) * wwin)
+    # IFFT of all the time steps at once, the frames being real the
+    # negative frequencies are the conjugates of the positive ones
+    idx = np.arange(n_step)[:, None] * tstep + np.arange(wsize)[None, :]
+    wwin = win[None, :] / swin[idx]
+    frames = np.fft.irfft(X.transpose(0, 2, 1), n=wsize) * wwin[None, :, :]
+    # Overlap-add, the windows being made of wsize / tstep blocks of tstep
+    # samples
+    n_blocks = wsize // tstep
+    frames = frames.reshape(n_signals, n_step, n_blocks, tstep)
+    x = x.reshape(n_signals, -1, tstep)
+    for b in range(n_blocks):
+        x[:, b:b + n_step] += frames[:, :, b]
+    x = x.reshape(n_signals, -1)
 
     # Truncation
     x = x[:, (wsize - tstep) // 2: (wsize - tstep) // 2 + T + 1][:, :Tx].copy()
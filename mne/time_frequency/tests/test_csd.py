@@ -1,6 +1,6 @@
 import numpy as np
 from nose.tools import assert_raises, assert_equal, assert_true
-from numpy.testing import assert_array_equal
+from numpy.testing import assert_array_equal, assert_array_almost_equal
 from os import path as op
 import warnings
 
@@ -161,3 +161,37 @@ def test_compute_epochs_csd_on_artificial_data():
                     delta = 0.004
                 assert_true(abs(signal_power_per_sample -
                                 mt_power_per_sample) < delta)
+
+
+def test_compute_epochs_csd_hermitian():
+    """Test CSD computed with Hermitian rank-k updates"""
+    from mne.time_frequency.multitaper import (dpss_windows, _mt_spectra,
+                                               _csd_from_mt)
+    rng = np.random.RandomState(0)
+    n_channels, n_times, sfreq = 4, 200, 200.
+    info = mne.create_info(['EEG%03d' % ii for ii in range(n_channels)],
+                           sfreq, ['eeg'] * n_channels)
+    raw = mne.io.RawArray(rng.randn(n_channels, 5 * n_times), info)
+    events = np.array([[ii * n_times, 0, 1] for ii in range(1, 4)])
+    epochs = mne.Epochs(raw, events, 1, 0, (n_times - 1) / sfreq,
+                        baseline=(None, None), preload=False,
+                        add_eeg_ref=False)
+    data = epochs.get_data()
+    dpss, eigvals = dpss_windows(n_times, 2, 4)
+    weights = np.sqrt(eigvals)[np.newaxis, :, np.newaxis]
+    x_mt, freqs = _mt_spectra(data[0], dpss, sfreq)
+    freq_mask = (freqs > 10) & (freqs < 30)
+    csd_want = 0.
+    for epoch in data:
+        x_mt = _mt_spectra(epoch, dpss, sfreq)[0][:, :, freq_mask]
+        csd_want += _csd_from_mt(x_mt[:, np.newaxis], x_mt[np.newaxis],
+                                 weights, weights) / sfreq
+    csd_want /= len(data)
+
+    csds = compute_epochs_csd(epochs, fmin=10, fmax=30, fsum=False)
+    assert_equal(len(csds), freq_mask.sum())
+    for ii, csd in enumerate(csds):
+        assert_array_almost_equal(csd.data, csd_want[:, :, ii])
+        assert_array_almost_equal(csd.data, csd.data.conj().T)
+    csd = compute_epochs_csd(epochs, fmin=10, fmax=30)
+    assert_array_almost_equal(csd.data, np.sum(csd_want, axis=2))
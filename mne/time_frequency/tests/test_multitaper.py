@@ -1,10 +1,13 @@
+import os
+import os.path as op
 import numpy as np
-from nose.tools import assert_raises
+from nose.tools import assert_raises, assert_true
 from numpy.testing import assert_array_almost_equal
 from distutils.version import LooseVersion
 
 from mne.time_frequency import dpss_windows, multitaper_psd
-from mne.utils import requires_nitime
+from mne.time_frequency import multitaper
+from mne.utils import requires_nitime, _TempDir
 
 
 @requires_nitime
@@ -31,6 +34,71 @@ def test_dpss_windows():
     assert_array_almost_equal(eigs, eigs_ni)
 
 
+def test_dpss_cache():
+    """ Test caching of DPSS windows """
+    multitaper._dpss_cache.clear()
+    dpss, eigs = dpss_windows(500, 3, 5)
+    assert_true(len(multitaper._dpss_cache) == 1)
+    dpss[:] = 0.  # must not modify the cached windows
+    dpss_2, eigs_2 = dpss_windows(500, 3., 5)
+    assert_true(len(multitaper._dpss_cache) == 1)
+    dpss, eigs = multitaper._compute_dpss_windows(500, 3, 5, True, None,
+                                                  'linear')
+    assert_array_almost_equal(dpss, dpss_2)
+    assert_array_almost_equal(eigs, eigs_2)
+
+    # on-disk store
+    tempdir = _TempDir()
+    os.environ['MNE_DPSS_CACHE_DIR'] = tempdir
+    try:
+        multitaper._dpss_cache.clear()
+        dpss_windows(500, 3, 5, low_bias=False)
+        assert_true(len(os.listdir(tempdir)) == 1)
+        fname = op.join(tempdir, os.listdir(tempdir)[0])
+        multitaper._dpss_cache.clear()
+        dpss_3, eigs_3 = dpss_windows(500, 3, 5, low_bias=False)
+        # a corrupt file is recomputed and replaced
+        with open(fname, 'wb') as fid:
+            fid.write(b'PK\x03\x04')
+        multitaper._dpss_cache.clear()
+        dpss_4, eigs_4 = dpss_windows(500, 3, 5, low_bias=False)
+        assert_array_almost_equal(dpss_3, dpss_4)
+        assert_true(os.listdir(tempdir) == [op.basename(fname)])
+        multitaper._dpss_cache.clear()
+        dpss_4, eigs_4 = dpss_windows(500, 3, 5, low_bias=False)
+        assert_array_almost_equal(dpss_3, dpss_4)
+    finally:
+        del os.environ['MNE_DPSS_CACHE_DIR']
+    assert_true(op.isfile(fname))
+    dpss, eigs = multitaper._compute_dpss_windows(500, 3, 5, False, None,
+                                                  'linear')
+    assert_array_almost_equal(dpss, dpss_3)
+    assert_array_almost_equal(eigs, eigs_3)
+
+
+def test_psd_from_mt_adaptive():
+    """ Test adaptive weights computed for all signals at once """
+    rng = np.random.RandomState(0)
+    x = rng.randn(6, 500)
+    x[:3] = np.cumsum(x[:3], axis=1)  # converge at different iterations
+    dpss, eigvals = dpss_windows(500, 4, 8)
+    x_mt, freqs = multitaper._mt_spectra(x, dpss, 500.)
+    freq_mask = (freqs > 10) & (freqs < 100)
+    psd, weights = multitaper._psd_from_mt_adaptive(x_mt, eigvals, freq_mask,
+                                                    return_weights=True)
+    assert_true(psd.shape == (6, freq_mask.sum()))
+    assert_true(weights.shape == (6, len(eigvals), freq_mask.sum()))
+    for ii in range(len(x)):
+        psd_1, weights_1 = multitaper._psd_from_mt_adaptive(
+            x_mt[ii:ii + 1], eigvals, freq_mask, return_weights=True)
+        assert_array_almost_equal(psd[ii:ii + 1], psd_1)
+        assert_array_almost_equal(weights[ii:ii + 1], weights_1)
+    # the weights give back the PSD
+    assert_array_almost_equal(
+        multitaper._psd_from_mt(x_mt[:, :, freq_mask], weights), psd,
+        decimal=4)
+
+
 @requires_nitime
 def test_multitaper_psd():
     """ Test multi-taper PSD computation """
@@ -4,7 +4,7 @@ from numpy.testing import assert_array_almost_equal
 from nose.tools import assert_true
 
 from mne import io, pick_types
-from mne import Epochs
+from mne import Epochs, create_info
 from mne import read_events
 from mne.time_frequency import compute_raw_psd, compute_epochs_psd
 
@@ -13,6 +13,37 @@ raw_fname = op.join(base_dir, 'test_raw.fif')
 event_fname = op.join(base_dir, 'test-eve.fif')
 
 
+def test_psd_welch():
+    """Test Welch PSD against matplotlib on chunked raw and epochs
+    """
+    from matplotlib import mlab
+    rng = np.random.RandomState(0)
+    sfreq, n_fft, n_overlap = 250., 128, 50
+    data = rng.randn(3, 6000)
+    raw = io.RawArray(data, create_info(['a', 'b', 'c'], sfreq,
+                                        ['eeg'] * 3))
+    # the raw data are read in several chunks
+    psds, freqs = compute_raw_psd(raw, tmin=1., n_fft=n_fft,
+                                  n_overlap=n_overlap, pad_to=256, n_jobs=2)
+    for psd, x in zip(psds, data):
+        psd_mlab, freqs_mlab = mlab.psd(x[250:], NFFT=n_fft, Fs=sfreq,
+                                        noverlap=n_overlap, pad_to=256)
+        assert_array_almost_equal(psd, psd_mlab)
+    assert_array_almost_equal(freqs, freqs_mlab)
+
+    events = np.array([[100 * ii, 0, 1] for ii in range(1, 50)])
+    epochs = Epochs(raw, events, 1, 0, 0.5, baseline=None, preload=False,
+                    add_eeg_ref=False)
+    psds, freqs = compute_epochs_psd(epochs, picks=[0, 2], n_fft=n_fft,
+                                     n_overlap=n_overlap, fmax=40.)
+    assert_true(psds.shape == (len(events), 2, len(freqs)))
+    assert_true(freqs.max() <= 40.)
+    for psd, x in zip(psds, epochs.get_data()):
+        psd_mlab = mlab.psd(x[2], NFFT=n_fft, Fs=sfreq,
+                            noverlap=n_overlap)[0]
+        assert_array_almost_equal(psd[1], psd_mlab[:len(freqs)])
+
+
 def test_psd():
     """Test PSD estimation
     """
@@ -12,7 +12,8 @@ from scipy import fftpack
 
 from mne import io, read_events, Epochs, pick_types
 from mne.time_frequency._stockwell import (tfr_stockwell, _st,
-                                           _precompute_st_windows)
+                                           _precompute_st_windows,
+                                           _st_power_itc)
 from mne.time_frequency.tfr import AverageTFR
 
 base_dir = op.join(op.dirname(__file__), '..', '..', 'io', 'tests', 'data')
@@ -72,6 +73,26 @@ def test_stockwell_core():
     assert_array_almost_equal(pulse, y_inv)
 
 
+def test_stockwell_power_itc():
+    """Test batched stockwell power and ITC with decimation"""
+    rng = np.random.RandomState(0)
+    n_samp, start_f, stop_f, zero_pad = 256, 3, 40, 16
+    x = rng.randn(5, n_samp)
+    x[:, -zero_pad:] = 0.
+    W = _precompute_st_windows(n_samp, start_f, stop_f, 256., 1.)
+    assert_true(W is _precompute_st_windows(n_samp, start_f, stop_f, 256.,
+                                            1.))
+    ST = _st(x, start_f, W)[..., :-zero_pad]
+    power = np.mean(np.abs(ST) ** 2, axis=0)
+    itc = np.abs(np.mean(ST / np.abs(ST), axis=0))
+    # decimation in the frequency (4) and time (3) domains
+    for decim in (1, 3, 4):
+        this_power, this_itc = _st_power_itc(x, start_f, True, zero_pad,
+                                             decim, W)
+        assert_array_almost_equal(this_power, power[:, ::decim])
+        assert_array_almost_equal(this_itc, itc[:, ::decim])
+
+
 def test_stockwell_api():
     """Test stockwell functions"""
     epochs = Epochs(raw, events,  # XXX pick 2 has epochs of zeros.
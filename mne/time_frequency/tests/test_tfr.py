@@ -1,15 +1,18 @@
 import numpy as np
 import os.path as op
-from numpy.testing import assert_array_almost_equal, assert_array_equal
+from numpy.testing import (assert_array_almost_equal, assert_array_equal,
+                           assert_allclose)
 from nose.tools import assert_true, assert_false, assert_equal, assert_raises
 
 import mne
 from mne import io, Epochs, read_events, pick_types, create_info, EpochsArray
 from mne.utils import _TempDir, run_tests_if_main, slow_test
 from mne.time_frequency import single_trial_power
-from mne.time_frequency.tfr import cwt_morlet, morlet, tfr_morlet
+from mne.time_frequency import tfr as tfr_module
+from mne.time_frequency.tfr import cwt_morlet, morlet, tfr_morlet, cwt
 from mne.time_frequency.tfr import _dpss_wavelet, tfr_multitaper
 from mne.time_frequency.tfr import AverageTFR, read_tfrs, write_tfrs
+from mne.time_frequency.tfr import _TFRAccumulator, _induced_power
 
 raw_fname = op.join(op.dirname(__file__), '..', '..', 'io', 'tests', 'data',
                     'test_raw.fif')
@@ -115,6 +118,82 @@ def test_time_frequency():
     assert_equal(power_pick.data.shape, power_drop.data.shape)
 
 
+def test_cwt():
+    """Test batched continuous wavelet transform"""
+    rng = np.random.RandomState(0)
+    sfreq = 500.
+    freqs = np.arange(10, 30, 4.)
+    X = rng.randn(7, 300)
+    Ws = morlet(sfreq, freqs, n_cycles=3)
+    # force several blocks of signals
+    block_bytes = tfr_module._cwt_block_bytes
+    tfr_module._cwt_block_bytes = 1
+    try:
+        for mode in ('same', 'valid'):
+            tfr_conv = cwt(X, Ws, use_fft=False, mode=mode)
+            for decim in (1, 3):
+                tfr = cwt(X, Ws, use_fft=True, mode=mode, decim=decim)
+                assert_equal(tfr.shape, (7, len(freqs), len(X[0, ::decim])))
+                assert_array_almost_equal(tfr, tfr_conv[:, :, ::decim])
+                assert_array_almost_equal(
+                    cwt(X, Ws, use_fft=False, mode=mode, decim=decim), tfr)
+            tfr = cwt(X, Ws, mode=mode, decim=2, dtype=np.complex64)
+            assert_equal(tfr.dtype, np.complex64)
+            assert_array_almost_equal(tfr, tfr_conv[:, :, ::2], decimal=5)
+        power = single_trial_power(X.reshape(1, 7, 300), sfreq, freqs,
+                                   n_cycles=3, decim=2)
+        tfr = cwt(X, Ws, use_fft=False, decim=2)
+        assert_allclose(power[0], (tfr * tfr.conj()).real, rtol=1e-10)
+    finally:
+        tfr_module._cwt_block_bytes = block_bytes
+
+
+def test_tfr_accumulator():
+    """Test streaming accumulation of power and ITC"""
+    rng = np.random.RandomState(0)
+    sfreq = 250.
+    freqs = np.arange(10, 30, 5.)
+    data = rng.randn(9, 3, 200)
+    Ws = morlet(sfreq, freqs, n_cycles=2)
+    tfr = cwt(data.reshape(27, 200), Ws, decim=2).reshape(9, 3, 4, 100)
+    power = np.mean(np.abs(tfr) ** 2, axis=0)
+    itc = np.abs(np.mean(tfr / np.abs(tfr), axis=0))
+    acc = _TFRAccumulator([Ws], 3, 200, decim=2).update(data[:4])
+    acc.merge(_TFRAccumulator([Ws], 3, 200, decim=2).update(data[4:]))
+    assert_equal(acc.n_epochs, 9)
+    for this_power, this_itc in (acc.get_power_itc(),
+                                 _induced_power(data, [Ws], True, 2, 1)
+                                 .get_power_itc(),
+                                 _induced_power(data, [Ws], True, 2, 2)
+                                 .get_power_itc()):
+        assert_array_almost_equal(this_power, power)
+        assert_array_almost_equal(this_itc, itc)
+
+    # epochs do not need to be preloaded
+    info = create_info(['EEG %03d' % ii for ii in range(3)] + ['STI 014'],
+                       sfreq, ['eeg'] * 3 + ['stim'])
+    raw = io.RawArray(rng.randn(4, 3000), info)
+    events = np.array([[300 + 200 * ii, 0, 1] for ii in range(12)])
+    epochs = Epochs(raw, events, 1, -0.2, 0.5, baseline=None, preload=False,
+                    add_eeg_ref=False)
+    epochs_data = Epochs(raw, events, 1, -0.2, 0.5, baseline=None,
+                         preload=True, add_eeg_ref=False).get_data()[:, :3]
+    power, itc = tfr_morlet(epochs, freqs, n_cycles=2, use_fft=True,
+                            decim=2)
+    assert_equal(power.nave, 12)
+    Ws = morlet(sfreq, freqs, n_cycles=2, zero_mean=True)
+    power_2, itc_2 = _induced_power(epochs_data, [Ws], True, 2,
+                                    1).get_power_itc()
+    assert_array_almost_equal(power.data, power_2)
+    assert_array_almost_equal(itc.data, itc_2)
+    # each job accumulates a shard of the epochs
+    power_3, itc_3 = tfr_morlet(epochs, freqs, n_cycles=2, use_fft=True,
+                                decim=2, n_jobs=2)
+    assert_equal(power_3.nave, 12)
+    assert_array_almost_equal(power.data, power_3.data)
+    assert_array_almost_equal(itc.data, itc_3.data)
+
+
 def test_dpsswavelet():
     """Test DPSS wavelet"""
     freqs = np.arange(5, 25, 3)
@@ -13,7 +13,7 @@ from math import sqrt
 from copy import deepcopy
 import numpy as np
 from scipy import linalg
-from scipy.fftpack import fftn, ifftn
+from scipy.fftpack import fft, ifft
 
 from ..fixes import partial
 from ..baseline import rescale
@@ -41,6 +41,15 @@ def _get_data(inst, return_itc):
     return data
 
 
+def _get_epochs(inst, return_itc):
+    """Get Epochs or Evoked data as epochs x ch x time, without loading
+    Epochs data (they are iterated over instead)"""
+    from ..epochs import Epochs
+    if isinstance(inst, Epochs):
+        return inst
+    return _get_data(inst, return_itc)
+
+
 def morlet(sfreq, freqs, n_cycles=7, sigma=None, zero_mean=False, Fs=None):
     """Compute Wavelets for the given frequency range
 
@@ -180,15 +189,27 @@ def _centered(arr, newsize):
     return arr[tuple(myslice)]
 
 
-def _cwt_fft(X, Ws, mode="same"):
+# Approximate number of bytes used by each block of signals in _cwt_fft
+_cwt_block_bytes = 2 ** 26
+
+
+def _cwt_fft(X, Ws, mode="same", decim=1, dtype=np.complex128):
     """Compute cwt with fft based convolutions
-    Return a generator over signals.
+
+    The signals are processed in blocks of about ``_cwt_block_bytes``: the
+    FFTs of all signals in a block are computed at once, multiplied by the
+    FFT of each wavelet and inverse transformed together. Only the
+    decimated time points are kept.
+
+    Return a generator over blocks of signals, each of shape
+    (n_signals_block, n_freqs, n_times_decim).
     """
     X = np.asarray(X)
 
     # Precompute wavelets for given frequency range to save time
     n_signals, n_times = X.shape
     n_freqs = len(Ws)
+    n_times_out = len(range(0, n_times, decim))
 
     Ws_max_size = max(W.size for W in Ws)
     size = n_times + Ws_max_size - 1
@@ -196,34 +217,39 @@ def _cwt_fft(X, Ws, mode="same"):
     fsize = 2 ** int(np.ceil(np.log2(size)))
 
     # precompute FFTs of Ws
-    fft_Ws = np.empty((n_freqs, fsize), dtype=np.complex128)
+    fft_Ws = np.empty((n_freqs, fsize), dtype=dtype)
     for i, W in enumerate(Ws):
         if len(W) > n_times:
             raise ValueError('Wavelet is too long for such a short signal. '
                              'Reduce the number of cycles.')
-        fft_Ws[i] = fftn(W, [fsize])
-
-    for k, x in enumerate(X):
-        if mode == "full":
-            tfr = np.zeros((n_freqs, fsize), dtype=np.complex128)
-        elif mode == "same" or mode == "valid":
-            tfr = np.zeros((n_freqs, n_times), dtype=np.complex128)
-
-        fft_x = fftn(x, [fsize])
+        fft_Ws[i] = fft(W, fsize)
+
+    # FFT of the signals, product / inverse FFT and output of the block
+    n_bytes = np.dtype(dtype).itemsize * (2 * fsize + n_freqs * n_times_out)
+    n_block = max(1, int(_cwt_block_bytes // n_bytes))
+    for start in range(0, n_signals, n_block):
+        fft_x = fft(X[start:start + n_block].astype(dtype), fsize, axis=-1)
+        tfr = np.zeros((len(fft_x), n_freqs, n_times_out), dtype=dtype)
         for i, W in enumerate(Ws):
-            ret = ifftn(fft_x * fft_Ws[i])[:n_times + W.size - 1]
+            ret = ifft(fft_x * fft_Ws[i], axis=-1, overwrite_x=True)
+            ret = ret[:, :n_times + W.size - 1]
             if mode == "valid":
                 sz = abs(W.size - n_times) + 1
-                offset = (n_times - sz) / 2
-                tfr[i, offset:(offset + sz)] = _centered(ret, sz)
+                offset = (n_times - sz) // 2
+                this_tfr = np.zeros((len(ret), n_times), dtype=dtype)
+                this_tfr[:, offset:(offset + sz)] = _centered(ret,
+                                                              (len(ret), sz))
+                tfr[:, i] = this_tfr[:, ::decim]
             else:
-                tfr[i, :] = _centered(ret, n_times)
+                first = (W.size - 1) // 2
+                tfr[:, i] = ret[:, first:first + n_times:decim]
         yield tfr
 
 
-def _cwt_convolve(X, Ws, mode='same'):
+def _cwt_convolve(X, Ws, mode='same', decim=1):
     """Compute time freq decomposition with temporal convolutions
-    Return a generator over signals.
+    Return a generator over blocks of one signal, each of shape
+    (1, n_freqs, n_times_decim).
     """
     X = np.asarray(X)
 
@@ -240,11 +266,11 @@ def _cwt_convolve(X, Ws, mode='same'):
                                  'signal. Reduce the number of cycles.')
             if mode == "valid":
                 sz = abs(W.size - n_times) + 1
-                offset = (n_times - sz) / 2
+                offset = (n_times - sz) // 2
                 tfr[i, offset:(offset + sz)] = ret
             else:
                 tfr[i] = ret
-        yield tfr
+        yield tfr[np.newaxis, :, ::decim]
 
 
 def cwt_morlet(X, sfreq, freqs, use_fft=True, n_cycles=7.0, zero_mean=False,
@@ -294,13 +320,15 @@ def cwt_morlet(X, sfreq, freqs, use_fft=True, n_cycles=7.0, zero_mean=False,
         coefs = _cwt_convolve(X, Ws, mode)
 
     tfrs = np.empty((n_signals, n_frequencies, n_times), dtype=np.complex)
-    for k, tfr in enumerate(coefs):
-        tfrs[k] = tfr
+    start = 0
+    for tfr in coefs:
+        tfrs[start:start + len(tfr)] = tfr
+        start += len(tfr)
 
     return tfrs
 
 
-def cwt(X, Ws, use_fft=True, mode='same', decim=1):
+def cwt(X, Ws, use_fft=True, mode='same', decim=1, dtype=np.complex128):
     """Compute time freq decomposition with continuous wavelet transform
 
     Parameters
@@ -315,6 +343,9 @@ def cwt(X, Ws, use_fft=True, mode='same', decim=1):
         Convention for convolution
     decim : int
         Temporal decimation factor
+    dtype : np.complex128 | np.complex64
+        The data type of the output. Using np.complex64 halves the memory
+        requirements (and also computes the FFTs in single precision).
 
     Returns
     -------
@@ -325,40 +356,153 @@ def cwt(X, Ws, use_fft=True, mode='same', decim=1):
     n_frequencies = len(Ws)
 
     if use_fft:
-        coefs = _cwt_fft(X, Ws, mode)
+        coefs = _cwt_fft(X, Ws, mode, decim, dtype)
     else:
-        coefs = _cwt_convolve(X, Ws, mode)
+        coefs = _cwt_convolve(X, Ws, mode, decim)
 
-    tfrs = np.empty((n_signals, n_frequencies, n_times), dtype=np.complex)
-    for k, tfr in enumerate(coefs):
-        tfrs[k] = tfr[..., ::decim]
+    tfrs = np.empty((n_signals, n_frequencies, n_times), dtype=dtype)
+    start = 0
+    for tfr in coefs:
+        tfrs[start:start + len(tfr)] = tfr
+        start += len(tfr)
 
     return tfrs
 
 
-def _time_frequency(X, Ws, use_fft, decim):
-    """Aux of time_frequency for parallel computing over channels
+class _TFRAccumulator(object):
+    """Streaming accumulator of time-frequency power and phase locking
+
+    Epochs are transformed as they are added and only the running sums of
+    the power and of the unit phase vectors are kept, so the memory does
+    not depend on the number of epochs. Accumulators filled with different
+    epochs (e.g., by different jobs) can be merged.
+
+    Parameters
+    ----------
+    Ws : list of list of array
+        The wavelets of each taper. Power and ITC are averaged across tapers.
+    n_channels : int
+        The number of channels.
+    n_times : int
+        The number of time points of the epochs (before decimation).
+    use_fft : bool
+        Compute the transform with FFT based convolutions.
+    decim : int
+        Temporal decimation factor.
     """
-    n_epochs, n_times = X.shape
-    n_times = n_times // decim + bool(n_times % decim)
-    n_frequencies = len(Ws)
-    psd = np.zeros((n_frequencies, n_times))  # PSD
-    plf = np.zeros((n_frequencies, n_times), np.complex)  # phase lock
 
-    mode = 'same'
-    if use_fft:
-        tfrs = _cwt_fft(X, Ws, mode)
-    else:
-        tfrs = _cwt_convolve(X, Ws, mode)
+    def __init__(self, Ws, n_channels, n_times, use_fft=True, decim=1):
+        self.Ws = Ws
+        self.use_fft = use_fft
+        self.decim = decim
+        n_times = len(range(0, n_times, decim))
+        self.n_epochs = 0
+        self.psd = np.zeros((n_channels, len(Ws[0]), n_times))
+        self.plf = np.zeros((len(Ws), n_channels, len(Ws[0]), n_times),
+                            np.complex128)
+
+    def update(self, data):
+        """Add epochs of shape (n_epochs, n_channels, n_times)"""
+        n_epochs = len(data)
+        if n_epochs == 0:
+            return self
+        # order the signals by channel, so blocks span few channels
+        X = data.transpose(1, 0, 2).reshape(-1, data.shape[2])
+        for plf, Ws in zip(self.plf, self.Ws):
+            if self.use_fft:
+                tfrs = _cwt_fft(X, Ws, 'same', self.decim)
+            else:
+                tfrs = _cwt_convolve(X, Ws, 'same', self.decim)
+            start = 0
+            for tfr in tfrs:
+                tfr_abs = np.abs(tfr)
+                power = tfr_abs ** 2
+                tfr /= tfr_abs
+                chs = (start + np.arange(len(tfr))) // n_epochs
+                for ch in np.unique(chs):
+                    mask = chs == ch
+                    self.psd[ch] += np.sum(power[mask], axis=0)
+                    plf[ch] += np.sum(tfr[mask], axis=0)
+                start += len(tfr)
+        self.n_epochs += n_epochs
+        return self
+
+    def merge(self, other):
+        """Add the sums of another accumulator"""
+        self.n_epochs += other.n_epochs
+        self.psd += other.psd
+        self.plf += other.plf
+        return self
 
-    for tfr in tfrs:
-        tfr = tfr[:, ::decim]
-        tfr_abs = np.abs(tfr)
-        psd += tfr_abs ** 2
-        plf += tfr / tfr_abs
-    psd /= n_epochs
-    plf = np.abs(plf) / n_epochs
-    return psd, plf
+    def get_power_itc(self):
+        """Get the average power and the ITC"""
+        n_avg = float(self.n_epochs * len(self.Ws))
+        return self.psd / n_avg, np.sum(np.abs(self.plf), axis=0) / n_avg
+
+
+def _accumulate_tfr(epochs, Ws, use_fft, decim, picks, batch_size):
+    """Aux function of _induced_power to accumulate a shard of epochs"""
+    acc = None
+    for data in _iter_epochs_batches(epochs, picks, batch_size):
+        if acc is None:
+            acc = _TFRAccumulator(Ws, data.shape[1], data.shape[2], use_fft,
+                                  decim)
+        acc.update(data)
+    return acc
+
+
+def _iter_epochs_batches(epochs, picks, batch_size):
+    """Aux function to get batches of epochs data without loading all of it"""
+    if isinstance(epochs, np.ndarray):
+        for start in range(0, len(epochs), batch_size):
+            batch = epochs[start:start + batch_size]
+            yield batch if picks is None else batch[:, picks]
+    else:
+        batch = list()
+        for epoch in epochs:
+            batch.append(epoch if picks is None else epoch[picks])
+            if len(batch) == batch_size:
+                yield np.array(batch)
+                batch = list()
+        if len(batch) > 0:
+            yield np.array(batch)
+
+
+def _induced_power(epochs, Ws, use_fft, decim, n_jobs, picks=None):
+    """Accumulate the power and ITC of epochs in bounded memory
+
+    ``epochs`` can be an array or an Epochs instance, which is iterated
+    over (i.e., it does not need to be preloaded). Each job accumulates a
+    contiguous shard of the epochs, in batches of about ``_cwt_block_bytes``
+    of data, and the accumulators of the jobs are merged.
+    """
+    parallel, my_accumulate_tfr, n_jobs = parallel_func(_accumulate_tfr,
+                                                        n_jobs)
+    if isinstance(epochs, np.ndarray):
+        n_epochs, n_channels, n_times = epochs.shape
+    else:
+        n_epochs, n_times = len(epochs.events), len(epochs.times)
+        n_channels = epochs.info['nchan']
+    if picks is not None:
+        n_channels = len(picks)
+    batch_size = max(1, int(_cwt_block_bytes // (8 * n_channels * n_times)))
+    shards = [idx for idx in np.array_split(np.arange(n_epochs), n_jobs)
+              if len(idx) > 0]
+    if isinstance(epochs, np.ndarray):
+        shards = [epochs[idx[0]:idx[-1] + 1] for idx in shards]
+    elif len(shards) > 1:
+        shards = [epochs[idx] for idx in shards]
+    else:
+        shards = [epochs]
+    acc = None
+    for this_acc in parallel(my_accumulate_tfr(shard, Ws, use_fft, decim,
+                                               picks, batch_size)
+                             for shard in shards):
+        if this_acc is not None:
+            acc = this_acc if acc is None else acc.merge(this_acc)
+    if acc is None:
+        raise ValueError('No epochs to compute the TFR from')
+    return acc
 
 
 @verbose
@@ -434,9 +578,18 @@ def single_trial_power(data, sfreq, frequencies, use_fft=True, n_cycles=7,
     # the two calls below is updated with new function arguments.
     cwt_kw = dict(Ws=Ws, use_fft=use_fft, mode=mode, decim=decim)
     if n_jobs == 1:
-        for k, e in enumerate(data):
-            x = cwt(e, **cwt_kw)
-            power[k] = (x * x.conj()).real
+        # transform all epochs and channels together, block by block
+        data = data.reshape(n_epochs * n_channels, data.shape[-1])
+        if use_fft:
+            tfrs = _cwt_fft(data, Ws, mode, decim)
+        else:
+            tfrs = _cwt_convolve(data, Ws, mode, decim)
+        power_2d = power.reshape(n_epochs * n_channels, n_frequencies,
+                                 n_times)
+        start = 0
+        for tfr in tfrs:
+            power_2d[start:start + len(tfr)] = (tfr * tfr.conj()).real
+            start += len(tfr)
     else:
         # Precompute tf decompositions in parallel
         tfrs = parallel(my_cwt(e, **cwt_kw) for e in data)
@@ -452,15 +605,17 @@ def single_trial_power(data, sfreq, frequencies, use_fft=True, n_cycles=7,
 
 
 def _induced_power_cwt(data, sfreq, frequencies, use_fft=True, n_cycles=7,
-                       decim=1, n_jobs=1, zero_mean=False, Fs=None):
+                       decim=1, n_jobs=1, zero_mean=False, Fs=None,
+                       picks=None):
     """Compute time induced power and inter-trial phase-locking factor
 
     The time frequency decomposition is done with Morlet wavelets
 
     Parameters
     ----------
-    data : array
-        3D array of shape [n_epochs, n_channels, n_times]
+    data : array | Epochs
+        3D array of shape [n_epochs, n_channels, n_times], or epochs that
+        are processed one batch at a time (they need not be preloaded).
     sfreq : float
         sampling Frequency
     frequencies : array
@@ -477,6 +632,8 @@ def _induced_power_cwt(data, sfreq, frequencies, use_fft=True, n_cycles=7,
         Requires joblib package.
     zero_mean : bool
         Make sure the wavelets are zero mean.
+    picks : array-like of int | None
+        The channels to use. If None, all channels are used.
 
     Returns
     -------
@@ -485,22 +642,15 @@ def _induced_power_cwt(data, sfreq, frequencies, use_fft=True, n_cycles=7,
         Squared amplitude of time-frequency coefficients.
     phase_lock : 2D array
         Phase locking factor in [0, 1] (Channels x Frequencies x Timepoints)
+    n_epochs : int
+        The number of epochs that were averaged.
     """
-    n_frequencies = len(frequencies)
-    n_epochs, n_channels, n_times = data[:, :, ::decim].shape
-
     # Precompute wavelets for given frequency range to save time
     Ws = morlet(sfreq, frequencies, n_cycles=n_cycles, zero_mean=zero_mean)
 
-    psd = np.empty((n_channels, n_frequencies, n_times))
-    plf = np.empty((n_channels, n_frequencies, n_times))
-    # Separate to save memory for n_jobs=1
-    parallel, my_time_frequency, _ = parallel_func(_time_frequency, n_jobs)
-    psd_plf = parallel(my_time_frequency(data[:, c, :], Ws, use_fft, decim)
-                       for c in range(n_channels))
-    for c, (psd_c, plf_c) in enumerate(psd_plf):
-        psd[c, :, :], plf[c, :, :] = psd_c, plf_c
-    return psd, plf
+    acc = _induced_power(data, [Ws], use_fft, decim, n_jobs, picks)
+    psd, plf = acc.get_power_itc()
+    return psd, plf, acc.n_epochs
 
 
 def _preproc_tfr(data, times, freqs, tmin, tmax, fmin, fmax, mode,
@@ -1025,7 +1175,8 @@ def tfr_morlet(inst, freqs, n_cycles, use_fft=False,
     Parameters
     ----------
     inst : Epochs | Evoked
-        The epochs or evoked object.
+        The epochs or evoked object. Epochs do not need to be preloaded,
+        they are processed a few at a time.
     freqs : ndarray, shape (n_freqs,)
         The frequencies in Hz.
     n_cycles : float | ndarray, shape (n_freqs,)
@@ -1048,17 +1199,15 @@ def tfr_morlet(inst, freqs, n_cycles, use_fft=False,
         The intertrial coherence (ITC). Only returned if return_itc
         is True.
     """
-    data = _get_data(inst, return_itc)
+    data = _get_epochs(inst, return_itc)
     picks = pick_types(inst.info, meg=True, eeg=True)
     info = pick_info(inst.info, picks)
-    data = data[:, picks, :]
-    power, itc = _induced_power_cwt(data, sfreq=info['sfreq'],
-                                    frequencies=freqs,
-                                    n_cycles=n_cycles, n_jobs=n_jobs,
-                                    use_fft=use_fft, decim=decim,
-                                    zero_mean=True)
+    power, itc, nave = _induced_power_cwt(data, sfreq=info['sfreq'],
+                                          frequencies=freqs,
+                                          n_cycles=n_cycles, n_jobs=n_jobs,
+                                          use_fft=use_fft, decim=decim,
+                                          zero_mean=True, picks=picks)
     times = inst.times[::decim].copy()
-    nave = len(data)
     out = AverageTFR(info, power, times, freqs, nave, method='morlet-power')
     if return_itc:
         out = (out, AverageTFR(info, itc, times, freqs, nave,
@@ -1069,15 +1218,16 @@ def tfr_morlet(inst, freqs, n_cycles, use_fft=False,
 @verbose
 def _induced_power_mtm(data, sfreq, frequencies, time_bandwidth=4.0,
                        use_fft=True, n_cycles=7, decim=1, n_jobs=1,
-                       zero_mean=True, verbose=None):
+                       zero_mean=True, picks=None, verbose=None):
     """Compute time induced power and inter-trial phase-locking factor
 
     The time frequency decomposition is done with DPSS wavelets
 
     Parameters
     ----------
-    data : np.ndarray, shape (n_epochs, n_channels, n_times)
-        The input data.
+    data : np.ndarray, shape (n_epochs, n_channels, n_times) | Epochs
+        The input data. Epochs are processed one batch at a time (they need
+        not be preloaded).
     sfreq : float
         sampling Frequency
     frequencies : np.ndarray, shape (n_frequencies,)
@@ -1098,6 +1248,8 @@ def _induced_power_mtm(data, sfreq, frequencies, time_bandwidth=4.0,
         Requires joblib package. Defaults to 1.
     zero_mean : bool
         Make sure the wavelets are zero mean. Defaults to True.
+    picks : array-like of int | None
+        The channels to use. If None, all channels are used.
     verbose : bool, str, int, or None
         If not None, override default verbose level (see mne.verbose).
 
@@ -1107,9 +1259,14 @@ def _induced_power_mtm(data, sfreq, frequencies, time_bandwidth=4.0,
         Induced power. Squared amplitude of time-frequency coefficients.
     itc : np.ndarray, shape (n_channels, n_frequencies, n_times)
         Phase locking value.
+    n_epochs : int
+        The number of epochs that were averaged.
     """
-    n_epochs, n_channels, n_times = data[:, :, ::decim].shape
-    logger.info('Data is %d trials and %d channels', n_epochs, n_channels)
+    if isinstance(data, np.ndarray):
+        n_times = data.shape[2]
+    else:
+        n_times = len(data.times)
+    n_times = len(range(0, n_times, decim))
     n_frequencies = len(frequencies)
     logger.info('Multitaper time-frequency analysis for %d frequencies',
                 n_frequencies)
@@ -1123,20 +1280,11 @@ def _induced_power_mtm(data, sfreq, frequencies, time_bandwidth=4.0,
     if n_times <= n_times_wavelets:
         warnings.warn("Time windows are as long or longer than the epoch. "
                       "Consider reducing n_cycles.")
-    psd = np.zeros((n_channels, n_frequencies, n_times))
-    itc = np.zeros((n_channels, n_frequencies, n_times))
-    parallel, my_time_frequency, _ = parallel_func(_time_frequency,
-                                                   n_jobs)
-    for m in range(n_taps):
-        psd_itc = parallel(my_time_frequency(data[:, c, :],
-                                             Ws[m], use_fft, decim)
-                           for c in range(n_channels))
-        for c, (psd_c, itc_c) in enumerate(psd_itc):
-            psd[c, :, :] += psd_c
-            itc[c, :, :] += itc_c
-    psd /= n_taps
-    itc /= n_taps
-    return psd, itc
+    acc = _induced_power(data, Ws, use_fft, decim, n_jobs, picks)
+    logger.info('Data is %d trials and %d channels', acc.n_epochs,
+                len(acc.psd))
+    psd, itc = acc.get_power_itc()
+    return psd, itc, acc.n_epochs
 
 
 def tfr_multitaper(inst, freqs, n_cycles, time_bandwidth=4.0, use_fft=True,
@@ -1146,7 +1294,8 @@ def tfr_multitaper(inst, freqs, n_cycles, time_bandwidth=4.0, use_fft=True,
     Parameters
     ----------
     inst : Epochs | Evoked
-        The epochs or evoked object.
+        The epochs or evoked object. Epochs do not need to be preloaded,
+        they are processed a few at a time.
     freqs : ndarray, shape (n_freqs,)
         The frequencies in Hz.
     n_cycles : float | ndarray, shape (n_freqs,)
@@ -1182,18 +1331,17 @@ def tfr_multitaper(inst, freqs, n_cycles, time_bandwidth=4.0, use_fft=True,
         is True.
     """
 
-    data = _get_data(inst, return_itc)
+    data = _get_epochs(inst, return_itc)
     picks = pick_types(inst.info, meg=True, eeg=True)
     info = pick_info(inst.info, picks)
-    data = data[:, picks, :]
-    power, itc = _induced_power_mtm(data, sfreq=info['sfreq'],
-                                    frequencies=freqs, n_cycles=n_cycles,
-                                    time_bandwidth=time_bandwidth,
-                                    use_fft=use_fft, decim=decim,
-                                    n_jobs=n_jobs, zero_mean=True,
-                                    verbose='INFO')
+    power, itc, nave = _induced_power_mtm(data, sfreq=info['sfreq'],
+                                          frequencies=freqs,
+                                          n_cycles=n_cycles,
+                                          time_bandwidth=time_bandwidth,
+                                          use_fft=use_fft, decim=decim,
+                                          n_jobs=n_jobs, zero_mean=True,
+                                          picks=picks, verbose='INFO')
     times = inst.times[::decim].copy()
-    nave = len(data)
     out = AverageTFR(info, power, times, freqs, nave,
                      method='mutlitaper-power')
     if return_itc:
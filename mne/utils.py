@@ -120,6 +120,51 @@ def object_hash(x, h=None):
     return int(h.hexdigest(), 16)
 
 
+class _BoundedCache(object):
+    """Size-bounded, in-memory cache (least recently used entries dropped)
+
+    Keys are typically content hashes obtained with ``object_hash``.
+
+    Parameters
+    ----------
+    max_size : int
+        Maximum number of entries to keep.
+    """
+    def __init__(self, max_size=8):
+        self.max_size = int(max_size)
+        self._data = dict()
+        self._order = list()  # oldest first
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Get a cached value (marking it as recently used)"""
+        if key not in self._data:
+            return default
+        self._order.remove(key)
+        self._order.append(key)
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        if self.max_size <= 0:
+            return
+        if key in self._data:
+            self._order.remove(key)
+        self._data[key] = value
+        self._order.append(key)
+        while len(self._order) > self.max_size:
+            del self._data[self._order.pop(0)]
+
+    def clear(self):
+        """Remove all entries"""
+        self._data.clear()
+        self._order = list()
+
+
 def object_diff(a, b, pre=''):
     """Compute all differences between two python variables
 
@@ -326,13 +371,27 @@ def estimate_rank(data, tol=1e-4, return_singular=False,
     s : array
         If return_singular is True, the singular values that were
         thresholded to determine the rank are also returned.
+
+    Notes
+    -----
+    The singular values are obtained from the eigenvalues of the (smaller)
+    Gram matrix of the data, which is much cheaper than a full SVD when
+    the data have many more columns than rows. Singular values below
+    ``sqrt(eps)`` times the largest one are not resolved this way; if
+    ``tol`` falls in that range, a full SVD is used instead.
     """
     if copy is True:
         data = data.copy()
     if norm is True:
         norms = _compute_row_norms(data)
         data /= norms[:, np.newaxis]
-    s = linalg.svd(data, compute_uv=False, overwrite_a=True)
+    if data.shape[0] <= data.shape[1]:
+        gram = np.dot(data, data.T)
+    else:
+        gram = np.dot(data.T, data)
+    s = _gram_singular_values(gram, tol)
+    if s is None:
+        s = linalg.svd(data, compute_uv=False, overwrite_a=True)
     rank = np.sum(s >= tol)
     if return_singular is True:
         return rank, s
@@ -340,6 +399,21 @@ def estimate_rank(data, tol=1e-4, return_singular=False,
         return rank
 
 
+def _gram_singular_values(gram, tol):
+    """Get the singular values of X from its Gram matrix
+
+    Returns None if the eigenvalues of the Gram matrix are not accurate
+    enough to compare the singular values against ``tol``.
+    """
+    s = linalg.eigvalsh(gram, overwrite_a=True)[::-1]
+    s = np.sqrt(np.maximum(s, 0.))
+    # eigenvalues are accurate to eps * s[0] ** 2, i.e., the singular
+    # values only down to sqrt(eps) * s[0]
+    if 10 * np.sqrt(np.finfo(gram.dtype).eps) * s[0] > tol:
+        return None
+    return s
+
+
 def _compute_row_norms(data):
     """Compute scaling based on estimated norm"""
     norms = np.sqrt(np.sum(data ** 2, axis=1))
@@ -1002,6 +1076,7 @@ known_config_types = [
     'MNE_USE_CUDA',
     'SUBJECTS_DIR',
     'MNE_CACHE_DIR',
+    'MNE_DPSS_CACHE_DIR',
     'MNE_MEMMAP_MIN_SIZE',
     'MNE_SKIP_TESTING_DATASET_TESTS',
     'MNE_DATASETS_SPM_FACE_DATASETS_TESTS'